@@ -0,0 +1,86 @@
+# Micro-benchmarks of the hot paths, run with: PYTHONPATH=src:tests python benchmarks/run_benchmarks.py
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+import timeit
+
+from mocks import MessageCapturingConsolePublisher
+from test_ha_discovery import create_discovery
+from test_refresh_scheduler import SimulatedVehicle, running
+from test_topic_resolution import USER, VIN, create_publisher
+
+from configuration import Configuration
+from handlers.refresh_scheduler import FleetRefreshScheduler
+from integrations.home_assistant.entities import HA_ENTITIES
+import mqtt_topics
+
+
+def benchmark_topic_resolution(iterations: int = 100_000) -> None:
+    publisher = create_publisher()
+    invalid_mqtt_chars = re.compile(r"[+#*$>]")
+    vehicle_prefix = f"{USER}/{mqtt_topics.VEHICLES}/{VIN}"
+
+    def uncached() -> str:
+        return invalid_mqtt_chars.sub(
+            "_", f"saic/{vehicle_prefix}/{mqtt_topics.DRIVETRAIN_SOC}"
+        )
+
+    def cached() -> str:
+        return publisher.get_topic(
+            f"{vehicle_prefix}/{mqtt_topics.DRIVETRAIN_SOC}", False
+        )
+
+    for name, func in (("regex per publish", uncached), ("memoized", cached)):
+        elapsed = timeit.timeit(func, number=iterations)
+        print(f"{name}: {elapsed / iterations * 1e9:.0f} ns per topic")
+
+
+async def benchmark_refresh_scheduler(
+    vehicles: int = 500, duration: float = 5.0
+) -> None:
+    scheduler = FleetRefreshScheduler(workers=8)
+    fleet = [
+        SimulatedVehicle(f"vin{i}", period=0.5 + (i % 10) * 0.1)
+        for i in range(vehicles)
+    ]
+    for vehicle in fleet:
+        scheduler.add_vehicle(vehicle)
+
+    cpu_start = time.process_time()
+    async with running(scheduler):
+        await asyncio.sleep(duration)
+        tasks = len(asyncio.all_tasks())
+    cpu_time = time.process_time() - cpu_start
+
+    print(
+        f"{vehicles} vehicles, {scheduler.dispatched} refreshes in {duration:.0f} s: "
+        f"{cpu_time / scheduler.dispatched * 1e6:.0f} us CPU per refresh, "
+        f"{tasks} tasks"
+    )
+
+
+def benchmark_ha_discovery(vehicles: int = 200) -> None:
+    config = Configuration()
+    config.ha_discovery_prefix = "homeassistant"
+    publisher = MessageCapturingConsolePublisher(config)
+    fleet = [
+        create_discovery(publisher, config, f"vin{i:014d}") for i in range(vehicles)
+    ]
+
+    start = time.perf_counter()
+    for discovery in fleet:
+        discovery.publish_ha_discovery_messages()
+    duration = time.perf_counter() - start
+
+    print(
+        f"{vehicles} vehicles, {len(HA_ENTITIES)} entities: "
+        f"{duration / vehicles * 1e3:.2f} ms per vehicle"
+    )
+
+
+if __name__ == "__main__":
+    benchmark_topic_resolution()
+    asyncio.run(benchmark_refresh_scheduler())
+    benchmark_ha_discovery()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from enum import Enum
 from typing import TYPE_CHECKING
 
@@ -17,6 +18,16 @@ class TransportProtocol(Enum):
     TLS = "tcp", True
 
 
+@dataclass(kw_only=True, frozen=True)
+class MqttBroker:
+    host: str | None
+    port: int
+    transport_protocol: TransportProtocol
+    user: str | None = None
+    password: str | None = None
+    tls_server_cert_path: str | None = None
+
+
 class Configuration:
     def __init__(self) -> None:
         self.saic_user: str | None = None
@@ -27,6 +38,8 @@ class Configuration:
         self.saic_tenant_id: str = "459771"
         self.saic_relogin_delay: int = 15 * 60  # in seconds
         self.saic_read_timeout: float = 10.0  # in seconds
+        self.__init_saic_limits()
+        self.__init_caches()
         self.battery_capacity_map: dict[str, float] = {}
         self.mqtt_host: str | None = None
         self.mqtt_port: int = 1883
@@ -37,14 +50,20 @@ class Configuration:
         self.mqtt_client_id: str = "saic-python-mqtt-gateway"
         self.mqtt_topic: str = "saic"
         self.mqtt_allow_dots_in_topic: bool = True
+        self.__init_mqtt_publishing()
         self.charging_stations_by_vin: dict[str, ChargingStation] = {}
         self.anonymized_publishing: bool = False
         self.messages_request_interval: int = 60  # in seconds
+        # in seconds, None keeps the request interval fixed
+        self.messages_request_interval_max: int | None = None
+        self.messages_page_size: int = 20
+        self.messages_watermark_path: str | None = None
         self.ha_discovery_enabled: bool = True
         self.ha_discovery_prefix: str = "homeassistant"
         self.ha_show_unavailable: bool = True
         self.charge_dynamic_polling_min_percentage: float = 1.0
         self.publish_raw_api_data: bool = False
+        self.publish_state_document: bool = False
 
         # ABRP Integration
         self.abrp_token_map: dict[str, str] = {}
@@ -56,10 +75,50 @@ class Configuration:
         self.osmand_server_uri: str | None = None
         self.publish_raw_osmand_data: bool = False
 
+    # Bounds how hard the gateway hits the SAIC API
+    def __init_saic_limits(self) -> None:
+        self.saic_call_timeout: float = 60.0  # in seconds
+        self.refresh_workers: int = 4
+        self.saic_max_concurrent_requests: int = 6
+        self.saic_requests_per_minute: int = 60
+        self.saic_throttle_backoff: float = 60.0  # in seconds
+        self.vehicle_setup_concurrency: int = 4
+
+    def __init_caches(self) -> None:
+        self.battery_heating_schedule_cache_ttl: int = 60 * 60  # in seconds
+        self.state_snapshot_path: str | None = None
+        self.startup_cache_path: str | None = None
+
+    def __init_mqtt_publishing(self) -> None:
+        self.mqtt_publish_changes_only: bool = False
+        self.mqtt_republish_interval: int = 60 * 60  # in seconds
+        self.mqtt_publish_queue_size: int = 1000
+        self.mqtt_offline_buffer_path: str | None = None
+        self.mqtt_offline_buffer_size: int = 10000
+        self.mqtt_v5_enabled: bool = False
+        self.mqtt_message_expiry: int = 60 * 60  # in seconds
+        self.mqtt_compact_json: bool = False
+        self.mqtt_rate_limit_discovery: float | None = None  # messages per second
+        self.mqtt_rate_limit_state: float | None = None  # messages per second
+        self.mqtt_rate_limit_raw: float | None = None  # messages per second
+        # Brokers that receive a copy of everything published, commands are only accepted from the main broker
+        self.mqtt_additional_brokers: list[MqttBroker] = []
+
     @property
     def is_mqtt_enabled(self) -> bool:
         return self.mqtt_host is not None and len(str(self.mqtt_host)) > 0
 
+    @property
+    def mqtt_broker(self) -> MqttBroker:
+        return MqttBroker(
+            host=self.mqtt_host,
+            port=self.mqtt_port,
+            transport_protocol=self.mqtt_transport_protocol,
+            user=self.mqtt_user,
+            password=self.mqtt_password,
+            tls_server_cert_path=self.tls_server_cert_path,
+        )
+
     @property
     def username_is_email(self) -> bool:
         return self.saic_user is not None and "@" in self.saic_user
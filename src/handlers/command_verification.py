@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import mqtt_topics
+from utils import int_to_bool, to_remote_climate
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from saic_ismart_client_ng.api.vehicle.schema import (
+        BasicVehicleStatus,
+        VehicleStatusResp,
+    )
+
+VERIFICATION_INITIAL_INTERVAL = 2.0  # in seconds
+VERIFICATION_INTERVAL_GROWTH = 1.5
+VERIFICATION_MAX_INTERVAL = 20.0  # in seconds
+VERIFICATION_DEADLINE = 120.0  # in seconds
+
+
+@dataclass(kw_only=True, frozen=True)
+class CommandVerification:
+    expected_state: str
+    is_confirmed: Callable[[BasicVehicleStatus], bool]
+
+    def is_confirmed_by(self, vehicle_status: VehicleStatusResp) -> bool:
+        basic_vehicle_status = vehicle_status.basicVehicleStatus
+        return basic_vehicle_status is not None and self.is_confirmed(
+            basic_vehicle_status
+        )
+
+
+# Describes the vehicle state that proves a command took effect, None if it cannot be observed
+def get_command_verification(command: str, payload: str) -> CommandVerification | None:
+    payload = payload.strip().lower()
+    match command, payload:
+        case mqtt_topics.DOORS_LOCKED_SET, "true" | "false":
+            locked = payload == "true"
+            return CommandVerification(
+                expected_state=f"{mqtt_topics.DOORS_LOCKED}={payload}",
+                is_confirmed=lambda status: int_to_bool(status.lockStatus or 0)
+                == locked,
+            )
+        case mqtt_topics.DOORS_BOOT_SET, "false":
+            return CommandVerification(
+                expected_state=f"{mqtt_topics.DOORS_BOOT}=true",
+                is_confirmed=lambda status: int_to_bool(status.bootStatus or 0),
+            )
+        case mqtt_topics.CLIMATE_REMOTE_CLIMATE_STATE_SET, (
+            "off" | "blowingonly" | "on" | "front"
+        ):
+            return CommandVerification(
+                expected_state=f"{mqtt_topics.CLIMATE_REMOTE_CLIMATE_STATE}={payload}",
+                is_confirmed=lambda status: to_remote_climate(
+                    status.remoteClimateStatus or 0
+                )
+                == payload,
+            )
+        case mqtt_topics.CLIMATE_BACK_WINDOW_HEAT_SET, "off" | "on":
+            heating = payload == "on"
+            return CommandVerification(
+                expected_state=f"{mqtt_topics.CLIMATE_BACK_WINDOW_HEAT}={payload}",
+                is_confirmed=lambda status: ((status.rmtHtdRrWndSt or 0) > 0)
+                == heating,
+            )
+    return None
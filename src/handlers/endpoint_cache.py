@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import TYPE_CHECKING, Any, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+LOG = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+# Remembers the last response of slow-changing endpoints for a per-endpoint time to live
+class EndpointCache:
+    def __init__(self) -> None:
+        # endpoint -> (expiry, response)
+        self.__entries: dict[str, tuple[float, Any]] = {}
+        # endpoint -> number of invalidations, tells responses that predate a change apart
+        self.__generations: dict[str, int] = {}
+
+    async def get_or_fetch(
+        self, endpoint: str, ttl: float, fetch: Callable[[], Awaitable[T]]
+    ) -> T:
+        entry = self.__entries.get(endpoint)
+        if entry is not None and entry[0] > time.monotonic():
+            LOG.debug(f"Using cached response of {endpoint}")
+            cached: T = entry[1]
+            return cached
+        generation = self.__generations.get(endpoint, 0)
+        response = await fetch()
+        if self.__generations.get(endpoint, 0) != generation:
+            # The request was already in flight when the data changed, its response is stale
+            LOG.debug(f"Fetching {endpoint} again as it was invalidated meanwhile")
+            generation = self.__generations.get(endpoint, 0)
+            response = await fetch()
+        if ttl > 0 and self.__generations.get(endpoint, 0) == generation:
+            self.__entries[endpoint] = (time.monotonic() + ttl, response)
+        return response
+
+    def invalidate(self, endpoint: str) -> None:
+        self.__generations[endpoint] = self.__generations.get(endpoint, 0) + 1
+        if self.__entries.pop(endpoint, None) is not None:
+            LOG.debug(f"Invalidated cached response of {endpoint}")
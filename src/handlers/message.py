@@ -1,22 +1,30 @@
 from __future__ import annotations
 
+import asyncio
 import datetime
 import logging
 from typing import TYPE_CHECKING
 
 from saic_ismart_client_ng.exceptions import SaicApiException, SaicLogoutException
 
+from message_watermark import MessageWatermark
 from vehicle import RefreshMode
 
 if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
     from saic_ismart_client_ng import SaicApi
     from saic_ismart_client_ng.api.message.schema import MessageEntity
 
     from handlers.relogin import ReloginHandler
     from handlers.vehicle import VehicleHandlerLocator
+    from message_watermark import MessageWatermarkStore
 
 LOG = logging.getLogger(__name__)
 
+MESSAGE_UPDATE_CONCURRENCY = 4
+MESSAGE_REQUEST_INTERVAL_BACKOFF = 2
+
 
 class MessageHandler:
     def __init__(
@@ -24,12 +32,29 @@ class MessageHandler:
         gateway: VehicleHandlerLocator,
         relogin_handler: ReloginHandler,
         saicapi: SaicApi,
+        *,
+        page_size: int = 20,
+        watermark_store: MessageWatermarkStore | None = None,
+        request_interval: int = 60,
+        max_request_interval: int = 60,
     ) -> None:
         self.gateway = gateway
         self.saicapi = saicapi
         self.relogin_handler = relogin_handler
+        self.page_size = page_size
+        self.min_request_interval = request_interval
+        self.max_request_interval = max(max_request_interval, request_interval)
+        self.request_interval = request_interval
+        self.__watermark_store = watermark_store
         self.last_message_ts = datetime.datetime.min
         self.last_message_id: str | int | None = None
+        # IDs of messages already marked as read or deleted, in case the server lags behind
+        self.__read_message_ids: set[str | int] = set()
+        self.__deleted_message_ids: set[str | int] = set()
+        watermark = watermark_store.get() if watermark_store else None
+        if watermark is not None:
+            self.last_message_ts = watermark.message_time
+            self.last_message_id = watermark.message_id
 
     async def check_for_new_messages(self) -> None:
         if self.__should_poll():
@@ -39,40 +64,83 @@ class MessageHandler:
             except Exception as e:
                 LOG.exception("MessageHandler poll loop failed", exc_info=e)
 
+    # Checks often while a vehicle is in use and backs off step by step while all of them are idle.
+    # Returns whether the interval changed
+    def adapt_request_interval(self, *, back_off: bool) -> bool:
+        if self.__is_any_vehicle_active():
+            request_interval = self.min_request_interval
+        elif back_off:
+            request_interval = min(
+                self.request_interval * MESSAGE_REQUEST_INTERVAL_BACKOFF,
+                self.max_request_interval,
+            )
+        else:
+            return False
+        if request_interval == self.request_interval:
+            return False
+        self.request_interval = request_interval
+        return True
+
+    def __is_any_vehicle_active(self) -> bool:
+        vehicle_handlers = self.gateway.vehicle_handlers or {}
+        return any(
+            vh.vehicle_state.hv_battery_active or vh.vehicle_state.is_charging
+            for vh in vehicle_handlers.values()
+            if vh.vehicle_state is not None
+        )
+
     async def __polling(self) -> None:
         try:
             all_messages = await self.__get_all_alarm_messages()
             LOG.info(f"{len(all_messages)} messages received")
 
-            new_messages = [m for m in all_messages if m.read_status != "read"]
+            self.__forget_unlisted_messages(all_messages)
+
+            new_messages = [
+                m
+                for m in all_messages
+                if m.read_status != "read"
+                and m.messageId not in self.__read_message_ids
+            ]
             for message in new_messages:
                 LOG.info(message.details)
-                await self.__read_message(message)
+            await self.__update_messages(
+                new_messages, self.__read_message, self.__read_message_ids
+            )
 
-            latest_message = self.__get_latest_message(all_messages)
-            if (
-                latest_message is not None
-                and latest_message.messageId != self.last_message_id
-                and latest_message.message_time > self.last_message_ts
-            ):
+            unseen_messages = [m for m in all_messages if self.__is_unseen(m)]
+            latest_message = self.__get_latest_message(unseen_messages)
+            if latest_message is not None:
                 self.last_message_id = latest_message.messageId
                 self.last_message_ts = latest_message.message_time
-                LOG.info(
-                    f"{latest_message.title} detected at {latest_message.message_time}"
-                )
-                if (vin := latest_message.vin) and (
-                    vehicle_handler := self.gateway.get_vehicle_handler(vin)
-                ):
-                    vehicle_handler.vehicle_state.notify_message(latest_message)
+                if self.__watermark_store:
+                    self.__watermark_store.save(
+                        MessageWatermark(
+                            message_time=self.last_message_ts,
+                            message_id=self.last_message_id,
+                        )
+                    )
+            # Every vehicle with unseen messages learns about its own latest one
+            for vin, message in self.__get_latest_messages_by_vin(
+                unseen_messages
+            ).items():
+                LOG.info(f"{message.title} detected at {message.message_time}")
+                if vehicle_handler := self.gateway.get_vehicle_handler(vin):
+                    vehicle_handler.vehicle_state.notify_message(message)
 
             # Delete vehicle start messages unless they are the latest
             vehicle_start_messages = [
                 m
                 for m in all_messages
-                if m.messageType == "323" and m.messageId != self.last_message_id
+                if m.messageType == "323"
+                and m.messageId != self.last_message_id
+                and m.messageId not in self.__deleted_message_ids
             ]
-            for vehicle_start_message in vehicle_start_messages:
-                await self.__delete_message(vehicle_start_message)
+            await self.__update_messages(
+                vehicle_start_messages,
+                self.__delete_message,
+                self.__deleted_message_ids,
+            )
         except SaicLogoutException as e:
             LOG.error("API Client was logged out, waiting for a new login", exc_info=e)
             self.relogin_handler.relogin()
@@ -85,24 +153,17 @@ class MessageHandler:
 
     async def __get_all_alarm_messages(self) -> list[MessageEntity]:
         idx = 1
-        all_messages = []
+        all_messages: list[MessageEntity] = []
         while True:
             try:
                 message_list = await self.saicapi.get_alarm_list(
-                    page_num=idx, page_size=1
+                    page_num=idx, page_size=self.page_size
                 )
-                if (
-                    message_list is not None
-                    and message_list.messages
-                    and len(message_list.messages) > 0
-                ):
-                    all_messages.extend(message_list.messages)
-                else:
-                    return all_messages
-                oldest_message = self.__get_oldest_message(all_messages)
-                if (
-                    oldest_message is not None
-                    and oldest_message.message_time < self.last_message_ts
+                messages = message_list.messages if message_list is not None else []
+                all_messages.extend(messages)
+                # Messages are listed newest first, the pages after the watermark were handled already
+                if len(messages) < self.page_size or any(
+                    self.__is_behind_watermark(m) for m in messages
                 ):
                     return all_messages
             except SaicLogoutException as e:
@@ -116,29 +177,65 @@ class MessageHandler:
             finally:
                 idx = idx + 1
 
-    async def __delete_message(self, message: MessageEntity) -> None:
+    # Runs the update of all messages concurrently, the SAIC API limiter keeps the overall pace
+    @staticmethod
+    async def __update_messages(
+        messages: list[MessageEntity],
+        update: Callable[[MessageEntity], Awaitable[bool]],
+        handled_message_ids: set[str | int],
+    ) -> None:
+        semaphore = asyncio.Semaphore(MESSAGE_UPDATE_CONCURRENCY)
+
+        async def update_message(message: MessageEntity) -> None:
+            async with semaphore:
+                if await update(message) and message.messageId is not None:
+                    handled_message_ids.add(message.messageId)
+
+        await asyncio.gather(*(update_message(m) for m in messages))
+
+    # Messages that are no longer listed cannot be handled twice
+    def __forget_unlisted_messages(self, all_messages: list[MessageEntity]) -> None:
+        listed_message_ids = {m.messageId for m in all_messages}
+        self.__read_message_ids &= listed_message_ids
+        self.__deleted_message_ids &= listed_message_ids
+
+    async def __delete_message(self, message: MessageEntity) -> bool:
         try:
             message_id = message.messageId
             if message_id is not None:
                 await self.saicapi.delete_message(message_id=message_id)
                 LOG.info(f"{message.title} message with ID {message_id} deleted")
-            else:
-                LOG.warning("Could not delete message '%s' as it has no ID", message)
+                return True
+            LOG.warning("Could not delete message '%s' as it has no ID", message)
         except Exception as e:
             LOG.exception("Could not delete message from server", exc_info=e)
+        return False
 
-    async def __read_message(self, message: MessageEntity) -> None:
+    async def __read_message(self, message: MessageEntity) -> bool:
         try:
             message_id = message.messageId
             if message_id is not None:
                 await self.saicapi.read_message(message_id=message_id)
                 LOG.info(f"{message.title} message with ID {message_id} marked as read")
-            else:
-                LOG.warning(
-                    "Could not mark message '%s' as read as it has not ID", message
-                )
+                return True
+            LOG.warning("Could not mark message '%s' as read as it has not ID", message)
         except Exception as e:
             LOG.exception("Could not mark message as read from server", exc_info=e)
+        return False
+
+    def __is_unseen(self, message: MessageEntity) -> bool:
+        return (
+            message.messageId != self.last_message_id
+            and message.message_time > self.last_message_ts
+        )
+
+    def __is_behind_watermark(self, message: MessageEntity) -> bool:
+        if (
+            self.last_message_id is not None
+            and message.messageId == self.last_message_id
+        ):
+            return True
+        return message.message_time < self.last_message_ts
 
     def __should_poll(self) -> bool:
         vehicle_handlers = self.gateway.vehicle_handlers or {}
@@ -169,9 +266,17 @@ class MessageHandler:
         return max(vehicle_start_messages, key=lambda m: m.message_time)
 
     @staticmethod
-    def __get_oldest_message(
-        vehicle_start_messages: list[MessageEntity],
-    ) -> MessageEntity | None:
-        if len(vehicle_start_messages) == 0:
-            return None
-        return min(vehicle_start_messages, key=lambda m: m.message_time)
+    def __get_latest_messages_by_vin(
+        messages: list[MessageEntity],
+    ) -> dict[str, MessageEntity]:
+        latest_messages: dict[str, MessageEntity] = {}
+        for message in messages:
+            if not message.vin:
+                continue
+            latest_message = latest_messages.get(message.vin)
+            if (
+                latest_message is None
+                or message.message_time > latest_message.message_time
+            ):
+                latest_messages[message.vin] = message
+        return latest_messages
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+import asyncio
+import contextlib
+import heapq
+import logging
+import time
+
+LOG = logging.getLogger(__name__)
+
+
+class RefreshableVehicle(ABC):
+    @property
+    @abstractmethod
+    def vin(self) -> str:
+        raise NotImplementedError
+
+    # Runs a single refresh cycle, errors are expected to be handled by the vehicle itself
+    @abstractmethod
+    async def poll(self) -> None:
+        raise NotImplementedError
+
+    # None means that the vehicle should not be refreshed until it is triggered again
+    @abstractmethod
+    def seconds_until_next_refresh(self) -> float | None:
+        raise NotImplementedError
+
+
+# Keeps the next due refresh of every vehicle in a single heap and dispatches them to a fixed
+# number of workers, so the number of timers does not grow with the number of vehicles
+class FleetRefreshScheduler:
+    def __init__(self, *, workers: int) -> None:
+        self.__workers = workers
+        self.__vehicles: dict[str, RefreshableVehicle] = {}
+        # (due, sequence, vin), entries whose sequence is outdated are skipped when popped
+        self.__heap: list[tuple[float, int, str]] = []
+        self.__sequence_by_vin: dict[str, int] = {}
+        self.__sequence = 0
+        self.__in_flight: set[str] = set()
+        self.__queue: asyncio.Queue[str] = asyncio.Queue()
+        self.__wakeup = asyncio.Event()
+        self.dispatched = 0
+
+    def add_vehicle(self, vehicle: RefreshableVehicle) -> None:
+        self.__vehicles[vehicle.vin] = vehicle
+        self.schedule(vehicle.vin)
+
+    # Re-evaluates when the vehicle is due next, safe to call whenever its state changes
+    def schedule(self, vin: str) -> None:
+        vehicle = self.__vehicles.get(vin)
+        if vehicle is None or vin in self.__in_flight:
+            # vehicles being refreshed are scheduled again once they are done
+            return
+        delay = vehicle.seconds_until_next_refresh()
+        if delay is None:
+            self.__sequence_by_vin.pop(vin, None)
+            return
+        self.__sequence += 1
+        self.__sequence_by_vin[vin] = self.__sequence
+        heapq.heappush(
+            self.__heap, (time.monotonic() + max(delay, 0.0), self.__sequence, vin)
+        )
+        self.__wakeup.set()
+
+    @property
+    def scheduled_vehicles(self) -> int:
+        return len(self.__sequence_by_vin)
+
+    async def run(self) -> None:
+        workers = [
+            asyncio.create_task(self.__worker(), name=f"refresh_worker_{i}")
+            for i in range(self.__workers)
+        ]
+        try:
+            while True:
+                # Clearing and dispatching happen without yielding, no wakeup gets lost
+                self.__wakeup.clear()
+                timeout = self.__dispatch_due()
+                # Without a due refresh the timeout is None and only a wakeup ends the wait
+                with contextlib.suppress(TimeoutError):
+                    async with asyncio.timeout(timeout):
+                        await self.__wakeup.wait()
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    def __dispatch_due(self) -> float | None:
+        now = time.monotonic()
+        while self.__heap:
+            due, sequence, vin = self.__heap[0]
+            if self.__sequence_by_vin.get(vin) != sequence:
+                heapq.heappop(self.__heap)
+                continue
+            if due > now:
+                return due - now
+            heapq.heappop(self.__heap)
+            del self.__sequence_by_vin[vin]
+            self.__in_flight.add(vin)
+            self.dispatched += 1
+            self.__queue.put_nowait(vin)
+        return None
+
+    async def __worker(self) -> None:
+        while True:
+            vin = await self.__queue.get()
+            try:
+                await self.__vehicles[vin].poll()
+            except Exception as e:
+                LOG.exception(f"Refreshing vehicle {vin} failed", exc_info=e)
+            finally:
+                self.__in_flight.discard(vin)
+                self.__queue.task_done()
+                self.schedule(vin)
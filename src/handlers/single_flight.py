@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine
+
+LOG = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+# Concurrent callers of the same key share one in-flight call and its result
+class SingleFlight:
+    def __init__(self) -> None:
+        self.__in_flight: dict[str, asyncio.Task[Any]] = {}
+        self.__coalesced_calls = 0
+
+    async def run(self, key: str, call: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        task: asyncio.Task[T] | None = self.__in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(call(), name=f"single_flight_{key}")
+            self.__in_flight[key] = task
+            task.add_done_callback(lambda done: self.__on_done(key, done))
+        else:
+            LOG.debug(f"Joining in-flight call {key}")
+            self.__coalesced_calls += 1
+        # A cancelled caller must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    @property
+    def coalesced_calls(self) -> int:
+        return self.__coalesced_calls
+
+    def __on_done(self, key: str, task: asyncio.Task[Any]) -> None:
+        if self.__in_flight.get(key) is task:
+            del self.__in_flight[key]
+        # Mark the error as retrieved in case all callers were cancelled meanwhile
+        if not task.cancelled():
+            task.exception()
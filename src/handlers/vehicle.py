@@ -5,7 +5,8 @@ import asyncio
 import datetime
 import json
 import logging
-from typing import TYPE_CHECKING
+import time
+from typing import TYPE_CHECKING, TypeVar, override
 
 from saic_ismart_client_ng.api.vehicle_charging import (
     ChargeCurrentLimitCode,
@@ -17,23 +18,38 @@ from saic_ismart_client_ng.api.vehicle_charging import (
 from saic_ismart_client_ng.exceptions import SaicApiException, SaicLogoutException
 
 from exceptions import MqttGatewayException
+from handlers.command_verification import (
+    VERIFICATION_DEADLINE,
+    VERIFICATION_INITIAL_INTERVAL,
+    VERIFICATION_INTERVAL_GROWTH,
+    VERIFICATION_MAX_INTERVAL,
+    CommandVerification,
+    get_command_verification,
+)
+from handlers.endpoint_cache import EndpointCache
+from handlers.refresh_scheduler import RefreshableVehicle
+from handlers.single_flight import SingleFlight
 from integrations import IntegrationException
 from integrations.abrp.api import AbrpApi
 from integrations.home_assistant.discovery import HomeAssistantDiscovery
 from integrations.osmand.api import OsmAndApi
 import mqtt_topics
 from mqtt_topics import RESULT_SUFFIX, SET_SUFFIX
+from saic_api_limiter import SaicCallPriority, saic_call_priority
 from saic_api_listener import MqttGatewayAbrpListener, MqttGatewayOsmAndListener
 from status_publisher.vehicle_info import VehicleInfoPublisher
 from vehicle import RefreshMode, VehicleState
 
 if TYPE_CHECKING:
+    from collections.abc import Awaitable
+
     from saic_ismart_client_ng import SaicApi
     from saic_ismart_client_ng.api.vehicle.schema import VehicleStatusResp
 
     from configuration import Configuration
     from handlers.relogin import ReloginHandler
     from publisher.core import Publisher
+    from state_snapshot import StateSnapshotStore
     from status_publisher.charge.chrg_mgmt_data_resp import (
         ChrgMgmtDataRespProcessingResult,
     )
@@ -44,8 +60,18 @@ if TYPE_CHECKING:
 
 LOG = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+ENDPOINT_BATTERY_HEATING_SCHEDULE = "battery_heating_schedule"
+# Commands that change the data behind a cached endpoint
+CACHE_INVALIDATING_COMMANDS: dict[str, tuple[str, ...]] = {
+    mqtt_topics.DRIVETRAIN_BATTERY_HEATING_SCHEDULE_SET: (
+        ENDPOINT_BATTERY_HEATING_SCHEDULE,
+    ),
+}
 
-class VehicleHandler:
+
+class VehicleHandler(RefreshableVehicle):
     def __init__(
         self,
         config: Configuration,
@@ -54,6 +80,7 @@ class VehicleHandler:
         publisher: Publisher,
         vin_info: VehicleInfo,
         vehicle_state: VehicleState,
+        snapshot_store: StateSnapshotStore | None = None,
     ) -> None:
         self.configuration = config
         self.relogin_handler = relogin_handler
@@ -64,12 +91,20 @@ class VehicleHandler:
             f"{self.configuration.saic_user}/vehicles/{self.vin_info.vin}", True
         )
         self.vehicle_state = vehicle_state
+        self.__snapshot_store = snapshot_store
+        self.__start_time = datetime.datetime.now()
+        self.__single_flight = SingleFlight()
+        self.__endpoint_cache = EndpointCache()
+        self.__command_verifications: dict[str, asyncio.Task[None]] = {}
         self.__ha_discovery = self.__setup_ha_discovery(vehicle_state, vin_info, config)
 
         self.__setup_abrp(config, vin_info)
         self.__setup_osmand(config, vin_info)
         self.__vehicle_info_publisher = VehicleInfoPublisher(
-            self.vin_info, self.publisher, self.vehicle_prefix
+            self.vin_info,
+            self.publisher,
+            self.vehicle_prefix,
+            self.vehicle_state.state_document,
         )
 
     def __setup_abrp(self, config: Configuration, vin_info: VehicleInfo) -> None:
@@ -103,80 +138,146 @@ class VehicleHandler:
             listener=api_listener,
         )
 
-    async def handle_vehicle(self) -> None:
-        start_time = datetime.datetime.now()
+    @property
+    @override
+    def vin(self) -> str:
+        return self.vin_info.vin
+
+    def start(self) -> None:
+        self.__start_time = datetime.datetime.now()
+        snapshot = (
+            self.__snapshot_store.get(self.vin_info.vin)
+            if self.__snapshot_store is not None
+            else None
+        )
+        if snapshot is not None:
+            try:
+                self.vehicle_state.restore(snapshot)
+            except Exception as e:
+                # A stale or corrupt snapshot must not keep the vehicle from starting
+                LOG.warning(
+                    f"Ignoring invalid state snapshot of vehicle {self.vin_info.vin}: {e}"
+                )
+                snapshot = None
         self.__vehicle_info_publisher.publish()
-        self.vehicle_state.notify_car_activity()
-
-        while True:
-            if self.__should_complete_configuration(start_time):
-                self.vehicle_state.configure_missing()
-
-            if self.__should_poll():
-                try:
-                    LOG.debug("Polling vehicle status")
-                    await self.__polling()
-                except SaicLogoutException as e:
-                    self.vehicle_state.mark_failed_refresh()
-                    LOG.error(
-                        "API Client was logged out, waiting for a new login", exc_info=e
-                    )
-                    self.relogin_handler.relogin()
-                except SaicApiException as e:
-                    self.vehicle_state.mark_failed_refresh()
-                    LOG.exception(
-                        "handle_vehicle loop failed during SAIC API call", exc_info=e
-                    )
-                except IntegrationException as ae:
-                    LOG.exception(
-                        "handle_vehicle loop failed during integration processing",
-                        exc_info=ae,
-                    )
-                except Exception as e:
-                    self.vehicle_state.mark_failed_refresh()
-                    LOG.exception(
-                        "handle_vehicle loop failed with an unexpected exception",
-                        exc_info=e,
-                    )
-                finally:
-                    self.publish_ha_discovery_messages(force=False)
-            else:
-                # car not active, wait a second
-                await asyncio.sleep(1.0)
-
-    async def __polling(self) -> None:
-        (
-            vehicle_status,
-            vehicle_status_processing_result,
-        ) = await self.update_vehicle_status()
+        if snapshot is None:
+            # Nothing is known about the vehicle yet, refresh it right away
+            self.vehicle_state.notify_car_activity()
+
+    def save_snapshot(self) -> None:
+        if self.__snapshot_store is not None and self.vehicle_state.is_complete():
+            self.__snapshot_store.save(self.vin_info.vin, self.vehicle_state.snapshot())
+
+    @override
+    async def poll(self) -> None:
+        if self.__should_complete_configuration():
+            self.vehicle_state.configure_missing()
+
+        if not self.__should_poll():
+            return
+        priority = (
+            SaicCallPriority.ACTIVE_VEHICLE
+            if self.vehicle_state.hv_battery_active or self.vehicle_state.is_charging
+            else SaicCallPriority.IDLE
+        )
+        try:
+            LOG.debug("Polling vehicle status")
+            with saic_call_priority(priority):
+                await self.refresh()
+        except SaicLogoutException as e:
+            self.vehicle_state.mark_failed_refresh()
+            LOG.error("API Client was logged out, waiting for a new login", exc_info=e)
+            self.relogin_handler.relogin()
+        except SaicApiException as e:
+            self.vehicle_state.mark_failed_refresh()
+            LOG.exception("handle_vehicle loop failed during SAIC API call", exc_info=e)
+        except IntegrationException as ae:
+            LOG.exception(
+                "handle_vehicle loop failed during integration processing",
+                exc_info=ae,
+            )
+        except Exception as e:
+            self.vehicle_state.mark_failed_refresh()
+            LOG.exception(
+                "handle_vehicle loop failed with an unexpected exception",
+                exc_info=e,
+            )
+        finally:
+            self.publish_ha_discovery_messages(force=False)
+            self.save_snapshot()
+        # Do not start the next refresh before the broker caught up with this one
+        await self.publisher.wait_until_writable()
+
+    @override
+    def seconds_until_next_refresh(self) -> float | None:
+        if self.relogin_handler.relogin_in_progress:
+            # the relogin handler does not notify us, check again in a second
+            return 1.0
+        now = datetime.datetime.now()
+        if not self.vehicle_state.is_complete():
+            configuration_deadline = self.__start_time + datetime.timedelta(seconds=10)
+            return max((configuration_deadline - now).total_seconds(), 1.0)
+        next_refresh = self.vehicle_state.next_refresh_due()
+        if next_refresh is None:
+            # refresh mode is OFF, only a trigger can wake us up
+            return None
+        return max((next_refresh - now).total_seconds(), 0.0)
+
+    async def refresh(self) -> None:
+        start_time = time.monotonic()
+        # The requests are independent, fetch them concurrently and process them in order
+        vehicle_status_task = asyncio.create_task(self.__fetch_vehicle_status())
+        charge_status_task: asyncio.Task[ChrgMgmtDataResp] | None = None
+        battery_heating_task: asyncio.Task[ScheduledBatteryHeatingResp] | None = None
+        if self.vin_info.is_ev:
+            charge_status_task = asyncio.create_task(self.__fetch_charge_status())
+            battery_heating_task = asyncio.create_task(
+                self.__fetch_scheduled_battery_heating_status()
+            )
+        else:
+            LOG.debug("Skipping EV-related updates as the vehicle is not an EV")
+
+        try:
+            vehicle_status = await vehicle_status_task
+        except BaseException:
+            for task in (charge_status_task, battery_heating_task):
+                if task is not None:
+                    task.cancel()
+            raise
+        vehicle_status_processing_result = self.vehicle_state.handle_vehicle_status(
+            vehicle_status
+        )
 
         charge_status = None
         charge_status_processing_result = None
-        if self.vin_info.is_ev:
+        if charge_status_task is not None:
             try:
-                (
-                    charge_status,
-                    charge_status_processing_result,
-                ) = await self.update_charge_status()
+                charge_status = await charge_status_task
+                charge_status_processing_result = (
+                    self.vehicle_state.handle_charge_status(charge_status)
+                )
             except Exception as e:
                 LOG.exception("Error updating charge status", exc_info=e)
 
+        if battery_heating_task is not None:
             try:
-                await self.update_scheduled_battery_heating_status()
+                self.vehicle_state.handle_scheduled_battery_heating_status(
+                    await battery_heating_task
+                )
             except Exception as e:
                 LOG.exception(
                     "Error updating scheduled battery heating status", exc_info=e
                 )
-        else:
-            LOG.debug("Skipping EV-related updates as the vehicle is not an EV")
-            charge_status = None
 
         self.vehicle_state.update_data_conflicting_in_vehicle_and_bms(
             vehicle_status_processing_result, charge_status_processing_result
         )
 
         self.vehicle_state.mark_successful_refresh()
-        LOG.info("Refreshing vehicle status succeeded...")
+        self.vehicle_state.publish_state_document()
+        LOG.info(
+            f"Refreshing vehicle status succeeded in {time.monotonic() - start_time:.1f} seconds"
+        )
 
         await self.__refresh_abrp(charge_status, vehicle_status)
         await self.__refresh_osmand(charge_status, vehicle_status)
@@ -188,10 +289,11 @@ class VehicleHandler:
             and self.vehicle_state.should_refresh()
         )
 
-    def __should_complete_configuration(self, start_time: datetime.datetime) -> bool:
+    def __should_complete_configuration(self) -> bool:
         return (
             not self.vehicle_state.is_complete()
-            and datetime.datetime.now() > start_time + datetime.timedelta(seconds=10)
+            and datetime.datetime.now()
+            > self.__start_time + datetime.timedelta(seconds=10)
         )
 
     async def __refresh_osmand(
@@ -238,40 +340,85 @@ class VehicleHandler:
     async def update_vehicle_status(
         self,
     ) -> tuple[VehicleStatusResp, VehicleStatusRespProcessingResult]:
-        LOG.info("Updating vehicle status")
-        vehicle_status_response = await self.saic_api.get_vehicle_status(
-            self.vin_info.vin
-        )
+        vehicle_status_response = await self.__fetch_vehicle_status()
         result = self.vehicle_state.handle_vehicle_status(vehicle_status_response)
         return (vehicle_status_response, result)
 
     async def update_charge_status(
         self,
     ) -> tuple[ChrgMgmtDataResp, ChrgMgmtDataRespProcessingResult]:
-        LOG.info("Updating charging status")
-        charge_mgmt_data = await self.saic_api.get_vehicle_charging_management_data(
-            self.vin_info.vin
-        )
+        charge_mgmt_data = await self.__fetch_charge_status()
         result = self.vehicle_state.handle_charge_status(charge_mgmt_data)
         return charge_mgmt_data, result
 
     async def update_scheduled_battery_heating_status(
         self,
     ) -> ScheduledBatteryHeatingResp:
-        LOG.info("Updating scheduled battery heating status")
         scheduled_battery_heating_status = (
-            await self.saic_api.get_vehicle_battery_heating_schedule(self.vin_info.vin)
+            await self.__fetch_scheduled_battery_heating_status()
         )
         self.vehicle_state.handle_scheduled_battery_heating_status(
             scheduled_battery_heating_status
         )
         return scheduled_battery_heating_status
 
-    async def handle_mqtt_command(self, *, topic: str, payload: str) -> None:
-        topic, result_topic = self.__get_command_topics(topic)
+    async def __fetch_vehicle_status(self) -> VehicleStatusResp:
+        return await self.__single_flight.run(
+            "vehicle_status",
+            lambda: self.__call_saic_api(
+                "Updating vehicle status",
+                self.saic_api.get_vehicle_status(self.vin_info.vin),
+            ),
+        )
+
+    async def __fetch_charge_status(self) -> ChrgMgmtDataResp:
+        return await self.__single_flight.run(
+            "charge_status",
+            lambda: self.__call_saic_api(
+                "Updating charging status",
+                self.saic_api.get_vehicle_charging_management_data(self.vin_info.vin),
+            ),
+        )
+
+    async def __fetch_scheduled_battery_heating_status(
+        self,
+    ) -> ScheduledBatteryHeatingResp:
+        return await self.__endpoint_cache.get_or_fetch(
+            ENDPOINT_BATTERY_HEATING_SCHEDULE,
+            self.configuration.battery_heating_schedule_cache_ttl,
+            lambda: self.__single_flight.run(
+                ENDPOINT_BATTERY_HEATING_SCHEDULE,
+                lambda: self.__call_saic_api(
+                    "Updating scheduled battery heating status",
+                    self.saic_api.get_vehicle_battery_heating_schedule(
+                        self.vin_info.vin
+                    ),
+                ),
+            ),
+        )
+
+    async def __call_saic_api(self, description: str, call: Awaitable[T]) -> T:
+        LOG.info(description)
+        return await asyncio.wait_for(
+            call, timeout=self.configuration.saic_call_timeout
+        )
+
+    @property
+    def coalesced_calls(self) -> int:
+        return self.__single_flight.coalesced_calls
+
+    def publish_statistics(self) -> None:
+        self.publisher.publish_int(
+            f"{self.vehicle_prefix}/{mqtt_topics.INTERNAL_STATS_COALESCED_CALLS}",
+            self.coalesced_calls,
+        )
+
+    async def handle_mqtt_command(self, *, command: str, payload: str) -> None:
+        command_received = time.monotonic()
+        result_topic = self.__get_result_topic(command)
         try:
             should_force_refresh = True
-            match topic:
+            match command:
                 case mqtt_topics.DRIVETRAIN_HV_BATTERY_ACTIVE_SET:
                     match payload.strip().lower():
                         case "true":
@@ -600,12 +747,25 @@ class VehicleHandler:
                     # set mode, period (in)-active,...
                     should_force_refresh = False
                     await self.vehicle_state.configure_by_message(
-                        topic=topic, payload=payload
+                        topic=command, payload=payload
                     )
+            # Only now the vehicle holds the new data, earlier fetches may still see the old one
+            for endpoint in CACHE_INVALIDATING_COMMANDS.get(command, ()):
+                self.__endpoint_cache.invalidate(endpoint)
             self.publisher.publish_str(result_topic, "Success")
-            if should_force_refresh:
+            self.save_snapshot()
+            verification = (
+                get_command_verification(command, payload)
+                if should_force_refresh
+                else None
+            )
+            if verification is not None:
+                self.__start_command_verification(
+                    command, result_topic, verification, command_received
+                )
+            elif should_force_refresh:
                 self.vehicle_state.set_refresh_mode(
-                    RefreshMode.FORCE, f"after command execution on topic {topic}"
+                    RefreshMode.FORCE, f"after command execution on topic {command}"
                 )
         except MqttGatewayException as e:
             self.publisher.publish_str(result_topic, f"Failed: {e.message}")
@@ -623,19 +783,80 @@ class VehicleHandler:
                 "handle_mqtt_command failed with an unexpected exception", exc_info=se
             )
 
-    def __get_command_topics(self, topic: str) -> tuple[str, str]:
-        global_topic_removed = topic.removeprefix(
-            self.configuration.mqtt_topic
-        ).removeprefix("/")
-        set_topic = global_topic_removed.removeprefix(self.vehicle_prefix).removeprefix(
-            "/"
+    def __start_command_verification(
+        self,
+        command: str,
+        result_topic: str,
+        verification: CommandVerification,
+        command_received: float,
+    ) -> None:
+        # A newer command on the same topic supersedes the pending verification
+        if (previous := self.__command_verifications.get(command)) is not None:
+            previous.cancel()
+        task = asyncio.create_task(
+            self.__verify_command(result_topic, verification, command_received),
+            name=f"verify_{self.vin_info.vin}_{command}",
         )
-        result_topic = (
-            global_topic_removed.removesuffix(SET_SUFFIX).removesuffix("/")
-            + "/"
-            + RESULT_SUFFIX
+        self.__command_verifications[command] = task
+        task.add_done_callback(lambda done: self.__forget_verification(command, done))
+
+    def __forget_verification(self, command: str, task: asyncio.Task[None]) -> None:
+        if self.__command_verifications.get(command) is task:
+            del self.__command_verifications[command]
+
+    # Polls the vehicle status with growing intervals until the command is visible or the deadline passes
+    async def __verify_command(
+        self,
+        result_topic: str,
+        verification: CommandVerification,
+        command_received: float,
+    ) -> None:
+        deadline = command_received + VERIFICATION_DEADLINE
+        interval = VERIFICATION_INITIAL_INTERVAL
+        while (remaining := deadline - time.monotonic()) > 0:
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(
+                interval * VERIFICATION_INTERVAL_GROWTH, VERIFICATION_MAX_INTERVAL
+            )
+            try:
+                vehicle_status = await self.__fetch_vehicle_status()
+                self.vehicle_state.handle_vehicle_status(vehicle_status)
+            except SaicApiException as e:
+                LOG.warning(
+                    f"Could not verify {verification.expected_state}: {e.message}"
+                )
+                continue
+            except Exception as e:
+                # Keep polling, the forced refresh below covers a verification that never succeeds
+                LOG.exception(
+                    f"Could not verify {verification.expected_state}", exc_info=e
+                )
+                continue
+            if verification.is_confirmed_by(vehicle_status):
+                latency = time.monotonic() - command_received
+                LOG.info(
+                    f"Confirmed {verification.expected_state} after {latency:.1f} seconds"
+                )
+                self.publisher.publish_str(
+                    result_topic, f"Confirmed after {latency:.1f} seconds"
+                )
+                return
+        LOG.warning(
+            f"Could not confirm {verification.expected_state} within {VERIFICATION_DEADLINE:.0f} seconds"
+        )
+        self.publisher.publish_str(
+            result_topic,
+            f"Not confirmed within {VERIFICATION_DEADLINE:.0f} seconds",
+        )
+        self.vehicle_state.set_refresh_mode(
+            RefreshMode.FORCE, f"unconfirmed {verification.expected_state}"
+        )
+
+    def __get_result_topic(self, command: str) -> str:
+        return (
+            f"{self.vehicle_prefix}/"
+            f"{command.removesuffix(SET_SUFFIX).removesuffix('/')}/{RESULT_SUFFIX}"
         )
-        return set_topic, result_topic
 
     def __setup_ha_discovery(
         self, vehicle_state: VehicleState, vin_info: VehicleInfo, config: Configuration
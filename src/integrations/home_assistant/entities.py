@@ -0,0 +1,1081 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from enum import Enum
+import json
+from typing import TYPE_CHECKING, Any
+
+import inflection
+from saic_ismart_client_ng.api.vehicle_charging import (
+    ChargeCurrentLimitCode,
+    ScheduledChargingMode,
+)
+
+from exceptions import MqttGatewayException
+import mqtt_topics
+from vehicle import RefreshMode
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Mapping
+
+    from vehicle_info import VehicleInfo
+
+BINARY_SENSOR = "binary_sensor"
+CLIMATE = "climate"
+DEVICE_TRACKER = "device_tracker"
+LOCK = "lock"
+NUMBER = "number"
+SELECT = "select"
+SENSOR = "sensor"
+SWITCH = "switch"
+TEXT = "text"
+
+ENTITY_CATEGORIES = (None, "config", "diagnostic")
+# Optional attributes, only published when set
+ATTRIBUTES = (
+    "entity_category",
+    "device_class",
+    "state_class",
+    "unit_of_measurement",
+    "icon",
+)
+TIME_PATTERN = "^([01][0-9]|2[0-3]):[0-5][0-9]$"
+
+
+class HaAvailability(Enum):
+    # Only depends on the gateway being online
+    SYSTEM = "system"
+    # Depends on the gateway and the vehicle being online
+    VEHICLE = "vehicle"
+    # Additionally requires the value of the entity topic to be positive
+    VEHICLE_WHEN_POSITIVE = "vehicle_when_positive"
+
+
+# A topic below the vehicle, resolved when the config of a vehicle is rendered
+@dataclass(kw_only=True, frozen=True)
+class VehicleTopic:
+    topic: str
+
+
+# Everything a config can depend on besides the entity itself
+@dataclass(kw_only=True, frozen=True)
+class HaRenderContext:
+    vin_info: VehicleInfo
+    vehicle_topic: Callable[[str], str]
+
+    def entity_id(self, component: str, name: str) -> str:
+        return f"{component}.{self.vin_info.vin}_{snake_case(name)}"
+
+    def state_of(self, component: str, name: str) -> str:
+        return f"{{{{ states('{self.entity_id(component, name)}') }}}}"
+
+
+@dataclass(kw_only=True, frozen=True)
+class HaComponent:
+    has_state_topic: bool = True
+    has_command_topic: bool = True
+    has_enabled_by_default: bool = True
+    defaults: Mapping[str, Any] = field(default_factory=dict)
+    attributes: frozenset[str] = frozenset({"icon"})
+
+
+COMPONENTS: dict[str, HaComponent] = {
+    BINARY_SENSOR: HaComponent(
+        has_command_topic=False,
+        defaults={
+            "value_template": "{{ value }}",
+            "payload_on": "True",
+            "payload_off": "False",
+        },
+        attributes=frozenset({"device_class", "icon"}),
+    ),
+    CLIMATE: HaComponent(
+        has_state_topic=False,
+        has_command_topic=False,
+        has_enabled_by_default=False,
+        attributes=frozenset(),
+    ),
+    DEVICE_TRACKER: HaComponent(
+        has_state_topic=False,
+        has_command_topic=False,
+        has_enabled_by_default=False,
+        attributes=frozenset(),
+    ),
+    LOCK: HaComponent(
+        defaults={
+            "payload_lock": "True",
+            "payload_unlock": "False",
+            "state_locked": "True",
+            "state_unlocked": "False",
+            "optimistic": False,
+            "qos": 0,
+        },
+    ),
+    NUMBER: HaComponent(
+        defaults={
+            "value_template": "{{ value }}",
+            "retain": "false",
+            "mode": "auto",
+            "min": 1.0,
+            "max": 100.0,
+            "step": 1.0,
+        },
+        attributes=frozenset(ATTRIBUTES),
+    ),
+    SELECT: HaComponent(
+        defaults={
+            "value_template": "{{ value }}",
+            "command_template": "{{ value }}",
+        },
+        attributes=frozenset({"entity_category", "icon"}),
+    ),
+    SENSOR: HaComponent(
+        has_command_topic=False,
+        defaults={"value_template": "{{ value }}"},
+        attributes=frozenset(ATTRIBUTES),
+    ),
+    SWITCH: HaComponent(
+        defaults={
+            "value_template": "{{ value }}",
+            "payload_on": "True",
+            "payload_off": "False",
+            "optimistic": False,
+            "qos": 0,
+        },
+    ),
+    TEXT: HaComponent(
+        defaults={
+            "value_template": "{{ value }}",
+            "command_template": "{{ value }}",
+            "retain": "false",
+        },
+    ),
+}
+
+# Component specific options that have to be present
+REQUIRED_OPTIONS: dict[str, tuple[str, ...]] = {SELECT: ("options",)}
+
+
+def always(_vin_info: VehicleInfo) -> bool:
+    return True
+
+
+def never(_vin_info: VehicleInfo) -> bool:
+    return False
+
+
+@dataclass(kw_only=True, frozen=True)
+class HaEntity:
+    component: str
+    name: str
+    topic: str | None = None
+    # Vehicles that do not support the entity get it removed from Home Assistant
+    is_supported: Callable[[VehicleInfo], bool] = always
+    enabled: bool | Callable[[VehicleInfo], bool] = True
+    entity_category: str | None = None
+    device_class: str | None = None
+    state_class: str | None = None
+    unit_of_measurement: str | None = None
+    icon: str | None = None
+    availability: HaAvailability = HaAvailability.VEHICLE
+    # Component specific payload, values can be a VehicleTopic or depend on the render context
+    options: Mapping[str, Any] = field(default_factory=dict)
+    object_suffix: str = field(init=False, default="")
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "object_suffix", snake_case(self.name))
+
+    def render_payload(self, context: HaRenderContext) -> dict[str, Any]:
+        component = COMPONENTS[self.component]
+        payload: dict[str, Any] = {}
+        if component.has_state_topic and self.topic is not None:
+            payload["state_topic"] = context.vehicle_topic(self.topic)
+        if component.has_command_topic and self.topic is not None:
+            payload["command_topic"] = (
+                f"{context.vehicle_topic(self.topic)}/{mqtt_topics.SET_SUFFIX}"
+            )
+        payload.update(component.defaults)
+        for key, value in self.options.items():
+            payload[key] = self.__resolve(value, context)
+        if component.has_enabled_by_default:
+            payload["enabled_by_default"] = (
+                self.enabled(context.vin_info)
+                if callable(self.enabled)
+                else self.enabled
+            )
+        for attribute in ATTRIBUTES:
+            value = getattr(self, attribute)
+            if value is not None:
+                payload[attribute] = value
+        return payload
+
+    @staticmethod
+    def __resolve(value: Any, context: HaRenderContext) -> Any:
+        if isinstance(value, VehicleTopic):
+            return context.vehicle_topic(value.topic)
+        if callable(value):
+            return value(context)
+        return value
+
+    def validate(self) -> None:
+        component = COMPONENTS.get(self.component)
+        if component is None:
+            msg = f"Unknown Home Assistant component {self.component} of {self.name}"
+            raise MqttGatewayException(msg)
+        if not self.object_suffix:
+            msg = f"Home Assistant {self.component} without a name"
+            raise MqttGatewayException(msg)
+        needs_topic = component.has_state_topic or component.has_command_topic
+        if not self.topic and (
+            needs_topic or self.availability == HaAvailability.VEHICLE_WHEN_POSITIVE
+        ):
+            msg = f"Home Assistant {self.component} {self.name} needs a topic"
+            raise MqttGatewayException(msg)
+        if self.entity_category not in ENTITY_CATEGORIES:
+            msg = f"Unknown entity category {self.entity_category} of {self.name}"
+            raise MqttGatewayException(msg)
+        for attribute in ATTRIBUTES:
+            if getattr(self, attribute) is not None and attribute not in (
+                component.attributes
+            ):
+                msg = f"Home Assistant {self.component} {self.name} does not support {attribute}"
+                raise MqttGatewayException(msg)
+        for option in REQUIRED_OPTIONS.get(self.component, ()):
+            if option not in self.options:
+                msg = (
+                    f"Home Assistant {self.component} {self.name} needs option {option}"
+                )
+                raise MqttGatewayException(msg)
+
+
+def build_registry(*entities: HaEntity) -> tuple[HaEntity, ...]:
+    unique_ids: set[tuple[str, str]] = set()
+    for entity in entities:
+        entity.validate()
+        unique_id = (entity.component, entity.object_suffix)
+        if unique_id in unique_ids:
+            msg = f"Duplicate Home Assistant {entity.component} {entity.name}"
+            raise MqttGatewayException(msg)
+        unique_ids.add(unique_id)
+    return entities
+
+
+def snake_case(s: str) -> str:
+    return inflection.underscore(s.lower()).replace(" ", "_")
+
+
+def __has_level_heated_seats(vin_info: VehicleInfo) -> bool:
+    return vin_info.has_level_heated_seats
+
+
+def __has_on_off_heated_seats(vin_info: VehicleInfo) -> bool:
+    return not vin_info.has_level_heated_seats and vin_info.has_on_off_heated_seats
+
+
+def __has_sunroof(vin_info: VehicleInfo) -> bool:
+    return vin_info.has_sunroof
+
+
+def __has_fossil_fuel(vin_info: VehicleInfo) -> bool:
+    return vin_info.has_fossil_fuel
+
+
+def __supports_target_soc(vin_info: VehicleInfo) -> bool:
+    return vin_info.supports_target_soc
+
+
+def __heated_seat_level(seat: str, topic: str) -> HaEntity:
+    return HaEntity(
+        component=SELECT,
+        name=f"Heated Seat {seat} Level",
+        topic=topic,
+        is_supported=__has_level_heated_seats,
+        icon="mdi:car-seat-heater",
+        options={
+            "options": ["OFF", "LOW", "MEDIUM", "HIGH"],
+            "value_template": "{% set v = value | int %}"
+            "{% if v == 0 %}OFF"
+            "{% elif v == 1 %}LOW"
+            "{% elif v == 2 %}MEDIUM"
+            "{% else %}HIGH"
+            "{% endif %}",
+            "command_template": '{% if value == "OFF" %}0'
+            '{% elif value == "LOW" %}1'
+            '{% elif value == "MEDIUM" %}2'
+            "{% else %}3"
+            "{% endif %}",
+        },
+    )
+
+
+def __heated_seat_switch(seat: str, topic: str) -> HaEntity:
+    return HaEntity(
+        component=SWITCH,
+        name=f"Heated Seat {seat}",
+        topic=topic,
+        is_supported=__has_on_off_heated_seats,
+        icon="mdi:car-seat-heater",
+        options={"payload_off": "0", "payload_on": "1"},
+    )
+
+
+def __scheduled_charging_command(*, start_time: str, end_time: str, mode: str) -> str:
+    return json.dumps({"startTime": start_time, "endTime": end_time, "mode": mode})
+
+
+def __gateway_refresh_period(
+    topic: str, name: str, min_value: int, max_value: int
+) -> HaEntity:
+    return HaEntity(
+        component=NUMBER,
+        name=name,
+        topic=topic,
+        entity_category="config",
+        unit_of_measurement="s",
+        icon="mdi:timer",
+        availability=HaAvailability.SYSTEM,
+        options={"min": min_value, "max": max_value, "step": 1},
+    )
+
+
+def __gateway_diagnostic(topic: str, name: str, **kwargs: Any) -> HaEntity:
+    return HaEntity(
+        component=SENSOR,
+        name=name,
+        topic=topic,
+        entity_category="diagnostic",
+        availability=HaAvailability.SYSTEM,
+        **kwargs,
+    )
+
+
+def __positive_timestamp(topic: str, name: str, icon: str) -> HaEntity:
+    return HaEntity(
+        component=SENSOR,
+        name=name,
+        topic=topic,
+        device_class="timestamp",
+        icon=icon,
+        availability=HaAvailability.VEHICLE_WHEN_POSITIVE,
+        options={"value_template": "{{ value | int | timestamp_utc }}"},
+    )
+
+
+def __tyre_pressure(topic: str, name: str) -> HaEntity:
+    return HaEntity(
+        component=SENSOR,
+        name=name,
+        topic=topic,
+        device_class="pressure",
+        unit_of_measurement="bar",
+        icon="mdi:tire",
+    )
+
+
+def __door(topic: str, name: str) -> HaEntity:
+    return HaEntity(
+        component=BINARY_SENSOR,
+        name=name,
+        topic=topic,
+        device_class="door",
+        icon="mdi:car-door",
+    )
+
+
+def __energy(topic: str, name: str, **kwargs: Any) -> HaEntity:
+    return HaEntity(
+        component=SENSOR,
+        name=name,
+        topic=topic,
+        device_class="ENERGY_STORAGE",
+        state_class="measurement",
+        unit_of_measurement="kWh",
+        **kwargs,
+    )
+
+
+def __distance(topic: str, name: str, **kwargs: Any) -> HaEntity:
+    return HaEntity(
+        component=SENSOR,
+        name=name,
+        topic=topic,
+        device_class="distance",
+        unit_of_measurement="km",
+        **kwargs,
+    )
+
+
+def __measurement(
+    topic: str, name: str, device_class: str, unit: str, **kwargs: Any
+) -> HaEntity:
+    return HaEntity(
+        component=SENSOR,
+        name=name,
+        topic=topic,
+        device_class=device_class,
+        state_class="measurement",
+        unit_of_measurement=unit,
+        **kwargs,
+    )
+
+
+HA_ENTITIES: tuple[HaEntity, ...] = build_registry(
+    # Gateway Control
+    HaEntity(
+        component=SELECT,
+        name="Gateway refresh mode",
+        topic=mqtt_topics.REFRESH_MODE,
+        entity_category="config",
+        icon="mdi:refresh",
+        availability=HaAvailability.SYSTEM,
+        options={"options": [m.value for m in RefreshMode]},
+    ),
+    __gateway_refresh_period(
+        mqtt_topics.REFRESH_PERIOD_ACTIVE,
+        "Gateway active refresh period",
+        30,
+        60 * 60,
+    ),
+    __gateway_refresh_period(
+        mqtt_topics.REFRESH_PERIOD_INACTIVE,
+        "Gateway inactive refresh period",
+        1 * 60 * 60,
+        5 * 24 * 60 * 60,
+    ),
+    __gateway_refresh_period(
+        mqtt_topics.REFRESH_PERIOD_AFTER_SHUTDOWN,
+        "Gateway refresh period after car shutdown",
+        30,
+        12 * 60 * 60,
+    ),
+    __gateway_refresh_period(
+        mqtt_topics.REFRESH_PERIOD_INACTIVE_GRACE,
+        "Gateway grace period after car shutdown",
+        30,
+        12 * 60 * 60,
+    ),
+    __gateway_diagnostic(
+        mqtt_topics.REFRESH_PERIOD_CHARGING,
+        "Gateway charging refresh period",
+        unit_of_measurement="s",
+        icon="mdi:timer",
+    ),
+    __gateway_diagnostic(
+        mqtt_topics.REFRESH_PERIOD_ERROR,
+        "Gateway error refresh period",
+        unit_of_measurement="s",
+        icon="mdi:timer",
+    ),
+    __gateway_diagnostic(
+        mqtt_topics.REFRESH_LAST_ACTIVITY,
+        "Last car activity",
+        device_class="timestamp",
+    ),
+    __gateway_diagnostic(
+        mqtt_topics.REFRESH_LAST_CHARGE_STATE,
+        "Last charge state",
+        device_class="timestamp",
+    ),
+    __gateway_diagnostic(
+        mqtt_topics.REFRESH_LAST_VEHICLE_STATE,
+        "Last vehicle state",
+        device_class="timestamp",
+    ),
+    __gateway_diagnostic(
+        mqtt_topics.REFRESH_LAST_ERROR,
+        "Last poll error",
+        device_class="timestamp",
+    ),
+    __gateway_diagnostic(
+        mqtt_topics.INFO_LAST_MESSAGE_CONTENT,
+        "Last car message",
+        enabled=False,
+    ),
+    # Remote climate, split into 2 switches and a climate entity for ease of operation
+    HaEntity(
+        component=SWITCH,
+        name="Front window defroster heating",
+        topic=mqtt_topics.CLIMATE_REMOTE_CLIMATE_STATE,
+        icon="mdi:car-defrost-front",
+        options={
+            "value_template": '{% if value == "front" %}front{% else %}off{% endif %}',
+            "payload_on": "front",
+            "payload_off": "off",
+        },
+    ),
+    HaEntity(
+        component=SWITCH,
+        name="Vehicle climate fan only",
+        topic=mqtt_topics.CLIMATE_REMOTE_CLIMATE_STATE,
+        icon="mdi:fan",
+        options={
+            "value_template": '{% if value == "blowingonly" %}blowingonly{% else %}off{% endif %}',
+            "payload_on": "blowingonly",
+            "payload_off": "off",
+        },
+    ),
+    HaEntity(
+        component=CLIMATE,
+        name="Vehicle climate",
+        options={
+            "precision": 1.0,
+            "temperature_unit": "C",
+            "mode_state_topic": VehicleTopic(
+                topic=mqtt_topics.CLIMATE_REMOTE_CLIMATE_STATE
+            ),
+            "mode_command_topic": VehicleTopic(
+                topic=mqtt_topics.CLIMATE_REMOTE_CLIMATE_STATE_SET
+            ),
+            "mode_state_template": '{% if value == "on" %}auto{% else %}off{% endif %}',
+            "mode_command_template": '{% if value == "auto" %}on{% else %}off{% endif %}',
+            "modes": ["off", "auto"],
+            "current_temperature_topic": VehicleTopic(
+                topic=mqtt_topics.CLIMATE_INTERIOR_TEMPERATURE
+            ),
+            "current_temperature_template": "{{ value }}",
+            "temperature_command_topic": VehicleTopic(
+                topic=mqtt_topics.CLIMATE_REMOTE_TEMPERATURE_SET
+            ),
+            "temperature_command_template": "{{ value | int }}",
+            "temperature_state_topic": VehicleTopic(
+                topic=mqtt_topics.CLIMATE_REMOTE_TEMPERATURE
+            ),
+            "temperature_state_template": "{{ value | int }}",
+            "min_temp": lambda context: context.vin_info.min_ac_temperature,
+            "max_temp": lambda context: context.vin_info.max_ac_temperature,
+        },
+    ),
+    # Heated seats, either with levels or just on and off
+    __heated_seat_level(
+        "Front Left", mqtt_topics.CLIMATE_HEATED_SEATS_FRONT_LEFT_LEVEL
+    ),
+    __heated_seat_level(
+        "Front Right", mqtt_topics.CLIMATE_HEATED_SEATS_FRONT_RIGHT_LEVEL
+    ),
+    __heated_seat_switch(
+        "Front Left", mqtt_topics.CLIMATE_HEATED_SEATS_FRONT_LEFT_LEVEL
+    ),
+    __heated_seat_switch(
+        "Front Right", mqtt_topics.CLIMATE_HEATED_SEATS_FRONT_RIGHT_LEVEL
+    ),
+    HaEntity(
+        component=DEVICE_TRACKER,
+        name="Vehicle position",
+        options={
+            "json_attributes_topic": VehicleTopic(topic=mqtt_topics.LOCATION_POSITION)
+        },
+    ),
+    # Scheduled charging, the commands always carry the complete schedule
+    HaEntity(
+        component=SENSOR,
+        name="Scheduled Charging Start",
+        topic=mqtt_topics.DRIVETRAIN_CHARGING_SCHEDULE,
+        icon="mdi:clock-start",
+        options={"value_template": '{{ value_json["startTime"] }}'},
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="Scheduled Charging End",
+        topic=mqtt_topics.DRIVETRAIN_CHARGING_SCHEDULE,
+        icon="mdi:clock-end",
+        options={"value_template": '{{ value_json["endTime"] }}'},
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="Scheduled Charging Mode",
+        topic=mqtt_topics.DRIVETRAIN_CHARGING_SCHEDULE,
+        icon="mdi:clock-outline",
+        options={"value_template": '{{ value_json["mode"] }}'},
+    ),
+    HaEntity(
+        component=SELECT,
+        name="Scheduled Charging Mode",
+        topic=mqtt_topics.DRIVETRAIN_CHARGING_SCHEDULE,
+        icon="mdi:clock-outline",
+        options={
+            "options": [m.name for m in ScheduledChargingMode],
+            "value_template": '{{ value_json["mode"] }}',
+            "command_template": lambda context: __scheduled_charging_command(
+                start_time=context.state_of(SENSOR, "Scheduled Charging Start"),
+                end_time=context.state_of(SENSOR, "Scheduled Charging End"),
+                mode="{{ value }}",
+            ),
+        },
+    ),
+    HaEntity(
+        component=TEXT,
+        name="Scheduled Charging Start",
+        topic=mqtt_topics.DRIVETRAIN_CHARGING_SCHEDULE,
+        icon="mdi:clock-start",
+        options={
+            "value_template": '{{ value_json["startTime"] }}',
+            "command_template": lambda context: __scheduled_charging_command(
+                start_time="{{ value }}",
+                end_time=context.state_of(SENSOR, "Scheduled Charging End"),
+                mode=context.state_of(SENSOR, "Scheduled Charging Mode"),
+            ),
+            "min": 4,
+            "max": 5,
+            "pattern": TIME_PATTERN,
+        },
+    ),
+    HaEntity(
+        component=TEXT,
+        name="Scheduled Charging End",
+        topic=mqtt_topics.DRIVETRAIN_CHARGING_SCHEDULE,
+        icon="mdi:clock-end",
+        options={
+            "value_template": '{{ value_json["endTime"] }}',
+            "command_template": lambda context: __scheduled_charging_command(
+                start_time=context.state_of(SENSOR, "Scheduled Charging Start"),
+                end_time="{{ value }}",
+                mode=context.state_of(SENSOR, "Scheduled Charging Mode"),
+            ),
+            "min": 4,
+            "max": 5,
+            "pattern": TIME_PATTERN,
+        },
+    ),
+    # Scheduled battery heating, the commands always carry the complete schedule
+    HaEntity(
+        component=SENSOR,
+        name="Scheduled Battery Heating Start",
+        topic=mqtt_topics.DRIVETRAIN_BATTERY_HEATING_SCHEDULE,
+        icon="mdi:clock-start",
+        options={"value_template": '{{ value_json["startTime"] }}'},
+    ),
+    HaEntity(
+        component=BINARY_SENSOR,
+        name="Scheduled Battery Heating",
+        topic=mqtt_topics.DRIVETRAIN_BATTERY_HEATING_SCHEDULE,
+        icon="mdi:clock-outline",
+        options={
+            "value_template": '{{ value_json["mode"] }}',
+            "payload_on": "on",
+            "payload_off": "off",
+        },
+    ),
+    HaEntity(
+        component=SELECT,
+        name="Scheduled Battery Heating",
+        topic=mqtt_topics.DRIVETRAIN_BATTERY_HEATING_SCHEDULE,
+        icon="mdi:clock-outline",
+        options={
+            "options": ["on", "off"],
+            "value_template": '{{ value_json["mode"] }}',
+            "command_template": lambda context: json.dumps(
+                {
+                    "startTime": context.state_of(
+                        SENSOR, "Scheduled Battery Heating Start"
+                    ),
+                    "mode": "{{ value }}",
+                }
+            ),
+        },
+    ),
+    HaEntity(
+        component=TEXT,
+        name="Scheduled Battery Heating Start",
+        topic=mqtt_topics.DRIVETRAIN_BATTERY_HEATING_SCHEDULE,
+        icon="mdi:clock-start",
+        options={
+            "value_template": '{{ value_json["startTime"] }}',
+            "command_template": lambda context: json.dumps(
+                {
+                    "startTime": "{{ value }}",
+                    "mode": context.state_of(
+                        BINARY_SENSOR, "Scheduled Battery Heating"
+                    ),
+                }
+            ),
+            "min": 4,
+            "max": 5,
+            "pattern": TIME_PATTERN,
+        },
+    ),
+    # Switches
+    HaEntity(component=SWITCH, name="Charging", topic=mqtt_topics.DRIVETRAIN_CHARGING),
+    HaEntity(
+        component=SWITCH,
+        name="Battery heating",
+        topic=mqtt_topics.DRIVETRAIN_BATTERY_HEATING,
+        icon="mdi:heat-wave",
+    ),
+    HaEntity(component=SWITCH, name="Window driver", topic=mqtt_topics.WINDOWS_DRIVER),
+    HaEntity(
+        component=SWITCH, name="Window passenger", topic=mqtt_topics.WINDOWS_PASSENGER
+    ),
+    HaEntity(
+        component=SWITCH, name="Window rear left", topic=mqtt_topics.WINDOWS_REAR_LEFT
+    ),
+    HaEntity(
+        component=SWITCH,
+        name="Window rear right",
+        topic=mqtt_topics.WINDOWS_REAR_RIGHT,
+    ),
+    HaEntity(
+        component=SWITCH,
+        name="Sun roof",
+        topic=mqtt_topics.WINDOWS_SUN_ROOF,
+        is_supported=__has_sunroof,
+    ),
+    HaEntity(
+        component=BINARY_SENSOR,
+        name="Sun roof",
+        topic=mqtt_topics.WINDOWS_SUN_ROOF,
+        is_supported=__has_sunroof,
+    ),
+    HaEntity(
+        component=SWITCH,
+        name="Rear window defroster heating",
+        topic=mqtt_topics.CLIMATE_BACK_WINDOW_HEAT,
+        icon="mdi:car-defrost-rear",
+        options={"payload_on": "on", "payload_off": "off"},
+    ),
+    HaEntity(
+        component=SWITCH,
+        name="Find my car",
+        topic=mqtt_topics.LOCATION_FIND_MY_CAR,
+        icon="mdi:car-search",
+        options={"payload_on": "activate", "payload_off": "stop"},
+    ),
+    # Locks
+    HaEntity(
+        component=LOCK,
+        name="Doors Lock",
+        topic=mqtt_topics.DOORS_LOCKED,
+        icon="mdi:car-door-lock",
+    ),
+    HaEntity(
+        component=LOCK,
+        name="Boot Lock",
+        topic=mqtt_topics.DOORS_BOOT,
+        icon="mdi:car-door-lock",
+        options={"state_locked": "False", "state_unlocked": "True"},
+    ),
+    HaEntity(
+        component=LOCK,
+        name="Charging Cable Lock",
+        topic=mqtt_topics.DRIVETRAIN_CHARGING_CABLE_LOCK,
+        icon="mdi:lock",
+    ),
+    # Charging configuration
+    HaEntity(
+        component=NUMBER,
+        name="Target SoC",
+        topic=mqtt_topics.DRIVETRAIN_SOC_TARGET,
+        enabled=__supports_target_soc,
+        device_class="battery",
+        unit_of_measurement="%",
+        icon="mdi:battery-charging-70",
+        options={"min": 40, "max": 100, "step": 10, "mode": "slider"},
+    ),
+    HaEntity(
+        component=SELECT,
+        name="Charge current limit",
+        topic=mqtt_topics.DRIVETRAIN_CHARGECURRENT_LIMIT,
+        icon="mdi:current-ac",
+        options={
+            "options": [
+                m.limit
+                for m in ChargeCurrentLimitCode
+                if m != ChargeCurrentLimitCode.C_IGNORE
+            ]
+        },
+    ),
+    # Standard sensors
+    __measurement(mqtt_topics.DRIVETRAIN_SOC, "SoC", "battery", "%"),
+    __energy(mqtt_topics.DRIVETRAIN_SOC_KWH, "SoC_kWh", icon="mdi:battery-charging-70"),
+    __energy(
+        mqtt_topics.DRIVETRAIN_TOTAL_BATTERY_CAPACITY,
+        "Total Battery Capacity",
+        icon="mdi:battery-high",
+        entity_category="diagnostic",
+    ),
+    __energy(
+        mqtt_topics.DRIVETRAIN_LAST_CHARGE_ENDING_POWER,
+        "Last Charge SoC kWh",
+        icon="mdi:battery-charging-70",
+    ),
+    __energy(
+        mqtt_topics.DRIVETRAIN_POWER_USAGE_SINCE_LAST_CHARGE,
+        "Energy Usage Since Last Charge",
+        icon="mdi:battery-charging-70",
+        enabled=False,
+    ),
+    __energy(
+        mqtt_topics.DRIVETRAIN_POWER_USAGE_OF_DAY,
+        "Energy Usage of the Day",
+        icon="mdi:battery-charging-70",
+        enabled=False,
+    ),
+    __measurement(
+        mqtt_topics.DRIVETRAIN_REMAINING_CHARGING_TIME,
+        "Remaining charging time",
+        "duration",
+        "s",
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="Charging finished",
+        topic=mqtt_topics.DRIVETRAIN_REMAINING_CHARGING_TIME,
+        device_class="timestamp",
+        availability=HaAvailability.VEHICLE_WHEN_POSITIVE,
+        options={
+            "value_template": "{{ (now() + timedelta(seconds = value | int)).isoformat() }}"
+        },
+    ),
+    __positive_timestamp(
+        mqtt_topics.DRIVETRAIN_CHARGING_LAST_START,
+        "Last Charge Start Time",
+        "mdi:clock-start",
+    ),
+    __positive_timestamp(
+        mqtt_topics.DRIVETRAIN_CHARGING_LAST_END,
+        "Last Charge End Time",
+        "mdi:clock-end",
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="Charging Mode",
+        topic=mqtt_topics.DRIVETRAIN_CHARGING_TYPE,
+        entity_category="diagnostic",
+        enabled=False,
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="BMS Charge Status",
+        topic=mqtt_topics.BMS_CHARGE_STATUS,
+        entity_category="diagnostic",
+        enabled=False,
+    ),
+    __distance(
+        mqtt_topics.DRIVETRAIN_MILEAGE, "Mileage", state_class="total_increasing"
+    ),
+    __distance(
+        mqtt_topics.DRIVETRAIN_MILEAGE_OF_DAY,
+        "Mileage of the day",
+        state_class="total_increasing",
+        enabled=False,
+    ),
+    __distance(
+        mqtt_topics.DRIVETRAIN_MILEAGE_SINCE_LAST_CHARGE,
+        "Mileage since last charge",
+        state_class="total_increasing",
+        enabled=False,
+    ),
+    __distance(
+        mqtt_topics.DRIVETRAIN_CURRENT_JOURNEY,
+        "Mileage of journey",
+        state_class="total_increasing",
+        enabled=False,
+        options={"value_template": '{{ value_json["distance"] | int(0) }}'},
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="Identifier of journey",
+        topic=mqtt_topics.DRIVETRAIN_CURRENT_JOURNEY,
+        enabled=False,
+        options={"value_template": '{{ value_json["id"] | int(0) }}'},
+    ),
+    __measurement(
+        mqtt_topics.DRIVETRAIN_AUXILIARY_BATTERY_VOLTAGE,
+        "Auxiliary battery voltage",
+        "voltage",
+        "V",
+        icon="mdi:car-battery",
+    ),
+    __distance(mqtt_topics.DRIVETRAIN_RANGE, "Range"),
+    __distance(
+        mqtt_topics.DRIVETRAIN_FOSSIL_FUEL_RANGE,
+        "Fossil fuel range",
+        enabled=__has_fossil_fuel,
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="Fossil fuel percentage",
+        topic=mqtt_topics.DRIVETRAIN_FOSSIL_FUEL_PERCENTAGE,
+        enabled=__has_fossil_fuel,
+        state_class="measurement",
+        unit_of_measurement="%",
+        icon="mdi:fuel",
+    ),
+    __measurement(mqtt_topics.DRIVETRAIN_CURRENT, "Current", "current", "A"),
+    __measurement(mqtt_topics.DRIVETRAIN_VOLTAGE, "Voltage", "voltage", "V"),
+    __measurement(mqtt_topics.DRIVETRAIN_POWER, "Power", "power", "kW"),
+    __measurement(
+        mqtt_topics.OBC_CURRENT,
+        "OBC Current",
+        "current",
+        "A",
+        entity_category="diagnostic",
+        enabled=False,
+    ),
+    __measurement(
+        mqtt_topics.OBC_VOLTAGE,
+        "OBC Voltage",
+        "voltage",
+        "V",
+        entity_category="diagnostic",
+        enabled=False,
+    ),
+    __measurement(
+        mqtt_topics.OBC_POWER_SINGLE_PHASE,
+        "OBC Power Single Phase",
+        "power",
+        "W",
+        entity_category="diagnostic",
+        enabled=False,
+    ),
+    __measurement(
+        mqtt_topics.OBC_POWER_THREE_PHASE,
+        "OBC Power Three Phase",
+        "power",
+        "W",
+        entity_category="diagnostic",
+        enabled=False,
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="CCU Onboard Plug Status",
+        topic=mqtt_topics.CCU_ONBOARD_PLUG_STATUS,
+        state_class="measurement",
+        entity_category="diagnostic",
+        enabled=False,
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="CCU Offboard Plug Status",
+        topic=mqtt_topics.CCU_OFFBOARD_PLUG_STATUS,
+        state_class="measurement",
+        entity_category="diagnostic",
+        enabled=False,
+    ),
+    __measurement(
+        mqtt_topics.CLIMATE_INTERIOR_TEMPERATURE,
+        "Interior temperature",
+        "temperature",
+        "°C",
+    ),
+    __measurement(
+        mqtt_topics.CLIMATE_EXTERIOR_TEMPERATURE,
+        "Exterior temperature",
+        "temperature",
+        "°C",
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="Remote climate state",
+        topic=mqtt_topics.CLIMATE_REMOTE_CLIMATE_STATE,
+        icon="mdi:car-connected",
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="Rear window defroster heating",
+        topic=mqtt_topics.CLIMATE_BACK_WINDOW_HEAT,
+        icon="mdi:car-defrost-rear",
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="Heading",
+        topic=mqtt_topics.LOCATION_HEADING,
+        icon="mdi:compass",
+        unit_of_measurement="°",
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="Vehicle speed",
+        topic=mqtt_topics.LOCATION_SPEED,
+        device_class="speed",
+        unit_of_measurement="km/h",
+    ),
+    __tyre_pressure(mqtt_topics.TYRES_FRONT_LEFT_PRESSURE, "Tyres front left pressure"),
+    __tyre_pressure(
+        mqtt_topics.TYRES_FRONT_RIGHT_PRESSURE, "Tyres front right pressure"
+    ),
+    __tyre_pressure(mqtt_topics.TYRES_REAR_LEFT_PRESSURE, "Tyres rear left pressure"),
+    __tyre_pressure(mqtt_topics.TYRES_REAR_RIGHT_PRESSURE, "Tyres rear right pressure"),
+    # Binary sensors
+    HaEntity(
+        component=BINARY_SENSOR,
+        name="Charger connected",
+        topic=mqtt_topics.DRIVETRAIN_CHARGER_CONNECTED,
+        device_class="plug",
+        icon="mdi:power-plug-battery",
+    ),
+    HaEntity(
+        component=BINARY_SENSOR,
+        name="HV Battery Active",
+        topic=mqtt_topics.DRIVETRAIN_HV_BATTERY_ACTIVE,
+        device_class="power",
+        icon="mdi:battery-check",
+    ),
+    HaEntity(
+        component=BINARY_SENSOR,
+        name="Battery Charging",
+        topic=mqtt_topics.DRIVETRAIN_CHARGING,
+        device_class="battery_charging",
+        icon="mdi:battery-charging",
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="Battery charging stop reason",
+        topic=mqtt_topics.DRIVETRAIN_CHARGING_STOP_REASON,
+        icon="mdi:battery-charging",
+        enabled=False,
+    ),
+    HaEntity(
+        component=BINARY_SENSOR,
+        name="Battery heating",
+        topic=mqtt_topics.DRIVETRAIN_BATTERY_HEATING,
+        icon="mdi:heat-wave",
+    ),
+    HaEntity(
+        component=SENSOR,
+        name="Battery heating stop reason",
+        topic=mqtt_topics.DRIVETRAIN_BATTERY_HEATING_STOP_REASON,
+        icon="mdi:heat-wave",
+        enabled=False,
+    ),
+    HaEntity(
+        component=BINARY_SENSOR,
+        name="Vehicle Running",
+        topic=mqtt_topics.DRIVETRAIN_RUNNING,
+        device_class="running",
+        icon="mdi:car-side",
+    ),
+    __door(mqtt_topics.DOORS_DRIVER, "Door driver"),
+    __door(mqtt_topics.DOORS_PASSENGER, "Door passenger"),
+    __door(mqtt_topics.DOORS_REAR_LEFT, "Door rear left"),
+    __door(mqtt_topics.DOORS_REAR_RIGHT, "Door rear right"),
+    __door(mqtt_topics.DOORS_BONNET, "Bonnet"),
+    __door(mqtt_topics.DOORS_BOOT, "Boot"),
+    HaEntity(
+        component=BINARY_SENSOR,
+        name="Lights Main Beam",
+        topic=mqtt_topics.LIGHTS_MAIN_BEAM,
+        device_class="light",
+        icon="mdi:car-light-high",
+    ),
+    HaEntity(
+        component=BINARY_SENSOR,
+        name="Lights Dipped Beam",
+        topic=mqtt_topics.LIGHTS_DIPPED_BEAM,
+        device_class="light",
+        icon="mdi:car-light-dimmed",
+    ),
+    HaEntity(
+        component=BINARY_SENSOR,
+        name="Lights Side",
+        topic=mqtt_topics.LIGHTS_SIDE,
+        device_class="light",
+        icon="mdi:car-light-dimmed",
+    ),
+    # Deprecated entities that are removed from Home Assistant
+    HaEntity(
+        component=SENSOR,
+        name="Front window defroster heating",
+        topic=mqtt_topics.CLIMATE_REMOTE_CLIMATE_STATE,
+        is_supported=never,
+    ),
+)
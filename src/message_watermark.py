@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import datetime
+import json
+import logging
+from pathlib import Path
+
+from utils import atomic_write_json
+
+LOG = logging.getLogger(__name__)
+
+
+# The newest alarm message that has already been handled
+@dataclass(kw_only=True, frozen=True)
+class MessageWatermark:
+    message_time: datetime.datetime
+    message_id: str | int | None = None
+
+
+# Keeps the watermark in a JSON file so that a restart does not walk the whole inbox again
+class MessageWatermarkStore:
+    def __init__(self, path: str) -> None:
+        self.__path = Path(path)
+        self.__watermark = self.__load()
+
+    def get(self) -> MessageWatermark | None:
+        return self.__watermark
+
+    def save(self, watermark: MessageWatermark) -> None:
+        if self.__watermark == watermark:
+            return
+        self.__watermark = watermark
+        try:
+            atomic_write_json(
+                self.__path,
+                {
+                    "message_time": watermark.message_time.isoformat(),
+                    "message_id": watermark.message_id,
+                },
+            )
+        except OSError as e:
+            LOG.exception(
+                f"Could not write message watermark to {self.__path}", exc_info=e
+            )
+
+    def __load(self) -> MessageWatermark | None:
+        if not self.__path.exists():
+            return None
+        try:
+            data = json.loads(self.__path.read_text(encoding="utf-8"))
+            return MessageWatermark(
+                message_time=datetime.datetime.fromisoformat(data["message_time"]),
+                message_id=data.get("message_id"),
+            )
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            LOG.exception(
+                f"Ignoring unreadable message watermark at {self.__path}", exc_info=e
+            )
+            return None
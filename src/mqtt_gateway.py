@@ -4,22 +4,33 @@ import asyncio
 from asyncio import Task
 import logging
 from random import uniform
+import time
 from typing import TYPE_CHECKING, Any, override
 
 import apscheduler.schedulers.asyncio
-from saic_ismart_client_ng import SaicApi
 from saic_ismart_client_ng.api.vehicle.alarm import AlarmType
 from saic_ismart_client_ng.model import SaicApiConfiguration
 
 from exceptions import MqttGatewayException
 from handlers.message import MessageHandler
+from handlers.refresh_scheduler import FleetRefreshScheduler
 from handlers.relogin import ReloginHandler
 from handlers.vehicle import VehicleHandler, VehicleHandlerLocator
+from message_watermark import MessageWatermarkStore
 import mqtt_topics
 from publisher.core import MqttCommandListener, Publisher
+from publisher.fan_out_publisher import FanOutPublisher
 from publisher.log_publisher import ConsolePublisher
 from publisher.mqtt_publisher import MqttPublisher
+from saic_api_limiter import (
+    SaicApiLimiter,
+    SaicCallPriority,
+    ThrottledSaicApi,
+    saic_call_priority,
+)
 from saic_api_listener import MqttGatewaySaicApiListener
+from startup_cache import StartupCache
+from state_snapshot import StateSnapshotStore
 from vehicle import VehicleState
 from vehicle_info import VehicleInfo
 
@@ -30,6 +41,8 @@ if TYPE_CHECKING:
     from integrations.openwb.charging_station import ChargingStation
 
 MSG_CMD_SUCCESSFUL = "Success"
+MESSAGE_HANDLER_JOB_ID = "message_handler"
+STATISTICS_PUBLISH_INTERVAL = 5 * 60  # in seconds
 
 LOG = logging.getLogger(__name__)
 
@@ -38,6 +51,19 @@ class MqttGateway(MqttCommandListener, VehicleHandlerLocator):
     def __init__(self, config: Configuration) -> None:
         self.configuration = config
         self.__vehicle_handlers: dict[str, VehicleHandler] = {}
+        self.__refresh_scheduler = FleetRefreshScheduler(workers=config.refresh_workers)
+        self.__snapshot_store = (
+            StateSnapshotStore(config.state_snapshot_path)
+            if config.state_snapshot_path
+            else None
+        )
+        self.__startup_cache = (
+            StartupCache(config.startup_cache_path)
+            if config.startup_cache_path
+            else None
+        )
+        self.__startup_time = time.monotonic()
+        self.__time_to_first_publish: float | None = None
         self.publisher = self.__select_publisher()
         self.publisher.command_listener = self
         if config.publish_raw_api_data:
@@ -48,7 +74,7 @@ class MqttGateway(MqttCommandListener, VehicleHandlerLocator):
         if not self.configuration.saic_user or not self.configuration.saic_password:
             raise MqttGatewayException("Please configure saic username and password")
 
-        self.saic_api = SaicApi(
+        self.saic_api = ThrottledSaicApi(
             configuration=SaicApiConfiguration(
                 username=self.configuration.saic_user,
                 password=self.configuration.saic_password,
@@ -60,6 +86,12 @@ class MqttGateway(MqttCommandListener, VehicleHandlerLocator):
                 read_timeout=self.configuration.saic_read_timeout,
             ),
             listener=listener,
+            limiter=SaicApiLimiter(
+                max_concurrent=config.saic_max_concurrent_requests,
+                requests_per_window=config.saic_requests_per_minute,
+                window=60.0,
+                backoff=config.saic_throttle_backoff,
+            ),
         )
         self.__scheduler = apscheduler.schedulers.asyncio.AsyncIOScheduler()
         self.__relogin_handler = ReloginHandler(
@@ -67,43 +99,159 @@ class MqttGateway(MqttCommandListener, VehicleHandlerLocator):
             api=self.saic_api,
             scheduler=self.__scheduler,
         )
+        self.__message_handler = MessageHandler(
+            gateway=self,
+            relogin_handler=self.__relogin_handler,
+            saicapi=self.saic_api,
+            page_size=config.messages_page_size,
+            watermark_store=(
+                MessageWatermarkStore(config.messages_watermark_path)
+                if config.messages_watermark_path
+                else None
+            ),
+            request_interval=config.messages_request_interval,
+            max_request_interval=(
+                config.messages_request_interval_max or config.messages_request_interval
+            ),
+        )
 
     def __select_publisher(self) -> Publisher:
         if self.configuration.is_mqtt_enabled:
+            if self.configuration.mqtt_additional_brokers:
+                return FanOutPublisher(self.configuration)
             return MqttPublisher(self.configuration)
         LOG.warning("MQTT support disabled")
         return ConsolePublisher(self.configuration)
 
     async def run(self) -> None:
+        self.__startup_time = time.monotonic()
         message_request_interval = self.configuration.messages_request_interval
-        await self.__do_initial_login(message_request_interval)
-
-        LOG.info("Fetching vehicle list")
-        vin_list = await self.saic_api.vehicle_list()
+        # Vehicles register their command topics as soon as they are set up
+        LOG.info("Connecting to MQTT Broker")
+        await asyncio.gather(
+            self.__do_initial_login(message_request_interval),
+            self.publisher.connect(),
+        )
 
-        alarm_switches = list(AlarmType)
+        vin_list = await self.__fetch_vehicle_list()
 
-        for vin_info in vin_list.vinList:
-            await self.setup_vehicle(alarm_switches, vin_info)
-        message_handler = MessageHandler(
-            gateway=self, relogin_handler=self.__relogin_handler, saicapi=self.saic_api
-        )
         self.__scheduler.add_job(
-            func=message_handler.check_for_new_messages,
+            func=self.publish_statistics,
             trigger="interval",
-            seconds=message_request_interval,
-            id="message_handler",
-            name="Check for new messages",
+            seconds=STATISTICS_PUBLISH_INTERVAL,
+            id="publisher_statistics",
+            name="Publish publisher statistics",
             max_instances=1,
         )
-        LOG.info("Connecting to MQTT Broker")
-        await self.publisher.connect()
-
         LOG.info("Starting scheduler")
         self.__scheduler.start()
+        refresh_task = asyncio.create_task(
+            self.__refresh_scheduler.run(), name="fleet_refresh_scheduler"
+        )
+
+        await self.__setup_vehicles(list(AlarmType), vin_list)
+
+        self.__message_handler.adapt_request_interval(back_off=False)
+        self.__scheduler.add_job(
+            func=self.__check_for_new_messages,
+            trigger="interval",
+            seconds=self.__message_handler.request_interval,
+            id=MESSAGE_HANDLER_JOB_ID,
+            name="Check for new messages",
+            max_instances=1,
+        )
+        self.__publish_message_request_interval()
 
         LOG.info("Entering main loop")
-        await self.__main_loop()
+        await self.__shutdown_handler([refresh_task])
+
+    async def __fetch_vehicle_list(self) -> list[VinInfo]:
+        LOG.info("Fetching vehicle list")
+        try:
+            vin_list = (await self.saic_api.vehicle_list()).vinList
+        except Exception as e:
+            cached_vin_list = (
+                self.__startup_cache.get_vehicle_list()
+                if self.__startup_cache
+                else None
+            )
+            if cached_vin_list is None:
+                raise
+            LOG.exception(
+                "Could not fetch vehicle list, using the cached one", exc_info=e
+            )
+            return cached_vin_list
+        if self.__startup_cache:
+            self.__startup_cache.set_vehicle_list(vin_list)
+        return vin_list
+
+    async def __setup_vehicles(
+        self, alarm_switches: list[AlarmType], vin_list: list[VinInfo]
+    ) -> None:
+        semaphore = asyncio.Semaphore(self.configuration.vehicle_setup_concurrency)
+
+        async def setup_and_start(vin_info: VinInfo) -> None:
+            async with semaphore:
+                vehicle_handler = await self.setup_vehicle(alarm_switches, vin_info)
+            if vehicle_handler is not None:
+                self.__start_vehicle(vehicle_handler)
+
+        await asyncio.gather(*(setup_and_start(vin_info) for vin_info in vin_list))
+
+    def __start_vehicle(self, vehicle_handler: VehicleHandler) -> None:
+        LOG.info(f"Starting process for car {vehicle_handler.vin}")
+        vehicle_handler.start()
+        self.__refresh_scheduler.add_vehicle(vehicle_handler)
+        if self.__time_to_first_publish is None:
+            self.__time_to_first_publish = time.monotonic() - self.__startup_time
+            LOG.info(
+                f"First vehicle published {self.__time_to_first_publish:.1f} seconds after startup"
+            )
+            self.__publish_time_to_first_publish()
+
+    def __publish_time_to_first_publish(self) -> None:
+        if self.__time_to_first_publish is not None:
+            self.publisher.publish_float(
+                mqtt_topics.INTERNAL_STATS_TIME_TO_FIRST_PUBLISH,
+                round(self.__time_to_first_publish, 3),
+                False,
+            )
+
+    async def __check_for_new_messages(self) -> None:
+        await self.__message_handler.check_for_new_messages()
+        self.__adapt_message_request_interval(back_off=True)
+
+    def __adapt_message_request_interval(self, *, back_off: bool) -> None:
+        # The job is only added once all vehicles are set up
+        if self.__scheduler.get_job(MESSAGE_HANDLER_JOB_ID) is None:
+            return
+        if not self.__message_handler.adapt_request_interval(back_off=back_off):
+            return
+        request_interval = self.__message_handler.request_interval
+        LOG.info(f"Checking for new messages every {request_interval} seconds")
+        self.__scheduler.reschedule_job(
+            MESSAGE_HANDLER_JOB_ID, trigger="interval", seconds=request_interval
+        )
+        self.__publish_message_request_interval()
+
+    def __publish_message_request_interval(self) -> None:
+        self.publisher.publish_int(
+            mqtt_topics.INTERNAL_MESSAGES_REQUEST_INTERVAL,
+            self.__message_handler.request_interval,
+            False,
+        )
+
+    def __on_vehicle_state_changed(self, vin: str) -> None:
+        self.__refresh_scheduler.schedule(vin)
+        # An active vehicle should not wait for a backed off message check
+        self.__adapt_message_request_interval(back_off=False)
+
+    def publish_statistics(self) -> None:
+        self.publisher.publish_statistics()
+        self.__publish_time_to_first_publish()
+        self.__publish_message_request_interval()
+        for vehicle_handler in self.vehicle_handlers.values():
+            vehicle_handler.publish_statistics()
 
     async def __do_initial_login(self, message_request_interval: int) -> None:
         while True:
@@ -120,10 +268,10 @@ class MqttGateway(MqttCommandListener, VehicleHandlerLocator):
 
     async def setup_vehicle(
         self, alarm_switches: list[AlarmType], original_vin_info: VinInfo
-    ) -> None:
+    ) -> VehicleHandler | None:
         if not original_vin_info.vin:
             LOG.error("Skipping vehicle setup due to no vin: %s", original_vin_info)
-            return
+            return None
 
         total_battery_capacity = self.configuration.battery_capacity_map.get(
             original_vin_info.vin, None
@@ -131,22 +279,14 @@ class MqttGateway(MqttCommandListener, VehicleHandlerLocator):
 
         vin_info = VehicleInfo(original_vin_info, total_battery_capacity)
 
-        try:
+        if self.__startup_cache and self.__startup_cache.is_registered_for_alarms(
+            vin_info.vin, alarm_switches
+        ):
             LOG.info(
-                f"Registering for {[x.name for x in alarm_switches]} messages. vin={vin_info.vin}"
-            )
-            await self.saic_api.set_alarm_switches(
-                alarm_switches=alarm_switches, vin=vin_info.vin
+                f"Already registered for {[x.name for x in alarm_switches]} messages. vin={vin_info.vin}"
             )
-            LOG.info(
-                f"Registered for {[x.name for x in alarm_switches]} messages. vin={vin_info.vin}"
-            )
-        except Exception as e:
-            LOG.exception(
-                f"Failed to register for {[x.name for x in alarm_switches]} messages. vin={vin_info.vin}",
-                exc_info=e,
-            )
-            raise SystemExit("Failed to register for API messages") from e
+        else:
+            await self.__register_for_alarms(alarm_switches, vin_info.vin)
         account_prefix = (
             f"{self.configuration.saic_user}/{mqtt_topics.VEHICLES}/{vin_info.vin}"
         )
@@ -170,6 +310,7 @@ class MqttGateway(MqttCommandListener, VehicleHandlerLocator):
             vin_info,
             charging_station,
             charge_polling_min_percent=self.configuration.charge_dynamic_polling_min_percentage,
+            publish_state_document=self.configuration.publish_state_document,
         )
         vehicle_handler = VehicleHandler(
             self.configuration,
@@ -178,8 +319,36 @@ class MqttGateway(MqttCommandListener, VehicleHandlerLocator):
             self.publisher,  # Gateway pointer
             vin_info,
             vehicle_state,
+            snapshot_store=self.__snapshot_store,
         )
         self.vehicle_handlers[vin_info.vin] = vehicle_handler
+        vehicle_state.refresh_trigger_listener = (
+            lambda: self.__on_vehicle_state_changed(vin_info.vin)
+        )
+        self.publisher.register_vehicle(vin_info.vin)
+        return vehicle_handler
+
+    async def __register_for_alarms(
+        self, alarm_switches: list[AlarmType], vin: str
+    ) -> None:
+        try:
+            LOG.info(
+                f"Registering for {[x.name for x in alarm_switches]} messages. vin={vin}"
+            )
+            await self.saic_api.set_alarm_switches(
+                alarm_switches=alarm_switches, vin=vin
+            )
+            LOG.info(
+                f"Registered for {[x.name for x in alarm_switches]} messages. vin={vin}"
+            )
+        except Exception as e:
+            LOG.exception(
+                f"Failed to register for {[x.name for x in alarm_switches]} messages. vin={vin}",
+                exc_info=e,
+            )
+            raise SystemExit("Failed to register for API messages") from e
+        if self.__startup_cache:
+            self.__startup_cache.set_registered_for_alarms(vin, alarm_switches)
 
     @override
     def get_vehicle_handler(self, vin: str) -> VehicleHandler | None:
@@ -195,11 +364,14 @@ class MqttGateway(MqttCommandListener, VehicleHandlerLocator):
 
     @override
     async def on_mqtt_command_received(
-        self, *, vin: str, topic: str, payload: str
+        self, *, vin: str, command: str, payload: str
     ) -> None:
         vehicle_handler = self.get_vehicle_handler(vin)
         if vehicle_handler:
-            await vehicle_handler.handle_mqtt_command(topic=topic, payload=payload)
+            with saic_call_priority(SaicCallPriority.COMMAND):
+                await vehicle_handler.handle_mqtt_command(
+                    command=command, payload=payload
+                )
         else:
             LOG.debug(f"Command for unknown vin {vin} received")
 
@@ -221,7 +393,8 @@ class MqttGateway(MqttCommandListener, VehicleHandlerLocator):
         match topic:
             case self.configuration.ha_lwt_topic:
                 if payload == "online":
-                    for vin, vh in self.vehicle_handlers.items():
+                    # Vehicles set up in parallel may register while this loop sleeps
+                    for vin, vh in list(self.vehicle_handlers.items()):
                         # wait randomly between 0.1 and 10 seconds before sending discovery
                         await asyncio.sleep(uniform(0.1, 10.0))  # noqa: S311
                         LOG.debug(f"Send HomeAssistant discovery for car {vin}")
@@ -234,17 +407,6 @@ class MqttGateway(MqttCommandListener, VehicleHandlerLocator):
             return self.configuration.charging_stations_by_vin[vin]
         return None
 
-    async def __main_loop(self) -> None:
-        tasks = []
-        for key, vh in self.vehicle_handlers.items():
-            LOG.info(f"Starting process for car {key}")
-            task = asyncio.create_task(
-                vh.handle_vehicle(), name=f"handle_vehicle_{key}"
-            )
-            tasks.append(task)
-
-        await self.__shutdown_handler(tasks)
-
     @staticmethod
     async def __shutdown_handler(tasks: list[Task[Any]]) -> None:
         while True:
@@ -131,6 +131,15 @@ INTERNAL_LWT = INTERNAL + "/lwt"
 INTERNAL_ABRP = INTERNAL + "/abrp"
 INTERNAL_OSMAND = INTERNAL + "/osmand"
 INTERNAL_CONFIGURATION_RAW = INTERNAL + "/configuration/raw"
+INTERNAL_MESSAGES_REQUEST_INTERVAL = INTERNAL + "/messages/requestInterval"
+INTERNAL_STATS = INTERNAL + "/stats"
+INTERNAL_STATS_PUBLISHED = INTERNAL_STATS + "/published"
+INTERNAL_STATS_SUPPRESSED = INTERNAL_STATS + "/suppressed"
+INTERNAL_STATS_DROPPED = INTERNAL_STATS + "/dropped"
+INTERNAL_STATS_QUEUE_DEPTH = INTERNAL_STATS + "/queueDepth"
+INTERNAL_STATS_RATE_LIMIT = INTERNAL_STATS + "/rateLimit"
+INTERNAL_STATS_COALESCED_CALLS = INTERNAL_STATS + "/coalescedCalls"
+INTERNAL_STATS_TIME_TO_FIRST_PUBLISH = INTERNAL_STATS + "/timeToFirstPublish"
 
 LOCATION = "location"
 LOCATION_POSITION = LOCATION + "/position"
@@ -161,6 +170,8 @@ REFRESH_PERIOD_INACTIVE_GRACE = REFRESH_PERIOD + "/inActiveGrace"
 REFRESH_PERIOD_INACTIVE_GRACE_SET = REFRESH_PERIOD_INACTIVE_GRACE + "/" + SET_SUFFIX
 REFRESH_PERIOD_ERROR = REFRESH_PERIOD + "/error"
 
+STATE = "state"
+
 TYRES = "tyres"
 TYRES_FRONT_LEFT_PRESSURE = TYRES + "/frontLeftPressure"
 TYRES_FRONT_RIGHT_PRESSURE = TYRES + "/frontRightPressure"
@@ -168,3 +179,37 @@ TYRES_REAR_LEFT_PRESSURE = TYRES + "/rearLeftPressure"
 TYRES_REAR_RIGHT_PRESSURE = TYRES + "/rearRightPressure"
 
 VEHICLES = "vehicles"
+
+# Telemetry that is meaningless once it gets old, published with an expiry when supported
+TRANSIENT_TOPICS = (
+    DRIVETRAIN_CURRENT,
+    DRIVETRAIN_POWER,
+    DRIVETRAIN_VOLTAGE,
+    LOCATION_SPEED,
+)
+
+# Commands accepted on the vehicles/<VIN>/... topics
+VEHICLE_COMMAND_TOPICS = (
+    CLIMATE_BACK_WINDOW_HEAT_SET,
+    CLIMATE_FRONT_WINDOW_HEAT_SET,
+    CLIMATE_REMOTE_CLIMATE_STATE_SET,
+    CLIMATE_REMOTE_TEMPERATURE_SET,
+    CLIMATE_HEATED_SEATS_FRONT_LEFT_LEVEL_SET,
+    CLIMATE_HEATED_SEATS_FRONT_RIGHT_LEVEL_SET,
+    DOORS_BOOT_SET,
+    DOORS_LOCKED_SET,
+    DRIVETRAIN_CHARGING_SET,
+    DRIVETRAIN_BATTERY_HEATING_SET,
+    DRIVETRAIN_CHARGING_SCHEDULE_SET,
+    DRIVETRAIN_BATTERY_HEATING_SCHEDULE_SET,
+    DRIVETRAIN_HV_BATTERY_ACTIVE_SET,
+    DRIVETRAIN_SOC_TARGET_SET,
+    DRIVETRAIN_CHARGECURRENT_LIMIT_SET,
+    DRIVETRAIN_CHARGING_CABLE_LOCK_SET,
+    LOCATION_FIND_MY_CAR_SET,
+    REFRESH_MODE_SET,
+    REFRESH_PERIOD_ACTIVE_SET,
+    REFRESH_PERIOD_INACTIVE_SET,
+    REFRESH_PERIOD_AFTER_SHUTDOWN_SET,
+    REFRESH_PERIOD_INACTIVE_GRACE_SET,
+)
@@ -1,22 +1,25 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-import json
 import re
+import time
 from typing import TYPE_CHECKING, Any, TypeVar
 
 import mqtt_topics
+from publisher.json_encoder import JsonEncoder
 
 if TYPE_CHECKING:
     from configuration import Configuration
 
 T = TypeVar("T")
 
+TOPIC_CACHE_SIZE = 4096
+
 
 class MqttCommandListener(ABC):
     @abstractmethod
     async def on_mqtt_command_received(
-        self, *, vin: str, topic: str, payload: str
+        self, *, vin: str, command: str, payload: str
     ) -> None:
         raise NotImplementedError("Should have implemented this")
 
@@ -32,14 +35,21 @@ class MqttCommandListener(ABC):
 
 
 class Publisher(ABC):
-    def __init__(self, config: Configuration) -> None:
+    def __init__(self, config: Configuration, *, compact_json: bool = False) -> None:
         self.__configuration = config
+        self.__json_encoder = JsonEncoder(compact=compact_json)
         self.__command_listener: MqttCommandListener | None = None
         if config.mqtt_allow_dots_in_topic:
             self.__invalid_mqtt_chars = re.compile(r"[+#*$>]")
         else:
             self.__invalid_mqtt_chars = re.compile(r"[+#*$>.]")
         self.__topic_root = self.__remove_special_mqtt_characters(config.mqtt_topic)
+        self.__topic_cache: dict[tuple[str, bool], str] = {}
+        self.__registered_vehicles: list[str] = []
+        self.__last_published: dict[str, tuple[Any, float]] = {}
+        self.__published_messages = 0
+        self.__suppressed_messages = 0
+        self.__publish_cache_generation = 0
 
     @abstractmethod
     async def connect(self) -> None:
@@ -71,80 +81,153 @@ class Publisher(ABC):
     def publish_float(self, key: str, value: float, no_prefix: bool = False) -> None:
         raise NotImplementedError
 
+    def should_publish(self, topic: str, payload: Any) -> bool:
+        if self.is_unchanged(topic, payload):
+            return False
+        self.mark_published(topic, payload)
+        return True
+
+    def is_unchanged(self, topic: str, payload: Any) -> bool:
+        if not self.configuration.mqtt_publish_changes_only:
+            return False
+        last_published = self.__last_published.get(topic)
+        if last_published is not None:
+            last_payload, last_publish_time = last_published
+            if (
+                type(last_payload) is type(payload)
+                and last_payload == payload
+                and time.monotonic() - last_publish_time
+                < self.configuration.mqtt_republish_interval
+            ):
+                self.__suppressed_messages += 1
+                return True
+        return False
+
+    # Only call this once the message is on its way, a dropped message has to be sent again
+    def mark_published(self, topic: str, payload: Any) -> None:
+        if self.configuration.mqtt_publish_changes_only:
+            self.__last_published[topic] = (payload, time.monotonic())
+        self.__published_messages += 1
+
+    # Lets producers wait while messages pile up in front of a slow broker connection
+    async def wait_until_writable(self) -> None:
+        return
+
+    def register_vehicle(self, vin: str) -> None:
+        if vin not in self.__registered_vehicles:
+            self.__registered_vehicles.append(vin)
+
+    @property
+    def registered_vehicles(self) -> list[str]:
+        return self.__registered_vehicles
+
+    def clear_publish_cache(self) -> None:
+        self.__last_published.clear()
+        self.__publish_cache_generation += 1
+
+    # Changes whenever the broker may have lost the retained messages published so far
+    @property
+    def publish_cache_generation(self) -> int:
+        return self.__publish_cache_generation
+
+    def publish_statistics(self) -> None:
+        self.publish_int(
+            mqtt_topics.INTERNAL_STATS_PUBLISHED, self.published_messages, False
+        )
+        self.publish_int(
+            mqtt_topics.INTERNAL_STATS_SUPPRESSED, self.suppressed_messages, False
+        )
+
     def get_mqtt_account_prefix(self) -> str:
         return self.__remove_special_mqtt_characters(
             f"{self.__topic_root}/{self.configuration.saic_user}"
         )
 
     def get_topic(self, key: str, no_prefix: bool) -> str:
+        cache_key = (key, no_prefix)
+        if (cached_topic := self.__topic_cache.get(cache_key)) is not None:
+            return cached_topic
         topic = key if no_prefix else f"{self.__topic_root}/{key}"
-        return self.__remove_special_mqtt_characters(topic)
+        topic = self.__remove_special_mqtt_characters(topic)
+        if len(self.__topic_cache) >= TOPIC_CACHE_SIZE:
+            # Evict the oldest entry, topics are mostly static so this rarely happens
+            del self.__topic_cache[next(iter(self.__topic_cache))]
+        self.__topic_cache[cache_key] = topic
+        return topic
+
+    @property
+    def topic_cache_size(self) -> int:
+        return len(self.__topic_cache)
 
     def __remove_special_mqtt_characters(self, input_str: str) -> str:
         return self.__invalid_mqtt_chars.sub("_", input_str)
 
-    def __remove_byte_strings(self, data: dict[str, Any]) -> dict[str, Any]:
-        for key in data:  # noqa: PLC0206
-            if isinstance(data[key], bytes):
-                data[key] = str(data[key])
-            elif isinstance(data[key], dict):
-                data[key] = self.__remove_byte_strings(data[key])
-            elif isinstance(data[key], list):
-                for item in data[key]:
-                    if isinstance(item, dict):
-                        self.__remove_byte_strings(item)
+    def __sanitize(self, data: Any, key: str | None = None) -> Any:
+        # Copy-on-write: containers are only copied when one of their items changes
+        if isinstance(data, dict):
+            return self.__sanitize_dict(data)
+        if isinstance(data, list):
+            return self.__sanitize_list(data)
+        if isinstance(data, set | tuple):
+            return [self.__sanitize(item) for item in data]
+        if isinstance(data, bytes):
+            return str(data)
+        if (
+            isinstance(data, str)
+            and key is not None
+            and self.configuration.anonymized_publishing
+        ):
+            return self.__anonymize(key, data)
         return data
 
-    def __anonymize(self, data: T) -> T:
-        if isinstance(data, dict):
-            for key in data:
-                if isinstance(data[key], str):
-                    match key:
-                        case "password":
-                            data[key] = "******"
-                        case (
-                            "uid"
-                            | "email"
-                            | "user_name"
-                            | "account"
-                            | "ping"
-                            | "token"
-                            | "access_token"
-                            | "refreshToken"
-                            | "refresh_token"
-                            | "vin"
-                        ):
-                            data[key] = Publisher.anonymize_str(data[key])
-                        case "deviceId":
-                            data[key] = self.anonymize_device_id(data[key])
-                        case (
-                            "seconds"
-                            | "bindTime"
-                            | "eventCreationTime"
-                            | "latitude"
-                            | "longitude"
-                        ):
-                            data[key] = Publisher.anonymize_int(data[key])
-                        case (
-                            "eventID"
-                            | "event-id"
-                            | "event_id"
-                            | "eventId"
-                            | "event_id"
-                            | "eventID"
-                            | "lastKeySeen"
-                        ):
-                            data[key] = 9999
-                        case "content":
-                            data[key] = re.sub(
-                                "\\(\\*\\*\\*...\\)", "(***XXX)", data[key]
-                            )
-                elif isinstance(data[key], dict):
-                    data[key] = self.__anonymize(data[key])
-                elif isinstance(data[key], list | set | tuple):
-                    data[key] = [self.__anonymize(item) for item in data[key]]
+    def __sanitize_dict(self, data: dict[str, Any]) -> dict[str, Any]:
+        result = data
+        for key, item in data.items():
+            sanitized = self.__sanitize(item, key)
+            if sanitized is not item:
+                if result is data:
+                    result = dict(data)
+                result[key] = sanitized
+        return result
+
+    def __sanitize_list(self, data: list[Any]) -> list[Any]:
+        sanitized_items = [self.__sanitize(item) for item in data]
+        if any(
+            sanitized is not item
+            for sanitized, item in zip(sanitized_items, data, strict=True)
+        ):
+            return sanitized_items
         return data
 
+    def __anonymize(self, key: str, value: Any) -> Any:
+        match key:
+            case "password":
+                value = "******"
+            case (
+                "uid"
+                | "email"
+                | "user_name"
+                | "account"
+                | "ping"
+                | "token"
+                | "access_token"
+                | "refreshToken"
+                | "refresh_token"
+                | "vin"
+            ):
+                value = Publisher.anonymize_str(value)
+            case "deviceId":
+                value = self.anonymize_device_id(value)
+            case (
+                "seconds" | "bindTime" | "eventCreationTime" | "latitude" | "longitude"
+            ):
+                value = Publisher.anonymize_int(value)
+            case "eventID" | "event-id" | "event_id" | "eventId" | "lastKeySeen":
+                value = 9999
+            case "content":
+                value = re.sub("\\(\\*\\*\\*...\\)", "(***XXX)", value)
+        return value
+
     def keepalive(self) -> None:
         self.publish_str(mqtt_topics.INTERNAL_LWT, "online", False)
 
@@ -162,17 +245,24 @@ class Publisher(ABC):
         return int(value / 100000 * 100000)
 
     def dict_to_anonymized_json(self, data: dict[str, Any]) -> str:
-        no_binary_strings = self.__remove_byte_strings(data)
-        if self.configuration.anonymized_publishing:
-            result = self.__anonymize(no_binary_strings)
-        else:
-            result = no_binary_strings
-        return json.dumps(result, indent=2)
+        return self.__json_encoder.encode(self.__sanitize(data))
+
+    @property
+    def json_encoder(self) -> JsonEncoder:
+        return self.__json_encoder
 
     @property
     def configuration(self) -> Configuration:
         return self.__configuration
 
+    @property
+    def published_messages(self) -> int:
+        return self.__published_messages
+
+    @property
+    def suppressed_messages(self) -> int:
+        return self.__suppressed_messages
+
     @property
     def command_listener(self) -> MqttCommandListener | None:
         return self.__command_listener
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, override
+
+from publisher.core import MqttCommandListener, Publisher
+from publisher.mqtt_publisher import MqttPublisher
+
+if TYPE_CHECKING:
+    from configuration import Configuration
+
+LOG = logging.getLogger(__name__)
+RECONNECT_INITIAL_DELAY = 5  # in seconds
+RECONNECT_MAX_DELAY = 5 * 60  # in seconds
+
+
+# Publishes everything to the main broker and a copy to each additional broker
+class FanOutPublisher(Publisher):
+    def __init__(self, configuration: Configuration) -> None:
+        super().__init__(configuration, compact_json=configuration.mqtt_compact_json)
+        self.primary = MqttPublisher(configuration)
+        self.secondaries = [
+            MqttPublisher(configuration, broker, accept_commands=False)
+            for broker in configuration.mqtt_additional_brokers
+        ]
+        self.publishers: list[MqttPublisher] = [self.primary, *self.secondaries]
+        self.__reconnect_tasks: set[asyncio.Task[None]] = set()
+
+    @override
+    async def connect(self) -> None:
+        results = await asyncio.gather(
+            *(publisher.connect() for publisher in self.publishers),
+            return_exceptions=True,
+        )
+        for publisher, result in zip(self.publishers, results, strict=True):
+            if isinstance(result, BaseException):
+                if publisher is self.primary:
+                    raise result
+                # The main broker is all we need to start, the others are retried in the background
+                LOG.error(
+                    f"Could not connect to additional MQTT broker {publisher.host}:{publisher.port}",
+                    exc_info=result,
+                )
+                self.__start_reconnect(publisher)
+
+    def __start_reconnect(self, publisher: MqttPublisher) -> None:
+        task = asyncio.create_task(
+            self.__reconnect(publisher),
+            name=f"mqtt_reconnect_{publisher.host}_{publisher.port}",
+        )
+        self.__reconnect_tasks.add(task)
+        task.add_done_callback(self.__reconnect_tasks.discard)
+
+    # gmqtt only reconnects connections that were established once
+    async def __reconnect(self, publisher: MqttPublisher) -> None:
+        delay = RECONNECT_INITIAL_DELAY
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await publisher.connect()
+            except Exception as e:
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                LOG.warning(
+                    f"Could not connect to additional MQTT broker {publisher.host}:{publisher.port}, "
+                    f"retrying in {delay} seconds: {e}"
+                )
+            else:
+                return
+
+    @override
+    def is_connected(self) -> bool:
+        return self.primary.is_connected()
+
+    @override
+    async def wait_until_writable(self) -> None:
+        # A slow additional broker must not hold up the main one, its own queue absorbs the backlog
+        await self.primary.wait_until_writable()
+
+    @property
+    @override
+    def publish_cache_generation(self) -> int:
+        return super().publish_cache_generation + sum(
+            publisher.publish_cache_generation for publisher in self.publishers
+        )
+
+    @override
+    def publish_json(
+        self, key: str, data: dict[str, Any], no_prefix: bool = False
+    ) -> None:
+        # Serialize once, every broker receives the same payload
+        payload = self.dict_to_anonymized_json(data)
+        for publisher in self.publishers:
+            publisher.publish_str(key, payload, no_prefix)
+
+    @override
+    def publish_str(self, key: str, value: str, no_prefix: bool = False) -> None:
+        for publisher in self.publishers:
+            publisher.publish_str(key, value, no_prefix)
+
+    @override
+    def publish_int(self, key: str, value: int, no_prefix: bool = False) -> None:
+        for publisher in self.publishers:
+            publisher.publish_int(key, value, no_prefix)
+
+    @override
+    def publish_bool(self, key: str, value: bool, no_prefix: bool = False) -> None:
+        for publisher in self.publishers:
+            publisher.publish_bool(key, value, no_prefix)
+
+    @override
+    def publish_float(self, key: str, value: float, no_prefix: bool = False) -> None:
+        for publisher in self.publishers:
+            publisher.publish_float(key, value, no_prefix)
+
+    @override
+    def publish_statistics(self) -> None:
+        # Every broker gets the statistics of its own connection
+        for publisher in self.publishers:
+            publisher.publish_statistics()
+
+    @override
+    def register_vehicle(self, vin: str) -> None:
+        super().register_vehicle(vin)
+        self.primary.register_vehicle(vin)
+
+    @property
+    @override
+    def command_listener(self) -> MqttCommandListener | None:
+        return self.primary.command_listener
+
+    @command_listener.setter
+    @override
+    def command_listener(self, listener: MqttCommandListener) -> None:
+        self.primary.command_listener = listener
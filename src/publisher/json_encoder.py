@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import importlib
+import json
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from types import ModuleType
+
+
+def _load_orjson() -> ModuleType | None:
+    try:
+        return importlib.import_module("orjson")
+    except ImportError:
+        return None
+
+
+class JsonEncoder:
+    def __init__(self, *, compact: bool, use_orjson: bool = True) -> None:
+        self.__compact = compact
+        self.__orjson = _load_orjson() if use_orjson else None
+        if self.__orjson is not None:
+            self.__orjson_options = self.__orjson.OPT_NON_STR_KEYS
+            if not compact:
+                self.__orjson_options |= self.__orjson.OPT_INDENT_2
+
+    @property
+    def name(self) -> str:
+        encoder = "orjson" if self.__orjson is not None else "json"
+        return f"{encoder} ({'compact' if self.__compact else 'indented'})"
+
+    def encode(self, data: Any) -> str:
+        if self.__orjson is not None:
+            encoded: bytes = self.__orjson.dumps(data, option=self.__orjson_options)
+            return encoded.decode("utf-8")
+        if self.__compact:
+            return json.dumps(data, separators=(",", ":"))
+        return json.dumps(data, indent=2)
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+from collections import OrderedDict
 import logging
 import ssl
 from typing import TYPE_CHECKING, Any, Final, cast, override
@@ -8,26 +10,116 @@ import gmqtt
 
 import mqtt_topics
 from publisher.core import Publisher
+from publisher.offline_buffer import OfflinePublishBuffer
+from publisher.rate_limiter import TokenBucket
+from publisher.topic_router import TopicRouter
 
 if TYPE_CHECKING:
-    from configuration import Configuration
+    from configuration import Configuration, MqttBroker
     from integrations.openwb.charging_station import ChargingStation
+    from publisher.topic_router import TopicRoute
 
 LOG = logging.getLogger(__name__)
+PUBLISH_BATCH_SIZE = 50
+PUBLISH_BACKPRESSURE_TIMEOUT = 30  # in seconds
+TRAFFIC_DISCOVERY = "discovery"
+TRAFFIC_STATE = "state"
+TRAFFIC_RAW = "raw"
+
+
+# gmqtt keeps the protocol version in a class attribute that is shared by every client.
+# Pin it per connection so that one broker falling back to MQTT 3.1.1 does not affect the others.
+class MqttClient(gmqtt.Client):
+    def __init__(self, client_id: str, **kwargs: Any) -> None:
+        super().__init__(client_id, **kwargs)
+        self.__protocol_version = gmqtt.constants.MQTTv50
+
+    async def connect(self, *args: Any, **kwargs: Any) -> None:
+        self.__protocol_version = kwargs.get("version", gmqtt.constants.MQTTv50)
+        await super().connect(*args, **kwargs)
+
+    async def _create_connection(self, *args: Any, **kwargs: Any) -> Any:
+        connection = await super()._create_connection(*args, **kwargs)
+        connection._protocol.proto_ver = self.__protocol_version  # noqa: SLF001
+        return connection
+
+    def _handle_connack_packet(self, cmd: int, packet: bytes) -> None:
+        if (
+            packet[1] == gmqtt.constants.CONNACK_REFUSED_PROTOCOL_VERSION
+            and self.protocol_version == gmqtt.constants.MQTTv50
+        ):
+            # gmqtt reconnects using MQTT 3.1.1, only this client has to follow
+            self.__protocol_version = gmqtt.constants.MQTTv311
+        super()._handle_connack_packet(cmd, packet)
 
 
 class MqttPublisher(Publisher):
-    def __init__(self, configuration: Configuration) -> None:
-        super().__init__(configuration)
+    def __init__(
+        self,
+        configuration: Configuration,
+        broker: MqttBroker | None = None,
+        *,
+        accept_commands: bool = True,
+    ) -> None:
+        super().__init__(configuration, compact_json=configuration.mqtt_compact_json)
+        LOG.debug(f"Encoding MQTT JSON payloads using {self.json_encoder.name}")
+        self.broker: Final[MqttBroker] = broker or configuration.mqtt_broker
         self.publisher_id = configuration.mqtt_client_id
-        self.host = self.configuration.mqtt_host
-        self.port = self.configuration.mqtt_port
-        self.transport_protocol = self.configuration.mqtt_transport_protocol
-        self.vin_by_charge_state_topic: dict[str, str] = {}
+        self.host = self.broker.host
+        self.port = self.broker.port
+        self.transport_protocol = self.broker.transport_protocol
+        self.__accept_commands = accept_commands
         self.last_charge_state_by_vin: dict[str, str] = {}
-        self.vin_by_charger_connected_topic: dict[str, str] = {}
+        self.__router = TopicRouter()
+        self.__publish_queue: asyncio.Queue[tuple[str, Any]] = asyncio.Queue(
+            maxsize=configuration.mqtt_publish_queue_size
+        )
+        # Messages waiting for space in the full queue, the writer moves them over in order.
+        # Only the latest payload of each topic waits, so the backlog is bounded by the number of topics.
+        self.__waiting_messages: OrderedDict[str, Any] = OrderedDict()
+        self.__writable = asyncio.Event()
+        self.__writable.set()
+        self.__publish_task: asyncio.Task[None] | None = None
+        self.__dropped_messages = 0
+        self.__offline_buffer: OfflinePublishBuffer | None = None
+        self.__replay_pending = False
+        if configuration.mqtt_offline_buffer_path:
+            offline_buffer_path = configuration.mqtt_offline_buffer_path
+            if broker is not None:
+                # Each broker needs its own buffer as they can be offline independently
+                offline_buffer_path = f"{offline_buffer_path}.{self.host}_{self.port}"
+            self.__offline_buffer = OfflinePublishBuffer(
+                offline_buffer_path,
+                configuration.mqtt_offline_buffer_size,
+            )
+        self.__low_priority_topic_prefixes = tuple(
+            self.get_topic(topic, False)
+            for topic in (
+                mqtt_topics.INTERNAL_API,
+                mqtt_topics.INTERNAL_ABRP,
+                mqtt_topics.INTERNAL_OSMAND,
+            )
+        )
+        self.__discovery_topic_prefix = f"{configuration.ha_discovery_prefix}/"
+        self.__rate_limiters: dict[str, TokenBucket] = {
+            traffic: TokenBucket(rate)
+            for traffic, rate in (
+                (TRAFFIC_DISCOVERY, configuration.mqtt_rate_limit_discovery),
+                (TRAFFIC_STATE, configuration.mqtt_rate_limit_state),
+                (TRAFFIC_RAW, configuration.mqtt_rate_limit_raw),
+            )
+            if rate is not None
+        }
+        self.__transient_topic_suffixes = tuple(
+            f"/{topic}" for topic in mqtt_topics.TRANSIENT_TOPICS
+        )
+        self.__vehicles_topic_marker = f"/{mqtt_topics.VEHICLES}/"
+        self.__topic_aliases: dict[str, int] = {}
+        self.__topic_alias_maximum = 0
+        # The version negotiated for the current connection
+        self.__protocol_version = gmqtt.constants.MQTTv311
 
-        mqtt_client = gmqtt.Client(
+        mqtt_client = MqttClient(
             client_id=str(self.publisher_id),
             transport=self.transport_protocol.transport_mechanism,
             will_message=gmqtt.Message(
@@ -38,20 +130,20 @@ class MqttPublisher(Publisher):
         )
         mqtt_client.on_connect = self.__on_connect
         mqtt_client.on_message = self.__on_message
-        self.client: Final[gmqtt.Client] = mqtt_client
+        self.client: Final[MqttClient] = mqtt_client
 
     @override
     async def connect(self) -> None:
-        if self.configuration.mqtt_user is not None:
-            if self.configuration.mqtt_password is not None:
+        if self.broker.user is not None:
+            if self.broker.password is not None:
                 self.client.set_auth_credentials(
-                    username=self.configuration.mqtt_user,
-                    password=self.configuration.mqtt_password,
+                    username=self.broker.user,
+                    password=self.broker.password,
                 )
             else:
-                self.client.set_auth_credentials(username=self.configuration.mqtt_user)
+                self.client.set_auth_credentials(username=self.broker.user)
         if self.transport_protocol.with_tls:
-            cert_uri = self.configuration.tls_server_cert_path
+            cert_uri = self.broker.tls_server_cert_path
             LOG.debug(
                 f"Configuring network encryption and authentication options for MQTT using {cert_uri}"
             )
@@ -60,52 +152,42 @@ class MqttPublisher(Publisher):
             ssl_context.check_hostname = False
         else:
             ssl_context = None
+        if self.__publish_task is None:
+            self.__publish_task = asyncio.create_task(
+                self.__publish_loop(), name=f"mqtt_publish_loop_{self.host}"
+            )
+        # gmqtt falls back to MQTT 3.1.1 by itself when the broker refuses MQTT v5
         await self.client.connect(
             host=self.host,
             port=self.port,
-            version=gmqtt.constants.MQTTv311,
+            version=gmqtt.constants.MQTTv50
+            if self.configuration.mqtt_v5_enabled
+            else gmqtt.constants.MQTTv311,
             ssl=ssl_context,
         )
 
-    def __on_connect(
-        self, _client: Any, _flags: Any, rc: int, _properties: Any
-    ) -> None:
+    def __on_connect(self, _client: Any, _flags: Any, rc: int, properties: Any) -> None:
         if rc == gmqtt.constants.CONNACK_ACCEPTED:
-            LOG.info("Connected to MQTT broker")
-            mqtt_account_prefix = self.get_mqtt_account_prefix()
-            self.client.subscribe(
-                f"{mqtt_account_prefix}/{mqtt_topics.VEHICLES}/+/+/+/{mqtt_topics.SET_SUFFIX}"
-            )
-            self.client.subscribe(
-                f"{mqtt_account_prefix}/{mqtt_topics.VEHICLES}/+/+/+/+/{mqtt_topics.SET_SUFFIX}"
-            )
-            self.client.subscribe(
-                f"{mqtt_account_prefix}/{mqtt_topics.VEHICLES}/+/{mqtt_topics.REFRESH_MODE}/{mqtt_topics.SET_SUFFIX}"
+            self.__protocol_version = self.client.protocol_version
+            LOG.info(
+                f"Connected to MQTT broker {self.host}:{self.port} using protocol version {self.__protocol_version}"
             )
-            self.client.subscribe(
-                f"{mqtt_account_prefix}/{mqtt_topics.VEHICLES}/+/{mqtt_topics.REFRESH_PERIOD}/+/{mqtt_topics.SET_SUFFIX}"
+            # Topic aliases only live as long as the network connection
+            self.__topic_aliases.clear()
+            self.__topic_alias_maximum = (
+                properties.get("topic_alias_maximum", [0])[0]
+                if self.__protocol_version == gmqtt.constants.MQTTv50
+                else 0
             )
-            for (
-                charging_station
-            ) in self.configuration.charging_stations_by_vin.values():
-                LOG.debug(
-                    f"Subscribing to MQTT topic {charging_station.charge_state_topic}"
-                )
-                self.vin_by_charge_state_topic[charging_station.charge_state_topic] = (
-                    charging_station.vin
-                )
-                self.client.subscribe(charging_station.charge_state_topic)
-                if charging_station.connected_topic:
-                    LOG.debug(
-                        f"Subscribing to MQTT topic {charging_station.connected_topic}"
-                    )
-                    self.vin_by_charger_connected_topic[
-                        charging_station.connected_topic
-                    ] = charging_station.vin
-                    self.client.subscribe(charging_station.connected_topic)
-            if self.configuration.ha_discovery_enabled:
-                # enable dynamic discovery pushing in case ha reconnects
-                self.client.subscribe(self.configuration.ha_lwt_topic)
+            # The broker may have lost our retained messages, publish everything again
+            self.clear_publish_cache()
+            # The writer replays the buffer at the configured rate, the keepalive below wakes it up
+            self.__replay_pending = self.__offline_buffer is not None
+            self.__compile_routes()
+            topics = self.__router.topics
+            LOG.debug(f"Subscribing to {len(topics)} MQTT topics")
+            if len(topics) > 0:
+                self.client.subscribe([gmqtt.Subscription(topic) for topic in topics])
             self.keepalive()
         else:
             if rc == gmqtt.constants.CONNACK_REFUSED_BAD_USERNAME_PASSWORD:
@@ -133,46 +215,249 @@ class MqttPublisher(Publisher):
         except Exception as e:
             LOG.exception(f"Error while processing MQTT message: {e}")
 
-    async def __on_message_real(self, *, topic: str, payload: str) -> None:
-        if topic in self.vin_by_charge_state_topic:
-            LOG.debug(f"Received message over topic {topic} with payload {payload}")
-            vin = self.vin_by_charge_state_topic[topic]
-            charging_station = self.configuration.charging_stations_by_vin[vin]
-            if self.should_force_refresh(payload, charging_station):
-                LOG.info(
-                    f"Vehicle with vin {vin} is charging. Setting refresh mode to force"
-                )
-                if self.command_listener is not None:
-                    await self.command_listener.on_charging_detected(vin)
-        elif topic in self.vin_by_charger_connected_topic:
-            LOG.debug(f"Received message over topic {topic} with payload {payload}")
-            vin = self.vin_by_charger_connected_topic[topic]
-            charging_station = self.configuration.charging_stations_by_vin[vin]
-            if payload == charging_station.connected_value:
-                LOG.debug(
-                    f"Vehicle with vin {vin} is connected to its charging station"
-                )
-            else:
-                LOG.debug(
-                    f"Vehicle with vin {vin} is disconnected from its charging station"
+    def __compile_routes(self) -> None:
+        self.__router.clear()
+        if not self.__accept_commands:
+            return
+        for vin in self.registered_vehicles:
+            self.__add_vehicle_routes(vin)
+        for charging_station in self.configuration.charging_stations_by_vin.values():
+            self.__router.add_route(
+                charging_station.charge_state_topic,
+                self.__on_charge_state,
+                vin=charging_station.vin,
+            )
+            if charging_station.connected_topic:
+                self.__router.add_route(
+                    charging_station.connected_topic,
+                    self.__on_charger_connected,
+                    vin=charging_station.vin,
                 )
-        elif topic == self.configuration.ha_lwt_topic:
+        if self.configuration.ha_discovery_enabled:
+            # enable dynamic discovery pushing in case ha reconnects
+            self.__router.add_route(
+                self.configuration.ha_lwt_topic, self.__on_global_command
+            )
+
+    def __add_vehicle_routes(self, vin: str) -> list[str]:
+        vehicles_prefix = f"{self.get_mqtt_account_prefix()}/{mqtt_topics.VEHICLES}"
+        topics = []
+        for command in mqtt_topics.VEHICLE_COMMAND_TOPICS:
+            topic = f"{vehicles_prefix}/{vin}/{command}"
+            self.__router.add_route(
+                topic, self.__on_vehicle_command, vin=vin, command=command
+            )
+            topics.append(topic)
+        return topics
+
+    @override
+    def register_vehicle(self, vin: str) -> None:
+        is_new_vehicle = vin not in self.registered_vehicles
+        super().register_vehicle(vin)
+        # Vehicles set up after the connection was established need their own subscriptions
+        if is_new_vehicle and self.__accept_commands and self.is_connected():
+            topics = self.__add_vehicle_routes(vin)
+            LOG.debug(f"Subscribing to {len(topics)} MQTT topics for vehicle {vin}")
+            self.client.subscribe([gmqtt.Subscription(topic) for topic in topics])
+
+    async def __on_message_real(self, *, topic: str, payload: str) -> None:
+        route = self.__router.resolve(topic)
+        if route is None:
+            LOG.debug(f"Received message over unknown topic {topic}")
+            return
+        await route.handler(route, payload)
+
+    async def __on_vehicle_command(self, route: TopicRoute, payload: str) -> None:
+        if self.command_listener is not None and route.vin and route.command:
+            await self.command_listener.on_mqtt_command_received(
+                vin=route.vin, command=route.command, payload=payload
+            )
+
+    async def __on_charge_state(self, route: TopicRoute, payload: str) -> None:
+        LOG.debug(f"Received message over topic {route.topic} with payload {payload}")
+        vin = cast("str", route.vin)
+        charging_station = self.configuration.charging_stations_by_vin[vin]
+        if self.should_force_refresh(payload, charging_station):
+            LOG.info(
+                f"Vehicle with vin {vin} is charging. Setting refresh mode to force"
+            )
             if self.command_listener is not None:
-                await self.command_listener.on_mqtt_global_command_received(
-                    topic=topic, payload=payload
-                )
+                await self.command_listener.on_charging_detected(vin)
+
+    async def __on_charger_connected(self, route: TopicRoute, payload: str) -> None:
+        LOG.debug(f"Received message over topic {route.topic} with payload {payload}")
+        vin = cast("str", route.vin)
+        charging_station = self.configuration.charging_stations_by_vin[vin]
+        if payload == charging_station.connected_value:
+            LOG.debug(f"Vehicle with vin {vin} is connected to its charging station")
         else:
-            vin = self.get_vin_from_topic(topic)
-            if self.command_listener is not None:
-                await self.command_listener.on_mqtt_command_received(
-                    vin=vin, topic=topic, payload=payload
-                )
+            LOG.debug(
+                f"Vehicle with vin {vin} is disconnected from its charging station"
+            )
+
+    async def __on_global_command(self, route: TopicRoute, payload: str) -> None:
+        if self.command_listener is not None:
+            await self.command_listener.on_mqtt_global_command_received(
+                topic=route.topic, payload=payload
+            )
 
     def __publish(self, topic: str, payload: Any) -> None:
-        self.client.publish(topic, payload, retain=True)
+        if self.is_unchanged(topic, payload):
+            return
+        if len(self.__waiting_messages) == 0:
+            try:
+                self.__publish_queue.put_nowait((topic, payload))
+            except asyncio.QueueFull:
+                pass
+            else:
+                self.mark_published(topic, payload)
+                return
+        if topic.startswith(self.__low_priority_topic_prefixes):
+            self.__dropped_messages += 1
+            LOG.debug(f"Publish queue is full, dropping message for topic {topic}")
+            return
+        # Never write inline, the writer sends waiting messages at the configured rate
+        if len(self.__waiting_messages) == 0:
+            LOG.warning("Publish queue is full, messages are waiting for the writer")
+        self.__waiting_messages[topic] = payload
+        self.__writable.clear()
+
+    async def __publish_loop(self) -> None:
+        while True:
+            topic, payload = await self.__publish_queue.get()
+            self.__refill_publish_queue()
+            await self.__send(topic, payload)
+            for _ in range(PUBLISH_BATCH_SIZE - 1):
+                if self.__publish_queue.empty():
+                    break
+                topic, payload = self.__publish_queue.get_nowait()
+                self.__refill_publish_queue()
+                await self.__send(topic, payload)
+            # Give the event loop a chance to drain the socket between batches
+            await asyncio.sleep(0)
+
+    def __refill_publish_queue(self) -> None:
+        while len(self.__waiting_messages) > 0 and not self.__publish_queue.full():
+            topic, payload = self.__waiting_messages.popitem(last=False)
+            self.__publish_queue.put_nowait((topic, payload))
+            self.mark_published(topic, payload)
+        if len(self.__waiting_messages) == 0:
+            self.__writable.set()
+
+    @override
+    async def wait_until_writable(self) -> None:
+        try:
+            await asyncio.wait_for(
+                self.__writable.wait(), timeout=PUBLISH_BACKPRESSURE_TIMEOUT
+            )
+        except TimeoutError:
+            LOG.warning(
+                f"{len(self.__waiting_messages)} messages are still waiting for the publish queue of {self.host}"
+            )
+
+    async def __send(self, topic: str, payload: Any) -> None:
+        await self.__wait_for_rate_limit(topic)
+        if self.__replay_pending:
+            # Buffered messages are older than anything in the queue, no queued message may overtake them
+            await self.__replay_offline_buffer()
+        self.__publish_now(topic, payload)
+
+    async def __wait_for_rate_limit(self, topic: str) -> None:
+        rate_limiter = self.__rate_limiters.get(self.__get_traffic_type(topic))
+        if rate_limiter is not None:
+            await rate_limiter.acquire()
+
+    def __get_traffic_type(self, topic: str) -> str:
+        if topic.startswith(self.__discovery_topic_prefix):
+            return TRAFFIC_DISCOVERY
+        if topic.startswith(self.__low_priority_topic_prefixes):
+            return TRAFFIC_RAW
+        return TRAFFIC_STATE
+
+    def __publish_now(self, topic: str, payload: Any) -> None:
+        if not self.is_connected():
+            if self.__offline_buffer is not None:
+                self.__offline_buffer.store(topic, str(payload))
+            else:
+                # Everything is published again once the connection is back
+                self.__dropped_messages += 1
+                LOG.debug(
+                    f"Not connected to {self.host}, dropping message for topic {topic}"
+                )
+            return
+        try:
+            properties: dict[str, Any] = {}
+            wire_topic = topic
+            if self.__protocol_version == gmqtt.constants.MQTTv50:
+                if self.__is_transient(topic):
+                    properties["message_expiry_interval"] = (
+                        self.configuration.mqtt_message_expiry
+                    )
+                wire_topic, topic_alias = self.__get_topic_alias(topic)
+                if topic_alias is not None:
+                    properties["topic_alias"] = topic_alias
+            self.client.publish(wire_topic, payload, retain=True, **properties)
+        except Exception as e:
+            LOG.exception(f"Could not publish message for topic {topic}", exc_info=e)
+
+    def __is_transient(self, topic: str) -> bool:
+        return topic.startswith(self.__low_priority_topic_prefixes) or topic.endswith(
+            self.__transient_topic_suffixes
+        )
+
+    def __get_topic_alias(self, topic: str) -> tuple[str, int | None]:
+        if (topic_alias := self.__topic_aliases.get(topic)) is not None:
+            # The broker already knows this alias, the topic name can be omitted
+            return "", topic_alias
+        if len(self.__topic_aliases) < self.__topic_alias_maximum and (
+            self.__vehicles_topic_marker in topic
+        ):
+            topic_alias = len(self.__topic_aliases) + 1
+            self.__topic_aliases[topic] = topic_alias
+            return topic, topic_alias
+        return topic, None
+
+    async def __replay_offline_buffer(self) -> None:
+        self.__replay_pending = False
+        if self.__offline_buffer is None:
+            return
+        messages = self.__offline_buffer.drain()
+        if len(messages) > 0:
+            LOG.info(f"Replaying {len(messages)} messages buffered while offline")
+        for topic, payload in messages:
+            # Messages left over by another disconnect go back into the buffer
+            await self.__wait_for_rate_limit(topic)
+            self.__publish_now(topic, payload)
+
+    @property
+    def publish_queue_depth(self) -> int:
+        return self.__publish_queue.qsize() + len(self.__waiting_messages)
+
+    @property
+    def dropped_messages(self) -> int:
+        return self.__dropped_messages
+
+    @override
+    def publish_statistics(self) -> None:
+        super().publish_statistics()
+        self.publish_int(
+            mqtt_topics.INTERNAL_STATS_QUEUE_DEPTH, self.publish_queue_depth, False
+        )
+        self.publish_int(
+            mqtt_topics.INTERNAL_STATS_DROPPED, self.dropped_messages, False
+        )
+        for traffic, rate_limiter in self.__rate_limiters.items():
+            self.publish_float(
+                f"{mqtt_topics.INTERNAL_STATS_RATE_LIMIT}/{traffic}",
+                round(rate_limiter.fill_level, 2),
+                False,
+            )
 
     @override
     def is_connected(self) -> bool:
+        # The underlying connection only exists after the first connection attempt
+        if self.client._connection is None:  # noqa: SLF001
+            return False
         return cast("bool", self.client.is_connected)
 
     @override
@@ -198,11 +483,6 @@ class MqttPublisher(Publisher):
     def publish_float(self, key: str, value: float, no_prefix: bool = False) -> None:
         self.__publish(topic=self.get_topic(key, no_prefix), payload=value)
 
-    def get_vin_from_topic(self, topic: str) -> str:
-        global_topic_removed = topic[len(self.configuration.mqtt_topic) + 1 :]
-        elements = global_topic_removed.split("/")
-        return elements[2]
-
     def should_force_refresh(
         self, current_charging_value: str, charging_station: ChargingStation
     ) -> bool:
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+
+LOG = logging.getLogger(__name__)
+
+
+# Keeps the last value of each topic published while the broker is unreachable
+class OfflinePublishBuffer:
+    def __init__(self, path: str, max_size: int) -> None:
+        self.__max_size = max_size
+        self.__connection = sqlite3.connect(path)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("PRAGMA synchronous=NORMAL")
+        with self.__connection:
+            self.__connection.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "topic TEXT PRIMARY KEY, payload TEXT NOT NULL, seq INTEGER NOT NULL)"
+            )
+            self.__connection.execute(
+                "CREATE INDEX IF NOT EXISTS messages_seq ON messages (seq)"
+            )
+        last_seq = self.__connection.execute("SELECT MAX(seq) FROM messages").fetchone()
+        self.__seq: int = last_seq[0] or 0
+        LOG.debug(f"Offline publish buffer at {path} contains {len(self)} messages")
+
+    def store(self, topic: str, payload: str) -> None:
+        self.__seq += 1
+        with self.__connection:
+            self.__connection.execute(
+                "INSERT INTO messages (topic, payload, seq) VALUES (?, ?, ?) "
+                "ON CONFLICT(topic) DO UPDATE SET payload = excluded.payload, seq = excluded.seq",
+                (topic, payload, self.__seq),
+            )
+            self.__connection.execute(
+                "DELETE FROM messages WHERE seq IN "
+                "(SELECT seq FROM messages ORDER BY seq DESC LIMIT -1 OFFSET ?)",
+                (self.__max_size,),
+            )
+
+    def drain(self) -> list[tuple[str, str]]:
+        with self.__connection:
+            messages: list[tuple[str, str]] = self.__connection.execute(
+                "SELECT topic, payload FROM messages ORDER BY seq"
+            ).fetchall()
+            self.__connection.execute("DELETE FROM messages")
+        return messages
+
+    def close(self) -> None:
+        self.__connection.close()
+
+    def __len__(self) -> int:
+        count: int = self.__connection.execute(
+            "SELECT COUNT(*) FROM messages"
+        ).fetchone()[0]
+        return count
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+
+# Allows bursts of up to one second worth of messages, then limits to the configured rate
+class TokenBucket:
+    def __init__(self, rate: float) -> None:
+        self.__rate = rate
+        self.__capacity = max(rate, 1.0)
+        self.__tokens = self.__capacity
+        self.__last_refill = time.monotonic()
+
+    async def acquire(self) -> None:
+        self.__refill()
+        # The token is reserved right away, waiting callers queue up behind each other
+        self.__tokens -= 1.0
+        if self.__tokens < 0:
+            await asyncio.sleep(-self.__tokens / self.__rate)
+
+    @property
+    def fill_level(self) -> float:
+        self.__refill()
+        return max(self.__tokens, 0.0) / self.__capacity
+
+    def __refill(self) -> None:
+        now = time.monotonic()
+        self.__tokens = min(
+            self.__capacity, self.__tokens + (now - self.__last_refill) * self.__rate
+        )
+        self.__last_refill = now
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+
+@dataclass(kw_only=True, frozen=True)
+class TopicRoute:
+    topic: str
+    handler: Callable[[TopicRoute, str], Awaitable[None]]
+    vin: str | None = None
+    command: str | None = None
+
+
+# Maps every subscribed topic to its handler, VIN and command are resolved when the route is added
+class TopicRouter:
+    def __init__(self) -> None:
+        self.__routes: dict[str, TopicRoute] = {}
+
+    def add_route(
+        self,
+        topic: str,
+        handler: Callable[[TopicRoute, str], Awaitable[None]],
+        *,
+        vin: str | None = None,
+        command: str | None = None,
+    ) -> None:
+        self.__routes[topic] = TopicRoute(
+            topic=topic, handler=handler, vin=vin, command=command
+        )
+
+    def resolve(self, topic: str) -> TopicRoute | None:
+        return self.__routes.get(topic)
+
+    def clear(self) -> None:
+        self.__routes.clear()
+
+    @property
+    def topics(self) -> list[str]:
+        return list(self.__routes)
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import contextlib
+from contextvars import ContextVar
+from enum import IntEnum
+import heapq
+import logging
+import time
+from typing import TYPE_CHECKING, Any, override
+
+from saic_ismart_client_ng import SaicApi
+from saic_ismart_client_ng.exceptions import SaicApiException, SaicLogoutException
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Iterator
+
+    from saic_ismart_client_ng.listener import SaicApiListener
+    from saic_ismart_client_ng.model import SaicApiConfiguration
+
+LOG = logging.getLogger(__name__)
+
+THROTTLING_MARKERS = ("return code: 429", "too many requests", "too frequent")
+MAX_BACKOFF_MULTIPLIER = 16
+
+
+# Lower values are served first
+class SaicCallPriority(IntEnum):
+    COMMAND = 0
+    ACTIVE_VEHICLE = 1
+    IDLE = 2
+
+
+__current_priority: ContextVar[SaicCallPriority] = ContextVar(
+    "saic_call_priority", default=SaicCallPriority.IDLE
+)
+
+
+# Every SAIC call made within the block, including the ones of spawned tasks, uses this priority
+@contextlib.contextmanager
+def saic_call_priority(priority: SaicCallPriority) -> Iterator[None]:
+    token = __current_priority.set(priority)
+    try:
+        yield
+    finally:
+        __current_priority.reset(token)
+
+
+def current_saic_call_priority() -> SaicCallPriority:
+    return __current_priority.get()
+
+
+def is_throttling_error(error: SaicApiException) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in THROTTLING_MARKERS)
+
+
+class SaicApiLimiter:
+    def __init__(
+        self,
+        *,
+        max_concurrent: int,
+        requests_per_window: int,
+        window: float,
+        backoff: float,
+    ) -> None:
+        self.__max_concurrent = max_concurrent
+        self.__requests_per_window = requests_per_window
+        self.__window = window
+        self.__backoff = backoff
+        self.__backoff_multiplier = 1
+        self.__backoff_until = 0.0
+        self.__active = 0
+        self.__request_times: deque[float] = deque()
+        # (priority, sequence, waiter), the sequence keeps requests of equal priority in order
+        self.__waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self.__sequence = 0
+        self.__timer: asyncio.TimerHandle | None = None
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: SaicCallPriority) -> AsyncIterator[None]:
+        await self.__acquire(priority)
+        try:
+            yield
+        except SaicLogoutException:
+            raise
+        except SaicApiException as e:
+            if is_throttling_error(e):
+                self.__back_off()
+            raise
+        else:
+            self.__backoff_multiplier = 1
+        finally:
+            self.__active -= 1
+            self.__grant()
+
+    @property
+    def active(self) -> int:
+        return self.__active
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, waiter in self.__waiters if not waiter.done())
+
+    async def __acquire(self, priority: SaicCallPriority) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self.__sequence += 1
+        heapq.heappush(self.__waiters, (priority, self.__sequence, waiter))
+        self.__grant()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was granted right before the cancellation, hand it on
+                self.__active -= 1
+                self.__grant()
+            raise
+
+    def __grant(self) -> None:
+        while self.__waiters and self.__active < self.__max_concurrent:
+            if self.__waiters[0][2].done():
+                # cancelled while waiting
+                heapq.heappop(self.__waiters)
+                continue
+            delay = self.__seconds_until_allowed()
+            if delay > 0:
+                self.__schedule_grant(delay)
+                return
+            _, _, waiter = heapq.heappop(self.__waiters)
+            self.__active += 1
+            self.__request_times.append(time.monotonic())
+            waiter.set_result(None)
+
+    def __seconds_until_allowed(self) -> float:
+        now = time.monotonic()
+        while self.__request_times and self.__request_times[0] <= now - self.__window:
+            self.__request_times.popleft()
+        delay = self.__backoff_until - now
+        if len(self.__request_times) >= self.__requests_per_window:
+            delay = max(delay, self.__request_times[0] + self.__window - now)
+        return delay
+
+    def __schedule_grant(self, delay: float) -> None:
+        if self.__timer is not None:
+            self.__timer.cancel()
+        self.__timer = asyncio.get_running_loop().call_later(delay, self.__grant)
+
+    def __back_off(self) -> None:
+        backoff = self.__backoff * self.__backoff_multiplier
+        self.__backoff_until = max(self.__backoff_until, time.monotonic() + backoff)
+        self.__backoff_multiplier = min(
+            self.__backoff_multiplier * 2, MAX_BACKOFF_MULTIPLIER
+        )
+        LOG.warning(
+            f"SAIC API is throttling requests, pausing all API calls for {backoff:.0f} seconds"
+        )
+
+
+# Routes every SAIC API call through the shared limiter, using the priority of the caller
+class ThrottledSaicApi(SaicApi):
+    def __init__(
+        self,
+        configuration: SaicApiConfiguration,
+        listener: SaicApiListener | None,
+        *,
+        limiter: SaicApiLimiter,
+    ) -> None:
+        super().__init__(configuration=configuration, listener=listener)
+        self.limiter = limiter
+
+    @override
+    async def execute_api_call(self, *args: Any, **kwargs: Any) -> Any:
+        async with self.limiter.slot(current_saic_call_priority()):
+            return await super().execute_api_call(*args, **kwargs)
+
+    @override
+    async def execute_api_call_with_optional_result(
+        self, *args: Any, **kwargs: Any
+    ) -> Any:
+        async with self.limiter.slot(current_saic_call_priority()):
+            return await super().execute_api_call_with_optional_result(*args, **kwargs)
+
+    @override
+    async def execute_api_call_no_result(self, *args: Any, **kwargs: Any) -> None:
+        async with self.limiter.slot(current_saic_call_priority()):
+            await super().execute_api_call_no_result(*args, **kwargs)
+
+    @override
+    async def execute_api_call_with_event_id(self, *args: Any, **kwargs: Any) -> Any:
+        async with self.limiter.slot(current_saic_call_priority()):
+            return await super().execute_api_call_with_event_id(*args, **kwargs)
+
+    @override
+    async def execute_api_call_with_event_id_no_result(
+        self, *args: Any, **kwargs: Any
+    ) -> None:
+        async with self.limiter.slot(current_saic_call_priority()):
+            await super().execute_api_call_with_event_id_no_result(*args, **kwargs)
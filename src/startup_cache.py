@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from dataclasses import asdict
+import json
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from saic_ismart_client_ng.api.vehicle.schema import (
+    SubAccount,
+    VehicleModelConfiguration,
+    VinInfo,
+)
+
+from utils import atomic_write_json
+
+if TYPE_CHECKING:
+    from saic_ismart_client_ng.api.vehicle.alarm import AlarmType
+
+LOG = logging.getLogger(__name__)
+
+VEHICLE_LIST = "vehicle_list"
+ALARM_SWITCHES = "alarm_switches"
+
+
+# Remembers the vehicle list and the alarm switch registrations between restarts
+class StartupCache:
+    def __init__(self, path: str) -> None:
+        self.__path = Path(path)
+        data = self.__load()
+        self.__vehicle_list: list[dict[str, Any]] | None = data.get(VEHICLE_LIST)
+        self.__alarm_switches: dict[str, list[str]] = data.get(ALARM_SWITCHES, {})
+
+    def get_vehicle_list(self) -> list[VinInfo] | None:
+        if self.__vehicle_list is None:
+            return None
+        try:
+            return [self.__to_vin_info(vin_info) for vin_info in self.__vehicle_list]
+        except TypeError as e:
+            LOG.exception("Ignoring unreadable cached vehicle list", exc_info=e)
+            return None
+
+    def set_vehicle_list(self, vin_list: list[VinInfo]) -> None:
+        vehicle_list = [asdict(vin_info) for vin_info in vin_list]
+        if vehicle_list == self.__vehicle_list:
+            return
+        cached_by_vin = {
+            vin_info.get("vin"): vin_info for vin_info in self.__vehicle_list or []
+        }
+        # A vehicle that changed or disappeared from the account has to register again
+        for vin_info in vehicle_list:
+            if cached_by_vin.get(vin_info["vin"]) != vin_info:
+                self.__alarm_switches.pop(vin_info["vin"], None)
+        current_vins = {vin_info["vin"] for vin_info in vehicle_list}
+        for vin in list(self.__alarm_switches):
+            if vin not in current_vins:
+                del self.__alarm_switches[vin]
+        self.__vehicle_list = vehicle_list
+        self.__save()
+
+    def is_registered_for_alarms(
+        self, vin: str, alarm_switches: list[AlarmType]
+    ) -> bool:
+        return self.__alarm_switches.get(vin) == sorted(x.name for x in alarm_switches)
+
+    def set_registered_for_alarms(
+        self, vin: str, alarm_switches: list[AlarmType]
+    ) -> None:
+        self.__alarm_switches[vin] = sorted(x.name for x in alarm_switches)
+        self.__save()
+
+    @staticmethod
+    def __to_vin_info(data: dict[str, Any]) -> VinInfo:
+        return VinInfo(
+            **{
+                **data,
+                "subAccountList": [
+                    SubAccount(**sub_account)
+                    for sub_account in data.get("subAccountList", [])
+                ],
+                "vehicleModelConfiguration": [
+                    VehicleModelConfiguration(**configuration)
+                    for configuration in data.get("vehicleModelConfiguration", [])
+                ],
+            }
+        )
+
+    def __save(self) -> None:
+        try:
+            atomic_write_json(
+                self.__path,
+                {
+                    VEHICLE_LIST: self.__vehicle_list,
+                    ALARM_SWITCHES: self.__alarm_switches,
+                },
+            )
+        except OSError as e:
+            LOG.exception(f"Could not write startup cache to {self.__path}", exc_info=e)
+
+    def __load(self) -> dict[str, Any]:
+        if not self.__path.exists():
+            return {}
+        try:
+            data = json.loads(self.__path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            LOG.exception(
+                f"Ignoring unreadable startup cache at {self.__path}", exc_info=e
+            )
+            return {}
+        if not isinstance(data, dict):
+            LOG.error(f"Ignoring unexpected startup cache content at {self.__path}")
+            return {}
+        return data
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, fields
+import json
+import logging
+from pathlib import Path
+from typing import Any
+
+from utils import atomic_write_json
+
+LOG = logging.getLogger(__name__)
+
+
+# Everything needed to resume a vehicle without waiting for its configuration to arrive over MQTT
+@dataclass(kw_only=True, frozen=True)
+class VehicleSnapshot:
+    refresh_mode: str
+    refresh_period_active: int
+    refresh_period_inactive: int
+    refresh_period_after_shutdown: int
+    refresh_period_inactive_grace: int
+    refresh_period_charging: int
+    last_successful_refresh: str | None = None
+    last_car_shutdown: str | None = None
+    target_soc: int | None = None
+    charge_current_limit: int | None = None
+    remote_ac_temperature: int | None = None
+    scheduled_battery_heating_enabled: bool = False
+    scheduled_battery_heating_start: str | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> VehicleSnapshot:
+        known_fields = {field.name for field in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known_fields})
+
+
+# Keeps the snapshots of all vehicles in a single JSON file, keyed by VIN
+class StateSnapshotStore:
+    def __init__(self, path: str) -> None:
+        self.__path = Path(path)
+        self.__snapshots: dict[str, VehicleSnapshot] = self.__load()
+
+    def get(self, vin: str) -> VehicleSnapshot | None:
+        return self.__snapshots.get(vin)
+
+    def save(self, vin: str, snapshot: VehicleSnapshot) -> None:
+        if self.__snapshots.get(vin) == snapshot:
+            return
+        self.__snapshots[vin] = snapshot
+        try:
+            atomic_write_json(
+                self.__path,
+                {vin: asdict(snapshot) for vin, snapshot in self.__snapshots.items()},
+            )
+        except OSError as e:
+            LOG.exception(
+                f"Could not write state snapshot to {self.__path}", exc_info=e
+            )
+
+    def __load(self) -> dict[str, VehicleSnapshot]:
+        if not self.__path.exists():
+            return {}
+        try:
+            data = json.loads(self.__path.read_text(encoding="utf-8"))
+            return {
+                vin: VehicleSnapshot.from_dict(snapshot)
+                for vin, snapshot in data.items()
+            }
+        except (OSError, ValueError, TypeError) as e:
+            LOG.exception(
+                f"Ignoring unreadable state snapshot at {self.__path}", exc_info=e
+            )
+            return {}
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
+import logging
 from typing import TYPE_CHECKING, Any, Final, TypeVar
 
 from utils import datetime_to_str
@@ -14,14 +15,54 @@ if TYPE_CHECKING:
 T = TypeVar("T")
 Publishable = TypeVar("Publishable", str, int, float, bool, dict[str, Any], datetime)
 
+LOG = logging.getLogger(__name__)
+STATE_DOCUMENT_VALUE_KEY = "_value"
+
+
+# Collects the last published value of every vehicle topic into a single document
+class VehicleStateDocument:
+    def __init__(self) -> None:
+        self.__values: dict[str, Any] = {}
+
+    def update(self, sub_topic: str, value: Any) -> None:
+        if isinstance(value, datetime):
+            value = datetime_to_str(value)
+        self.__values[sub_topic] = value
+
+    def to_dict(self) -> dict[str, Any]:
+        # Topics with sub-topics keep their own value under a reserved key
+        parent_topics = {
+            sub_topic[:index]
+            for sub_topic in self.__values
+            for index, char in enumerate(sub_topic)
+            if char == "/"
+        }
+        document: dict[str, Any] = {}
+        for sub_topic, value in self.__values.items():
+            *path, leaf = sub_topic.split("/")
+            if sub_topic in parent_topics:
+                path.append(leaf)
+                leaf = STATE_DOCUMENT_VALUE_KEY
+            node = document
+            for element in path:
+                node = node.setdefault(element, {})
+            node[leaf] = value
+        return document
+
 
 class VehicleDataPublisher:
     def __init__(
-        self, vin: VehicleInfo, publisher: Publisher, mqtt_vehicle_prefix: str
+        self,
+        vin: VehicleInfo,
+        publisher: Publisher,
+        mqtt_vehicle_prefix: str,
+        state_document: VehicleStateDocument | None = None,
     ) -> None:
         self._vehicle_info: Final[VehicleInfo] = vin
         self.__publisher: Final[Publisher] = publisher
         self.__mqtt_vehicle_prefix: Final[str] = mqtt_vehicle_prefix
+        self.__topics: Final[dict[str, str]] = {}
+        self._state_document: Final[VehicleStateDocument | None] = state_document
 
     def _publish(
         self,
@@ -35,6 +76,8 @@ class VehicleDataPublisher:
             return False, None
         actual_topic = topic if no_prefix else self.__get_topic(topic)
         published = self._publish_directly(topic=actual_topic, value=value)
+        if published and not no_prefix and self._state_document is not None:
+            self._state_document.update(topic, value)
         return published, value
 
     def _transform_and_publish(
@@ -51,6 +94,8 @@ class VehicleDataPublisher:
         actual_topic = topic if no_prefix else self.__get_topic(topic)
         transformed_value = transform(value)
         published = self._publish_directly(topic=actual_topic, value=transformed_value)
+        if published and not no_prefix and self._state_document is not None:
+            self._state_document.update(topic, transformed_value)
         return published, transformed_value
 
     def _publish_directly(self, *, topic: str, value: Publishable) -> bool:
@@ -76,4 +121,8 @@ class VehicleDataPublisher:
         return published
 
     def __get_topic(self, sub_topic: str) -> str:
-        return f"{self.__mqtt_vehicle_prefix}/{sub_topic}"
+        topic = self.__topics.get(sub_topic)
+        if topic is None:
+            topic = f"{self.__mqtt_vehicle_prefix}/{sub_topic}"
+            self.__topics[sub_topic] = topic
+        return topic
@@ -24,6 +24,7 @@ if TYPE_CHECKING:
     )
 
     from publisher.core import Publisher
+    from status_publisher import VehicleStateDocument
     from vehicle_info import VehicleInfo
 
 
@@ -42,14 +43,18 @@ class ChrgMgmtDataRespProcessingResult:
 
 class ChrgMgmtDataRespPublisher(VehicleDataPublisher):
     def __init__(
-        self, vin: VehicleInfo, publisher: Publisher, mqtt_vehicle_prefix: str
+        self,
+        vin: VehicleInfo,
+        publisher: Publisher,
+        mqtt_vehicle_prefix: str,
+        state_document: VehicleStateDocument | None = None,
     ) -> None:
-        super().__init__(vin, publisher, mqtt_vehicle_prefix)
+        super().__init__(vin, publisher, mqtt_vehicle_prefix, state_document)
         self.__chrg_mgmt_data_publisher = ChrgMgmtDataPublisher(
-            vin, publisher, mqtt_vehicle_prefix
+            vin, publisher, mqtt_vehicle_prefix, state_document
         )
         self.__rvs_charge_status_publisher = RvsChargeStatusPublisher(
-            vin, publisher, mqtt_vehicle_prefix
+            vin, publisher, mqtt_vehicle_prefix, state_document
         )
 
     def on_chrg_mgmt_data_resp(
@@ -11,6 +11,7 @@ if TYPE_CHECKING:
     from saic_ismart_client_ng.api.message import MessageEntity
 
     from publisher.core import Publisher
+    from status_publisher import VehicleStateDocument
     from vehicle_info import VehicleInfo
 
 
@@ -21,9 +22,13 @@ class MessagePublisherProcessingResult:
 
 class MessagePublisher(VehicleDataPublisher):
     def __init__(
-        self, vin: VehicleInfo, publisher: Publisher, mqtt_vehicle_prefix: str
+        self,
+        vin: VehicleInfo,
+        publisher: Publisher,
+        mqtt_vehicle_prefix: str,
+        state_document: VehicleStateDocument | None = None,
     ) -> None:
-        super().__init__(vin, publisher, mqtt_vehicle_prefix)
+        super().__init__(vin, publisher, mqtt_vehicle_prefix, state_document)
         self.__last_car_vehicle_message = datetime.min
 
     def on_message(self, message: MessageEntity) -> MessagePublisherProcessingResult:
@@ -21,6 +21,7 @@ if TYPE_CHECKING:
     from saic_ismart_client_ng.api.vehicle import BasicVehicleStatus, VehicleStatusResp
 
     from publisher.core import Publisher
+    from status_publisher import VehicleStateDocument
     from vehicle_info import VehicleInfo
 
 
@@ -36,14 +37,20 @@ class VehicleStatusRespProcessingResult:
 
 class VehicleStatusRespPublisher(VehicleDataPublisher):
     def __init__(
-        self, vin: VehicleInfo, publisher: Publisher, mqtt_vehicle_prefix: str
+        self,
+        vin: VehicleInfo,
+        publisher: Publisher,
+        mqtt_vehicle_prefix: str,
+        state_document: VehicleStateDocument | None = None,
     ) -> None:
-        super().__init__(vin, publisher, mqtt_vehicle_prefix)
+        super().__init__(vin, publisher, mqtt_vehicle_prefix, state_document)
         self.__gps_position_publisher: Final[GpsPositionPublisher] = (
-            GpsPositionPublisher(vin, publisher, mqtt_vehicle_prefix)
+            GpsPositionPublisher(vin, publisher, mqtt_vehicle_prefix, state_document)
         )
         self.__basic_vehicle_status_publisher: Final[BasicVehicleStatusPublisher] = (
-            BasicVehicleStatusPublisher(vin, publisher, mqtt_vehicle_prefix)
+            BasicVehicleStatusPublisher(
+                vin, publisher, mqtt_vehicle_prefix, state_document
+            )
         )
 
     def on_vehicle_status_resp(
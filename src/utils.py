@@ -1,11 +1,14 @@
 from __future__ import annotations
 
 from datetime import UTC, datetime, timedelta
-from typing import TYPE_CHECKING, TypeVar
+import json
+from typing import TYPE_CHECKING, Any, TypeVar
 
 from saic_ismart_client_ng.api.schema import GpsStatus
 
 if TYPE_CHECKING:
+    from pathlib import Path
+
     from saic_ismart_client_ng.api.vehicle import VehicleStatusResp
 
 Numeric = TypeVar("Numeric", int, float)
@@ -72,3 +75,10 @@ def to_remote_climate(rmt_htd_rr_wnd_st: int) -> str:
             return "front"
 
     return f"unknown ({rmt_htd_rr_wnd_st})"
+
+
+# Writes to a temporary file first so that a crash never leaves a truncated file behind
+def atomic_write_json(path: Path, data: Any) -> None:
+    temporary_path = path.with_name(f"{path.name}.tmp")
+    temporary_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    temporary_path.replace(path)
@@ -17,6 +17,8 @@ from saic_ismart_client_ng.api.vehicle_charging import (
 
 from exceptions import MqttGatewayException
 import mqtt_topics
+from state_snapshot import VehicleSnapshot
+from status_publisher import VehicleStateDocument
 from status_publisher.charge.chrg_mgmt_data_resp import (
     ChrgMgmtDataRespProcessingResult,
     ChrgMgmtDataRespPublisher,
@@ -73,14 +75,20 @@ class VehicleState:
         vin_info: VehicleInfo,
         charging_station: ChargingStation | None = None,
         charge_polling_min_percent: float = 1.0,
+        publish_state_document: bool = False,
     ) -> None:
         self.publisher = publisher
-        self.__message_publisher = MessagePublisher(vin_info, publisher, account_prefix)
+        self.state_document: Final[VehicleStateDocument | None] = (
+            VehicleStateDocument() if publish_state_document else None
+        )
+        self.__message_publisher = MessagePublisher(
+            vin_info, publisher, account_prefix, self.state_document
+        )
         self.__vehicle_response_publisher = VehicleStatusRespPublisher(
-            vin_info, publisher, account_prefix
+            vin_info, publisher, account_prefix, self.state_document
         )
         self.__charge_response_publisher = ChrgMgmtDataRespPublisher(
-            vin_info, publisher, account_prefix
+            vin_info, publisher, account_prefix, self.state_document
         )
         self.vehicle: Final[VehicleInfo] = vin_info
         self.mqtt_vin_prefix = account_prefix
@@ -113,6 +121,7 @@ class VehicleState:
         self.__scheduler = scheduler
         self.__scheduled_battery_heating_enabled = False
         self.__scheduled_battery_heating_start: datetime.time | None = None
+        self.__refresh_trigger_listener: Callable[[], None] | None = None
 
     def set_refresh_period_active(self, seconds: int) -> None:
         if seconds != self.refresh_period_active:
@@ -124,6 +133,7 @@ class VehicleState:
                 f"Setting active query interval in vehicle handler for VIN {self.vin} to {human_readable_period}"
             )
             self.refresh_period_active = seconds
+            self.__trigger_refresh()
             # Recompute charging refresh period, if active refresh period is changed
             self.set_refresh_period_charging(self.refresh_period_charging)
 
@@ -137,6 +147,7 @@ class VehicleState:
                 f"Setting inactive query interval in vehicle handler for VIN {self.vin} to {human_readable_period}"
             )
             self.refresh_period_inactive = seconds
+            self.__trigger_refresh()
             # Recompute charging refresh period, if inactive refresh period is changed
             self.set_refresh_period_charging(self.refresh_period_charging)
 
@@ -157,6 +168,7 @@ class VehicleState:
                 f"Setting charging query interval in vehicle handler for VIN {self.vin} to {human_readable_period}"
             )
             self.refresh_period_charging = seconds
+            self.__trigger_refresh()
 
     def set_refresh_period_after_shutdown(self, seconds: int) -> None:
         if seconds != self.refresh_period_after_shutdown:
@@ -168,6 +180,7 @@ class VehicleState:
                 f"Setting after shutdown query interval in vehicle handler for VIN {self.vin} to {human_readable_period}"
             )
             self.refresh_period_after_shutdown = seconds
+            self.__trigger_refresh()
 
     def set_refresh_period_inactive_grace(
         self, refresh_period_inactive_grace: int
@@ -181,6 +194,7 @@ class VehicleState:
                 refresh_period_inactive_grace,
             )
             self.refresh_period_inactive_grace = refresh_period_inactive_grace
+            self.__trigger_refresh()
 
     def update_target_soc(self, target_soc: TargetBatteryCode) -> None:
         if self.target_soc != target_soc and target_soc is not None:
@@ -259,10 +273,15 @@ class VehicleState:
 
     def set_is_charging(self, is_charging: bool) -> None:
         self.is_charging = is_charging
+        self.__trigger_refresh()
         self.hv_battery_active = self.is_charging
         self.publisher.publish_bool(
             self.get_topic(mqtt_topics.DRIVETRAIN_CHARGING), self.is_charging
         )
+        if self.state_document is not None:
+            self.state_document.update(
+                mqtt_topics.DRIVETRAIN_CHARGING, self.is_charging
+            )
 
     def handle_vehicle_status(
         self, vehicle_status: VehicleStatusResp
@@ -346,6 +365,7 @@ class VehicleState:
             topic=mqtt_topics.REFRESH_LAST_ACTIVITY,
             value=datetime_to_str(self.last_car_activity),
         )
+        self.__trigger_refresh()
 
     def notify_message(self, message: MessageEntity) -> None:
         result = self.__message_publisher.on_message(message)
@@ -353,17 +373,24 @@ class VehicleState:
             self.notify_car_activity()
 
     def should_refresh(self) -> bool:
+        if self.refresh_mode == RefreshMode.FORCE:
+            LOG.debug(f"Refresh mode is FORCE, refreshing vehicle {self.vin}")
+            self.set_refresh_mode(
+                self.previous_refresh_mode,
+                "restoring of previous refresh mode after a FORCE execution",
+            )
+            return True
+        next_refresh = self.next_refresh_due()
+        return next_refresh is not None and next_refresh <= datetime.datetime.now()
+
+    # Returns the instant the vehicle should be refreshed next, None if it should not be refreshed
+    def next_refresh_due(self) -> datetime.datetime | None:
         match self.refresh_mode:
             case RefreshMode.OFF:
                 LOG.debug(f"Refresh mode is OFF, skipping vehicle {self.vin} refresh")
-                return False
+                return None
             case RefreshMode.FORCE:
-                LOG.debug(f"Refresh mode is FORCE, skipping vehicle {self.vin} refresh")
-                self.set_refresh_mode(
-                    self.previous_refresh_mode,
-                    "restoring of previous refresh mode after a FORCE execution",
-                )
-                return True
+                return datetime.datetime.now()
             # RefreshMode.PERIODIC is treated like default
             case other:
                 LOG.debug(
@@ -379,72 +406,74 @@ class VehicleState:
                         f"Polling vehicle {self.vin} as last_car_activity is newer than last_actual_poll."
                         f" {self.last_car_activity} > {last_actual_poll}"
                     )
-                    return True
+                    return self.last_car_activity
 
                 if self.last_failed_refresh is not None:
-                    threshold = datetime.datetime.now() - datetime.timedelta(
+                    LOG.debug("Gateway failed refresh previously")
+                    return self.last_failed_refresh + datetime.timedelta(
                         seconds=float(self.refresh_period_error)
                     )
-                    result: bool = self.last_failed_refresh < threshold
-                    LOG.debug(
-                        f"Gateway failed refresh previously. Should refresh: {result}"
-                    )
-                    return result
 
                 if self.is_charging and self.refresh_period_charging > 0:
-                    result = (
-                        self.last_successful_refresh
-                        < datetime.datetime.now()
-                        - datetime.timedelta(
-                            seconds=float(self.refresh_period_charging)
-                        )
+                    LOG.debug("HV battery is charging")
+                    return self.last_successful_refresh + datetime.timedelta(
+                        seconds=float(self.refresh_period_charging)
                     )
-                    LOG.debug(f"HV battery is charging. Should refresh: {result}")
-                    return result
 
                 if self.hv_battery_active:
-                    result = (
-                        self.last_successful_refresh
-                        < datetime.datetime.now()
-                        - datetime.timedelta(seconds=float(self.refresh_period_active))
+                    LOG.debug("HV battery is active")
+                    return self.last_successful_refresh + datetime.timedelta(
+                        seconds=float(self.refresh_period_active)
                     )
-                    LOG.debug(f"HV battery is active. Should refresh: {result}")
-                    return result
 
-                last_shutdown_plus_refresh = (
-                    self.last_car_shutdown
+                grace_period_end = self.last_car_shutdown + datetime.timedelta(
+                    seconds=float(self.refresh_period_inactive_grace)
+                )
+                next_refresh_after_shutdown = (
+                    self.last_successful_refresh
                     + datetime.timedelta(
-                        seconds=float(self.refresh_period_inactive_grace)
+                        seconds=float(self.refresh_period_after_shutdown)
                     )
                 )
-                if last_shutdown_plus_refresh > datetime.datetime.now():
-                    result = (
-                        self.last_successful_refresh
-                        < datetime.datetime.now()
-                        - datetime.timedelta(
-                            seconds=float(self.refresh_period_after_shutdown)
-                        )
-                    )
-                    LOG.debug(
-                        f"Refresh grace period after shutdown has not passed. Should refresh: {result}"
-                    )
-                    return result
-
-                result = (
+                if (
+                    datetime.datetime.now() < grace_period_end
+                    and next_refresh_after_shutdown < grace_period_end
+                ):
+                    LOG.debug("Refresh grace period after shutdown has not passed")
+                    return next_refresh_after_shutdown
+
+                LOG.debug("HV battery is inactive")
+                # The inactive period only applies once the grace period is over
+                return max(
+                    grace_period_end,
                     self.last_successful_refresh
-                    < datetime.datetime.now()
-                    - datetime.timedelta(seconds=float(self.refresh_period_inactive))
-                )
-                LOG.debug(
-                    f"HV battery is inactive and refresh period after shutdown is over. Should refresh: {result}"
+                    + datetime.timedelta(seconds=float(self.refresh_period_inactive)),
                 )
-                return result
+
+    # Called whenever something changed that could move the next refresh forward
+    @property
+    def refresh_trigger_listener(self) -> Callable[[], None] | None:
+        return self.__refresh_trigger_listener
+
+    @refresh_trigger_listener.setter
+    def refresh_trigger_listener(self, listener: Callable[[], None] | None) -> None:
+        self.__refresh_trigger_listener = listener
+
+    def __trigger_refresh(self) -> None:
+        if self.__refresh_trigger_listener is not None:
+            self.__refresh_trigger_listener()
 
     def mark_successful_refresh(self) -> None:
         self.last_successful_refresh = datetime.datetime.now()
         self.last_failed_refresh = None
         self.publisher.publish_str(self.get_topic(mqtt_topics.AVAILABLE), "online")
 
+    def publish_state_document(self) -> None:
+        if self.state_document is not None:
+            self.publisher.publish_json(
+                self.get_topic(mqtt_topics.STATE), self.state_document.to_dict()
+            )
+
     def mark_failed_refresh(self) -> None:
         self.last_failed_refresh = datetime.datetime.now()
         self.publisher.publish_str(self.get_topic(mqtt_topics.AVAILABLE), "offline")
@@ -479,6 +508,74 @@ class VehicleState:
             self.__refresh_period_error,
         )
 
+    def snapshot(self) -> VehicleSnapshot:
+        refresh_mode = (
+            self.previous_refresh_mode
+            if self.refresh_mode == RefreshMode.FORCE
+            else self.refresh_mode
+        )
+        start = self.__scheduled_battery_heating_start
+        return VehicleSnapshot(
+            refresh_mode=refresh_mode.value,
+            refresh_period_active=self.refresh_period_active,
+            refresh_period_inactive=self.refresh_period_inactive,
+            refresh_period_after_shutdown=self.refresh_period_after_shutdown,
+            refresh_period_inactive_grace=self.refresh_period_inactive_grace,
+            refresh_period_charging=self.refresh_period_charging,
+            last_successful_refresh=self.last_successful_refresh.isoformat()
+            if self.last_successful_refresh != datetime.datetime.min
+            else None,
+            last_car_shutdown=self.last_car_shutdown.isoformat(),
+            target_soc=self.target_soc.value if self.target_soc else None,
+            charge_current_limit=self.charge_current_limit.value
+            if self.charge_current_limit
+            else None,
+            remote_ac_temperature=self.__remote_ac_temp,
+            scheduled_battery_heating_enabled=self.__scheduled_battery_heating_enabled,
+            scheduled_battery_heating_start=start.isoformat() if start else None,
+        )
+
+    def restore(self, snapshot: VehicleSnapshot) -> None:
+        LOG.info(f"Restoring state of vehicle {self.vin} from snapshot")
+        if snapshot.refresh_period_active != -1:
+            self.set_refresh_period_active(snapshot.refresh_period_active)
+        if snapshot.refresh_period_inactive != -1:
+            self.set_refresh_period_inactive(snapshot.refresh_period_inactive)
+        if snapshot.refresh_period_after_shutdown != -1:
+            self.set_refresh_period_after_shutdown(
+                snapshot.refresh_period_after_shutdown
+            )
+        if snapshot.refresh_period_inactive_grace != -1:
+            self.set_refresh_period_inactive_grace(
+                snapshot.refresh_period_inactive_grace
+            )
+        self.set_refresh_period_charging(snapshot.refresh_period_charging)
+        self.set_refresh_mode(
+            RefreshMode(snapshot.refresh_mode), "restoring of the state snapshot"
+        )
+        if snapshot.last_successful_refresh is not None:
+            self.last_successful_refresh = datetime.datetime.fromisoformat(
+                snapshot.last_successful_refresh
+            )
+        if snapshot.last_car_shutdown is not None:
+            self.last_car_shutdown = datetime.datetime.fromisoformat(
+                snapshot.last_car_shutdown
+            )
+        if snapshot.target_soc is not None:
+            self.update_target_soc(TargetBatteryCode(snapshot.target_soc))
+        if snapshot.charge_current_limit is not None:
+            self.update_charge_current_limit(
+                ChargeCurrentLimitCode(snapshot.charge_current_limit)
+            )
+        if snapshot.remote_ac_temperature is not None:
+            self.set_ac_temperature(snapshot.remote_ac_temperature)
+        self.update_scheduled_battery_heating(
+            datetime.time.fromisoformat(snapshot.scheduled_battery_heating_start)
+            if snapshot.scheduled_battery_heating_start
+            else None,
+            snapshot.scheduled_battery_heating_enabled,
+        )
+
     def configure_missing(self) -> None:
         if self.refresh_period_active == -1:
             self.set_refresh_period_active(30)
@@ -690,6 +787,7 @@ class VehicleState:
                 self.previous_refresh_mode = self.refresh_mode
             self.refresh_mode = mode
             LOG.debug("Refresh mode set to %s due to %s", self.refresh_mode, cause)
+            self.__trigger_refresh()
 
     @property
     def is_heated_seats_running(self) -> bool:
@@ -767,6 +865,8 @@ class VehicleState:
             return False, None
         actual_topic = topic if no_prefix else self.get_topic(topic)
         published = self.__publish_directly(topic=actual_topic, value=value)
+        if published and not no_prefix and self.state_document is not None:
+            self.state_document.update(topic, value)
         return published, value
 
     def __transform_and_publish(
@@ -783,6 +883,8 @@ class VehicleState:
         actual_topic = topic if no_prefix else self.get_topic(topic)
         transformed_value = transform(value)
         published = self.__publish_directly(topic=actual_topic, value=transformed_value)
+        if published and not no_prefix and self.state_document is not None:
+            self.state_document.update(topic, transformed_value)
         return published, transformed_value
 
     def __publish_directly(self, *, topic: str, value: Publishable) -> bool:
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from handlers.endpoint_cache import EndpointCache
+
+
+class TestEndpointCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.cache = EndpointCache()
+        self.fetches = 0
+
+    async def fetch(self) -> int:
+        self.fetches += 1
+        return self.fetches
+
+    async def test_response_is_reused_within_ttl(self) -> None:
+        assert await self.cache.get_or_fetch("schedule", 60, self.fetch) == 1
+        assert await self.cache.get_or_fetch("schedule", 60, self.fetch) == 1
+        assert self.fetches == 1
+
+    async def test_response_is_fetched_again_after_ttl(self) -> None:
+        with patch("time.monotonic", return_value=1000.0):
+            await self.cache.get_or_fetch("schedule", 60, self.fetch)
+        with patch("time.monotonic", return_value=1061.0):
+            assert await self.cache.get_or_fetch("schedule", 60, self.fetch) == 2
+
+    async def test_invalidate_forces_a_fetch(self) -> None:
+        await self.cache.get_or_fetch("schedule", 60, self.fetch)
+        self.cache.invalidate("schedule")
+        assert await self.cache.get_or_fetch("schedule", 60, self.fetch) == 2
+
+    async def test_endpoints_are_cached_separately(self) -> None:
+        await self.cache.get_or_fetch("schedule", 60, self.fetch)
+        assert await self.cache.get_or_fetch("settings", 60, self.fetch) == 2
+        self.cache.invalidate("settings")
+        assert await self.cache.get_or_fetch("schedule", 60, self.fetch) == 1
+
+    async def test_response_fetched_before_invalidation_is_not_cached(self) -> None:
+        release_fetch = asyncio.Event()
+
+        async def slow_fetch() -> int:
+            fetch = await self.fetch()
+            if fetch == 1:
+                await release_fetch.wait()
+            return fetch
+
+        in_flight = asyncio.create_task(
+            self.cache.get_or_fetch("schedule", 60, slow_fetch)
+        )
+        await asyncio.sleep(0)
+        self.cache.invalidate("schedule")
+        release_fetch.set()
+
+        # The stale response is replaced by a fresh one, which is cached
+        assert await in_flight == 2
+        assert await self.cache.get_or_fetch("schedule", 60, self.fetch) == 2
+        assert self.fetches == 2
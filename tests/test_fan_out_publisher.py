@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+from typing import override
+import unittest
+from unittest.mock import patch
+
+from configuration import Configuration, MqttBroker, TransportProtocol
+from publisher.fan_out_publisher import FanOutPublisher
+
+VIN = "vin10000000000000"
+
+
+class TestFanOutPublisher(unittest.IsolatedAsyncioTestCase):
+    @override
+    def setUp(self) -> None:
+        config = Configuration()
+        config.mqtt_topic = "saic"
+        config.saic_user = "me@home.da"
+        config.mqtt_host = "localhost"
+        config.mqtt_transport_protocol = TransportProtocol.TCP
+        config.mqtt_additional_brokers = [
+            MqttBroker(
+                host="remote", port=1883, transport_protocol=TransportProtocol.TCP
+            )
+        ]
+        self.publisher = FanOutPublisher(config)
+        self.publisher.register_vehicle(VIN)
+
+    def test_payload_is_serialized_once(self) -> None:
+        with (
+            patch.object(self.publisher.primary, "publish_str") as primary_publish,
+            patch.object(
+                self.publisher.secondaries[0], "publish_str"
+            ) as secondary_publish,
+            patch.object(
+                self.publisher,
+                "dict_to_anonymized_json",
+                wraps=self.publisher.dict_to_anonymized_json,
+            ) as serialize,
+        ):
+            self.publisher.publish_json("topic", {"a": 1})
+        serialize.assert_called_once()
+        primary_payload = primary_publish.call_args.args[1]
+        assert secondary_publish.call_args.args[1] is primary_payload
+
+    def test_commands_are_only_subscribed_on_primary(self) -> None:
+        for publisher in self.publisher.publishers:
+            with (
+                patch.object(publisher.client, "subscribe") as mock_subscribe,
+                patch.object(publisher.client, "publish"),
+            ):
+                publisher.client.on_connect(publisher.client, 0, 0, {})
+            if publisher is self.publisher.primary:
+                mock_subscribe.assert_called_once()
+            else:
+                mock_subscribe.assert_not_called()
+
+    def test_reconnect_of_any_broker_changes_publish_cache_generation(self) -> None:
+        generation = self.publisher.publish_cache_generation
+        secondary = self.publisher.secondaries[0]
+        with patch.object(secondary.client, "publish"):
+            secondary.client.on_connect(secondary.client, 0, 0, {})
+        assert self.publisher.publish_cache_generation != generation
+
+    async def test_secondary_down_at_startup_is_reconnected(self) -> None:
+        secondary = self.publisher.secondaries[0]
+        with (
+            patch("publisher.fan_out_publisher.RECONNECT_INITIAL_DELAY", 0.01),
+            patch.object(self.publisher.primary, "connect"),
+            patch.object(
+                secondary, "connect", side_effect=[OSError, OSError, None]
+            ) as secondary_connect,
+        ):
+            await self.publisher.connect()
+            await asyncio.sleep(0.2)
+
+        assert secondary_connect.call_count == 3
+
+    async def test_slow_secondary_does_not_hold_up_the_primary(self) -> None:
+        never_writable = asyncio.Event()
+        with (
+            patch.object(self.publisher.primary, "wait_until_writable"),
+            patch.object(
+                self.publisher.secondaries[0],
+                "wait_until_writable",
+                side_effect=never_writable.wait,
+            ),
+        ):
+            await asyncio.wait_for(self.publisher.wait_until_writable(), timeout=1)
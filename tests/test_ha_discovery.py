@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import patch
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+from common_mocks import VIN
+from mocks import MessageCapturingConsolePublisher
+import pytest
+from saic_ismart_client_ng.api.vehicle.schema import (
+    VehicleModelConfiguration,
+    VinInfo,
+)
+
+from configuration import Configuration
+from exceptions import MqttGatewayException
+from integrations.home_assistant.discovery import HomeAssistantDiscovery
+from integrations.home_assistant.entities import (
+    HA_ENTITIES,
+    SELECT,
+    SENSOR,
+    SWITCH,
+    HaEntity,
+    build_registry,
+)
+import mqtt_topics
+from vehicle import VehicleState
+from vehicle_info import VehicleInfo
+
+DEPRECATED_TOPIC = (
+    f"homeassistant/sensor/{VIN}_mg/{VIN}_front_window_defroster_heating/config"
+)
+
+
+def create_discovery(
+    publisher: MessageCapturingConsolePublisher, config: Configuration, vin: str
+) -> HomeAssistantDiscovery:
+    vin_info = VinInfo()
+    vin_info.vin = vin
+    vin_info.series = "EH32 S"
+    vin_info.modelName = "MG4 Electric"
+    vin_info.modelYear = "2022"
+    vin_info.vehicleModelConfiguration = [
+        VehicleModelConfiguration("BATTERY", "BATTERY", "1"),
+        VehicleModelConfiguration("BType", "Battery", "1"),
+    ]
+    vehicle_info = VehicleInfo(vin_info, None)
+    vehicle_state = VehicleState(
+        publisher, BlockingScheduler(), f"/vehicles/{vin}", vehicle_info
+    )
+    vehicle_state.configure_missing()
+    return HomeAssistantDiscovery(vehicle_state, vehicle_info, config)
+
+
+class TestHomeAssistantDiscovery(unittest.TestCase):
+    def setUp(self) -> None:
+        config = Configuration()
+        config.ha_discovery_prefix = "homeassistant"
+        self.publisher = MessageCapturingConsolePublisher(config)
+        self.discovery = create_discovery(self.publisher, config, VIN)
+
+    def publish(self, *, force: bool) -> tuple[int, int]:
+        with (
+            patch.object(
+                self.publisher, "publish_json", wraps=self.publisher.publish_json
+            ) as publish_json,
+            patch.object(
+                self.publisher, "publish_str", wraps=self.publisher.publish_str
+            ) as publish_str,
+        ):
+            self.discovery.publish_ha_discovery_messages(force=force)
+        return publish_json.call_count, publish_str.call_count
+
+    def test_every_entity_is_published_initially(self) -> None:
+        published, unpublished = self.publish(force=False)
+
+        assert published > 50
+        assert unpublished > 0
+        assert self.publisher.map[DEPRECATED_TOPIC] == ""
+
+    def test_forced_publish_only_sends_changes(self) -> None:
+        self.publish(force=False)
+
+        assert self.publish(force=True) == (0, 0)
+
+    def test_everything_is_published_again_after_broker_reconnect(self) -> None:
+        initially_published, initially_unpublished = self.publish(force=False)
+
+        self.publisher.clear_publish_cache()
+
+        assert self.publish(force=False) == (
+            initially_published,
+            initially_unpublished,
+        )
+
+    def test_every_registered_entity_is_published_or_removed(self) -> None:
+        published, unpublished = self.publish(force=False)
+
+        assert published + unpublished == len(HA_ENTITIES)
+
+
+class TestHomeAssistantEntityRegistry(unittest.TestCase):
+    def test_duplicate_entities_are_rejected(self) -> None:
+        entity = HaEntity(
+            component=SENSOR, name="SoC", topic=mqtt_topics.DRIVETRAIN_SOC
+        )
+
+        with pytest.raises(MqttGatewayException):
+            build_registry(entity, entity)
+
+    def test_unknown_component_is_rejected(self) -> None:
+        with pytest.raises(MqttGatewayException):
+            build_registry(HaEntity(component="vacuum", name="Vacuum", topic="vacuum"))
+
+    def test_unsupported_attribute_is_rejected(self) -> None:
+        with pytest.raises(MqttGatewayException):
+            build_registry(
+                HaEntity(
+                    component=SWITCH,
+                    name="Charging",
+                    topic=mqtt_topics.DRIVETRAIN_CHARGING,
+                    unit_of_measurement="kW",
+                )
+            )
+
+    def test_select_without_options_is_rejected(self) -> None:
+        with pytest.raises(MqttGatewayException):
+            build_registry(
+                HaEntity(
+                    component=SELECT,
+                    name="Gateway refresh mode",
+                    topic=mqtt_topics.REFRESH_MODE,
+                )
+            )
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import json
+import unittest
+
+from configuration import Configuration, TransportProtocol
+from publisher.json_encoder import JsonEncoder
+from publisher.mqtt_publisher import MqttPublisher
+
+
+def create_publisher(*, anonymized: bool, compact: bool) -> MqttPublisher:
+    config = Configuration()
+    config.mqtt_topic = "saic"
+    config.saic_user = "me@home.da"
+    config.mqtt_transport_protocol = TransportProtocol.TCP
+    config.anonymized_publishing = anonymized
+    config.mqtt_compact_json = compact
+    return MqttPublisher(config)
+
+
+class TestJsonEncoding(unittest.TestCase):
+    def test_input_is_not_mutated(self) -> None:
+        publisher = create_publisher(anonymized=True, compact=False)
+        data = {
+            "vin": "vin10000000000000",
+            "raw": b"\x01",
+            "nested": {"password": "secret", "values": [{"token": "abc"}]},
+        }
+        result = json.loads(publisher.dict_to_anonymized_json(data))
+        assert result == {
+            "vin": "XXX90000000000000",
+            "raw": "b'\\x01'",
+            "nested": {"password": "******", "values": [{"token": "XXX"}]},
+        }
+        assert data["vin"] == "vin10000000000000"
+        assert data["raw"] == b"\x01"
+        assert data["nested"] == {"password": "secret", "values": [{"token": "abc"}]}
+
+    def test_values_are_kept_when_not_anonymized(self) -> None:
+        publisher = create_publisher(anonymized=False, compact=False)
+        data = {"vin": "vin10000000000000", "values": ("a", "b")}
+        result = json.loads(publisher.dict_to_anonymized_json(data))
+        assert result == {"vin": "vin10000000000000", "values": ["a", "b"]}
+
+    def test_compact_encoding(self) -> None:
+        publisher = create_publisher(anonymized=False, compact=True)
+        encoded = publisher.dict_to_anonymized_json({"a": 1, "b": [1, 2]})
+        assert encoded == '{"a":1,"b":[1,2]}'
+
+    def test_indented_encoding(self) -> None:
+        encoder = JsonEncoder(compact=False, use_orjson=False)
+        assert encoder.encode({"a": 1}) == '{\n  "a": 1\n}'
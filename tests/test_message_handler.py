@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+from pathlib import Path
+import tempfile
+from typing import override
+import unittest
+from unittest.mock import patch
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+from common_mocks import VIN
+from mocks import MessageCapturingConsolePublisher
+from saic_ismart_client_ng import SaicApi
+from saic_ismart_client_ng.api.message.schema import MessageEntity, MessageResp
+from saic_ismart_client_ng.api.vehicle.schema import VinInfo
+from saic_ismart_client_ng.model import SaicApiConfiguration
+
+from configuration import Configuration
+from handlers.message import MESSAGE_UPDATE_CONCURRENCY, MessageHandler
+from handlers.relogin import ReloginHandler
+from handlers.vehicle import VehicleHandler, VehicleHandlerLocator
+from message_watermark import MessageWatermark, MessageWatermarkStore
+from vehicle import RefreshMode, VehicleState
+from vehicle_info import VehicleInfo
+
+OTHER_VIN = "vin20000000000000"
+PAGE_SIZE = 3
+START_TIME = datetime.datetime(2024, 5, 1, 12, 0, 0)
+
+
+def create_message(message_id: int, vin: str = VIN) -> MessageEntity:
+    message_time = START_TIME + datetime.timedelta(minutes=message_id)
+    return MessageEntity(
+        messageId=message_id,
+        messageTime=message_time.strftime("%Y-%m-%d %H:%M:%S"),
+        messageType="323",
+        readStatus=1,
+        title="Vehicle start",
+        vin=vin,
+    )
+
+
+class TestMessageHandler(unittest.IsolatedAsyncioTestCase, VehicleHandlerLocator):
+    def setUp(self) -> None:
+        config = Configuration()
+        self.saicapi = SaicApi(
+            configuration=SaicApiConfiguration(
+                username="aaa@nowhere.org",
+                password="xxxxxxxxx",  # noqa: S106
+            ),
+            listener=None,
+        )
+        self.relogin_handler = ReloginHandler(
+            relogin_relay=30, api=self.saicapi, scheduler=None
+        )
+        self.__vehicle_handlers = {
+            vin: self.create_vehicle_handler(config, vin) for vin in (VIN, OTHER_VIN)
+        }
+        # newest first, like the SAIC API lists them
+        self.inbox = [create_message(message_id) for message_id in range(10, 0, -1)]
+        self.requested_pages: list[int] = []
+        self.read_message_ids: list[str | int] = []
+        self.deleted_message_ids: list[str | int] = []
+        self.failing_message_ids: set[str | int] = set()
+        self.running_updates = 0
+        self.max_running_updates = 0
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.watermark_path = str(Path(self.temp_dir.name) / "watermark.json")
+
+    def create_vehicle_handler(self, config: Configuration, vin: str) -> VehicleHandler:
+        publisher = MessageCapturingConsolePublisher(config)
+        vin_info = VinInfo()
+        vin_info.vin = vin
+        vehicle_info = VehicleInfo(vin_info, None)
+        vehicle_state = VehicleState(
+            publisher, BlockingScheduler(), f"/vehicles/{vin}", vehicle_info
+        )
+        vehicle_state.set_refresh_mode(RefreshMode.PERIODIC, "test")
+        return VehicleHandler(
+            config,
+            self.relogin_handler,
+            self.saicapi,
+            publisher,
+            vehicle_info,
+            vehicle_state,
+        )
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    @override
+    def get_vehicle_handler(self, vin: str) -> VehicleHandler | None:
+        return self.__vehicle_handlers.get(vin)
+
+    @property
+    @override
+    def vehicle_handlers(self) -> dict[str, VehicleHandler]:
+        return self.__vehicle_handlers
+
+    async def get_alarm_list(self, *, page_num: int, page_size: int) -> MessageResp:
+        self.requested_pages.append(page_num)
+        start = (page_num - 1) * page_size
+        return MessageResp(messages=self.inbox[start : start + page_size])
+
+    async def update_message(
+        self, message_id: str | int, updated: list[str | int]
+    ) -> None:
+        self.running_updates += 1
+        self.max_running_updates = max(self.max_running_updates, self.running_updates)
+        try:
+            await asyncio.sleep(0.01)
+            if message_id in self.failing_message_ids:
+                msg = f"Message {message_id} could not be updated"
+                raise ValueError(msg)
+            updated.append(message_id)
+        finally:
+            self.running_updates -= 1
+
+    async def read_message(self, *, message_id: str | int) -> None:
+        await self.update_message(message_id, self.read_message_ids)
+
+    async def delete_message(self, *, message_id: str | int) -> None:
+        await self.update_message(message_id, self.deleted_message_ids)
+
+    def create_message_handler(self) -> MessageHandler:
+        return MessageHandler(
+            gateway=self,
+            relogin_handler=self.relogin_handler,
+            saicapi=self.saicapi,
+            page_size=PAGE_SIZE,
+            watermark_store=MessageWatermarkStore(self.watermark_path),
+            request_interval=60,
+            max_request_interval=300,
+        )
+
+    async def check_for_new_messages(self, message_handler: MessageHandler) -> None:
+        with (
+            patch.object(
+                self.saicapi, "get_alarm_list", side_effect=self.get_alarm_list
+            ),
+            patch.object(
+                self.saicapi, "delete_message", side_effect=self.delete_message
+            ),
+            patch.object(self.saicapi, "read_message", side_effect=self.read_message),
+        ):
+            await message_handler.check_for_new_messages()
+
+    async def test_whole_inbox_is_fetched_without_watermark(self) -> None:
+        message_handler = self.create_message_handler()
+
+        await self.check_for_new_messages(message_handler)
+
+        assert self.requested_pages == [1, 2, 3, 4]
+        assert message_handler.last_message_id == 10
+
+    async def test_fetching_stops_at_watermark(self) -> None:
+        MessageWatermarkStore(self.watermark_path).save(
+            MessageWatermark(message_time=create_message(6).message_time, message_id=6)
+        )
+        message_handler = self.create_message_handler()
+
+        await self.check_for_new_messages(message_handler)
+
+        assert self.requested_pages == [1, 2]
+        assert message_handler.last_message_id == 10
+
+    async def test_watermark_survives_restart(self) -> None:
+        await self.check_for_new_messages(self.create_message_handler())
+        self.requested_pages.clear()
+
+        restarted = self.create_message_handler()
+        assert restarted.last_message_id == 10
+        assert restarted.last_message_ts == create_message(10).message_time
+
+        await self.check_for_new_messages(restarted)
+
+        assert self.requested_pages == [1]
+
+    async def test_unread_messages_are_read_concurrently(self) -> None:
+        for message in self.inbox:
+            message.readStatus = 0
+            message.messageType = "1"
+
+        await self.check_for_new_messages(self.create_message_handler())
+
+        assert sorted(self.read_message_ids) == list(range(1, 11))
+        assert self.max_running_updates == MESSAGE_UPDATE_CONCURRENCY
+
+    async def test_stale_vehicle_start_messages_are_deleted(self) -> None:
+        await self.check_for_new_messages(self.create_message_handler())
+
+        assert sorted(self.deleted_message_ids) == list(range(1, 10))
+        assert self.read_message_ids == []
+
+    async def test_handled_messages_are_not_updated_twice(self) -> None:
+        for message in self.inbox:
+            message.readStatus = 0
+        self.failing_message_ids = {3}
+        message_handler = self.create_message_handler()
+        await self.check_for_new_messages(message_handler)
+        self.read_message_ids.clear()
+        self.deleted_message_ids.clear()
+        self.failing_message_ids.clear()
+
+        # The server still lists every message as unread, walk the whole inbox again
+        message_handler.last_message_ts = datetime.datetime.min
+        message_handler.last_message_id = None
+        await self.check_for_new_messages(message_handler)
+
+        assert self.read_message_ids == [3]
+        assert self.deleted_message_ids == [3]
+
+    async def test_every_vehicle_is_notified_of_its_latest_message(self) -> None:
+        MessageWatermarkStore(self.watermark_path).save(
+            MessageWatermark(message_time=create_message(6).message_time, message_id=6)
+        )
+        self.inbox = [
+            create_message(9),
+            create_message(8, OTHER_VIN),
+            create_message(7, OTHER_VIN),
+            create_message(6),
+            create_message(5, OTHER_VIN),
+        ]
+        with (
+            patch.object(
+                self.vehicle_handlers[VIN].vehicle_state, "notify_message"
+            ) as notify_vehicle,
+            patch.object(
+                self.vehicle_handlers[OTHER_VIN].vehicle_state, "notify_message"
+            ) as notify_other_vehicle,
+        ):
+            await self.check_for_new_messages(self.create_message_handler())
+
+        notify_vehicle.assert_called_once()
+        assert notify_vehicle.call_args.args[0].messageId == 9
+        notify_other_vehicle.assert_called_once()
+        assert notify_other_vehicle.call_args.args[0].messageId == 8
+
+    async def test_vehicles_without_unseen_messages_are_not_notified(self) -> None:
+        message_handler = self.create_message_handler()
+        await self.check_for_new_messages(message_handler)
+        self.inbox.insert(0, create_message(11, OTHER_VIN))
+
+        with (
+            patch.object(
+                self.vehicle_handlers[VIN].vehicle_state, "notify_message"
+            ) as notify_vehicle,
+            patch.object(
+                self.vehicle_handlers[OTHER_VIN].vehicle_state, "notify_message"
+            ) as notify_other_vehicle,
+        ):
+            await self.check_for_new_messages(message_handler)
+
+        notify_vehicle.assert_not_called()
+        notify_other_vehicle.assert_called_once()
+        assert message_handler.last_message_id == 11
+
+    def park_all_vehicles(self) -> None:
+        for vehicle_handler in self.vehicle_handlers.values():
+            vehicle_handler.vehicle_state.hv_battery_active = False
+
+    def test_request_interval_backs_off_while_idle(self) -> None:
+        self.park_all_vehicles()
+        message_handler = self.create_message_handler()
+
+        intervals = []
+        for _ in range(4):
+            message_handler.adapt_request_interval(back_off=True)
+            intervals.append(message_handler.request_interval)
+
+        assert intervals == [120, 240, 300, 300]
+
+    def test_request_interval_tightens_when_a_vehicle_is_active(self) -> None:
+        self.park_all_vehicles()
+        message_handler = self.create_message_handler()
+        message_handler.adapt_request_interval(back_off=True)
+        assert not message_handler.adapt_request_interval(back_off=False)
+
+        self.vehicle_handlers[OTHER_VIN].vehicle_state.set_is_charging(True)
+
+        assert message_handler.adapt_request_interval(back_off=False)
+        assert message_handler.request_interval == 60
+        assert not message_handler.adapt_request_interval(back_off=True)
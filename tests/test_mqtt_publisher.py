@@ -1,11 +1,24 @@
 from __future__ import annotations
 
-from typing import Any, override
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+import tempfile
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, override
 import unittest
+from unittest.mock import MagicMock, PropertyMock, patch
+
+import gmqtt
 
 from configuration import Configuration, TransportProtocol
+import mqtt_topics
 from publisher.core import MqttCommandListener
-from publisher.mqtt_publisher import MqttPublisher
+from publisher.mqtt_publisher import MqttClient, MqttPublisher
+from publisher.offline_buffer import OfflinePublishBuffer
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
 
 USER = "me@home.da"
 VIN = "vin10000000000000"
@@ -24,9 +37,10 @@ class TestMqttPublisher(unittest.IsolatedAsyncioTestCase, MqttCommandListener):
 
     @override
     async def on_mqtt_command_received(
-        self, *, vin: str, topic: str, payload: str
+        self, *, vin: str, command: str, payload: str
     ) -> None:
         self.received_vin = vin
+        self.received_command = command
         self.received_payload = payload.strip().lower()
 
     @override
@@ -37,22 +51,42 @@ class TestMqttPublisher(unittest.IsolatedAsyncioTestCase, MqttCommandListener):
         config.mqtt_transport_protocol = TransportProtocol.TCP
         self.mqtt_client = MqttPublisher(config)
         self.mqtt_client.command_listener = self
+        self.mqtt_client.register_vehicle(VIN)
         self.received_vin = ""
+        self.received_command = ""
         self.received_payload = ""
         self.vehicle_base_topic = (
-            f"{self.mqtt_client.configuration.mqtt_topic}/{USER}/vehicles/{VIN}"
+            f"{self.mqtt_client.get_mqtt_account_prefix()}/vehicles/{VIN}"
         )
+        with (
+            patch.object(self.mqtt_client.client, "subscribe") as mock_subscribe,
+            patch.object(self.mqtt_client.client, "publish"),
+        ):
+            self.mqtt_client.client.on_connect(self.mqtt_client.client, 0, 0, {})
+            self.subscribed_topics = [
+                subscription.topic for subscription in mock_subscribe.call_args.args[0]
+            ]
 
     def test_special_character_username(self) -> None:
         assert self.mqtt_client.get_mqtt_account_prefix() == "saic/user_a_b_c_d_e"
 
+    def test_vehicle_commands_are_subscribed_exactly(self) -> None:
+        assert f"{self.vehicle_base_topic}/refresh/mode/set" in self.subscribed_topics
+        assert all("+" not in topic for topic in self.subscribed_topics)
+
     async def test_update_mode(self) -> None:
         topic = "refresh/mode/set"
         full_topic = f"{self.vehicle_base_topic}/{topic}"
         await self.send_message(full_topic, MODE)
         assert self.received_vin == VIN
+        assert self.received_command == topic
         assert self.received_payload == MODE
 
+    async def test_unknown_topic_is_ignored(self) -> None:
+        full_topic = f"{self.vehicle_base_topic}/unknown/set"
+        await self.send_message(full_topic, MODE)
+        assert self.received_vin == ""
+
     async def test_update_lock_state(self) -> None:
         topic = "doors/locked/set"
         full_topic = f"{self.vehicle_base_topic}/{topic}"
@@ -67,8 +101,320 @@ class TestMqttPublisher(unittest.IsolatedAsyncioTestCase, MqttCommandListener):
         assert self.received_vin == VIN
         assert self.received_payload == REAR_WINDOW_HEAT_STATE
 
+    async def test_vehicle_registered_after_connect_is_subscribed(self) -> None:
+        late_vin = "vin20000000000000"
+        with (
+            patch.object(self.mqtt_client, "is_connected", return_value=True),
+            patch.object(self.mqtt_client.client, "subscribe") as mock_subscribe,
+        ):
+            self.mqtt_client.register_vehicle(late_vin)
+            self.mqtt_client.register_vehicle(late_vin)
+        mock_subscribe.assert_called_once()
+        late_topics = [
+            subscription.topic for subscription in mock_subscribe.call_args.args[0]
+        ]
+        assert all(f"/vehicles/{late_vin}/" in topic for topic in late_topics)
+
+        full_topic = f"{self.mqtt_client.get_mqtt_account_prefix()}/vehicles/{late_vin}/doors/locked/set"
+        await self.send_message(full_topic, LOCK_STATE)
+        assert self.received_vin == late_vin
+
     async def send_message(self, topic: str, payload: Any) -> None:
         await self.mqtt_client.client.on_message("client", topic, payload, 0, {})
 
     async def on_charging_detected(self, vin: str) -> None:
         pass
+
+
+class TestMqttPublisherChangesOnly(unittest.TestCase):
+    @override
+    def setUp(self) -> None:
+        self.config = Configuration()
+        self.config.mqtt_topic = "saic"
+        self.config.saic_user = USER
+        self.config.mqtt_transport_protocol = TransportProtocol.TCP
+        self.config.mqtt_publish_changes_only = True
+        self.mqtt_client = MqttPublisher(self.config)
+
+    def test_unchanged_value_is_suppressed(self) -> None:
+        assert self.mqtt_client.should_publish("topic", 42)
+        assert not self.mqtt_client.should_publish("topic", 42)
+        assert self.mqtt_client.published_messages == 1
+        assert self.mqtt_client.suppressed_messages == 1
+
+    def test_changed_value_is_published(self) -> None:
+        assert self.mqtt_client.should_publish("topic", 42)
+        assert self.mqtt_client.should_publish("topic", 43)
+        assert self.mqtt_client.should_publish("topic", "43")
+        assert self.mqtt_client.suppressed_messages == 0
+
+    def test_unchanged_value_is_republished_after_interval(self) -> None:
+        self.config.mqtt_republish_interval = 0
+        assert self.mqtt_client.should_publish("topic", 42)
+        assert self.mqtt_client.should_publish("topic", 42)
+
+    def test_cleared_cache_publishes_again(self) -> None:
+        assert self.mqtt_client.should_publish("topic", 42)
+        self.mqtt_client.clear_publish_cache()
+        assert self.mqtt_client.should_publish("topic", 42)
+
+    def test_everything_is_published_when_disabled(self) -> None:
+        self.config.mqtt_publish_changes_only = False
+        assert self.mqtt_client.should_publish("topic", 42)
+        assert self.mqtt_client.should_publish("topic", 42)
+        assert self.mqtt_client.published_messages == 2
+
+
+@asynccontextmanager
+async def running_writer(publisher: MqttPublisher) -> AsyncIterator[MagicMock]:
+    with (
+        patch.object(publisher.client, "connect"),
+        patch.object(publisher.client, "publish") as mock_publish,
+        patch.object(publisher, "is_connected", return_value=True),
+    ):
+        await publisher.connect()
+        yield mock_publish
+
+
+async def drain(publisher: MqttPublisher) -> None:
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if publisher.publish_queue_depth == 0:
+            break
+
+
+class TestMqttPublisherQueue(unittest.IsolatedAsyncioTestCase):
+    @override
+    def setUp(self) -> None:
+        self.config = Configuration()
+        self.config.mqtt_topic = "saic"
+        self.config.saic_user = USER
+        self.config.mqtt_transport_protocol = TransportProtocol.TCP
+        self.config.mqtt_publish_queue_size = 2
+        self.mqtt_client = MqttPublisher(self.config)
+
+    def test_messages_are_queued(self) -> None:
+        with patch.object(self.mqtt_client.client, "publish") as mock_publish:
+            self.mqtt_client.publish_str("topic", "value")
+            mock_publish.assert_not_called()
+        assert self.mqtt_client.publish_queue_depth == 1
+
+    def test_low_priority_messages_are_dropped_when_full(self) -> None:
+        with patch.object(self.mqtt_client.client, "publish") as mock_publish:
+            self.mqtt_client.publish_str("topic1", "value")
+            self.mqtt_client.publish_str("topic2", "value")
+            self.mqtt_client.publish_str(f"{mqtt_topics.INTERNAL_API}/path", "value")
+            mock_publish.assert_not_called()
+        assert self.mqtt_client.dropped_messages == 1
+        assert self.mqtt_client.publish_queue_depth == 2
+
+    async def test_messages_wait_in_order_when_full(self) -> None:
+        with patch.object(self.mqtt_client.client, "publish") as mock_publish:
+            for i in range(5):
+                self.mqtt_client.publish_str(f"topic{i}", f"value{i}")
+            mock_publish.assert_not_called()
+        assert self.mqtt_client.publish_queue_depth == 5
+
+        async with running_writer(self.mqtt_client) as mock_publish:
+            await drain(self.mqtt_client)
+
+        published_topics = [c.args[0] for c in mock_publish.call_args_list]
+        assert published_topics == [f"saic/topic{i}" for i in range(5)]
+
+    async def test_producers_wait_until_the_queue_caught_up(self) -> None:
+        for i in range(5):
+            self.mqtt_client.publish_str(f"topic{i}", f"value{i}")
+
+        async with running_writer(self.mqtt_client):
+            await asyncio.wait_for(self.mqtt_client.wait_until_writable(), timeout=1)
+
+            assert self.mqtt_client.publish_queue_depth <= 2
+
+    async def test_only_the_latest_waiting_value_of_a_topic_is_kept(self) -> None:
+        self.mqtt_client.publish_str("topic1", "value")
+        self.mqtt_client.publish_str("topic2", "value")
+        for i in range(100):
+            self.mqtt_client.publish_str("topic3", f"value{i}")
+        assert self.mqtt_client.publish_queue_depth == 3
+
+        async with running_writer(self.mqtt_client) as mock_publish:
+            await drain(self.mqtt_client)
+
+        published = [(c.args[0], c.args[1]) for c in mock_publish.call_args_list]
+        assert published[-1] == ("saic/topic3", "value99")
+        assert len(published) == 3
+
+    def test_dropped_messages_are_not_remembered_as_published(self) -> None:
+        self.config.mqtt_publish_changes_only = True
+        low_priority_topic = f"{mqtt_topics.INTERNAL_API}/path"
+        self.mqtt_client.publish_str("topic1", "value")
+        self.mqtt_client.publish_str("topic2", "value")
+
+        self.mqtt_client.publish_str(low_priority_topic, "value")
+
+        assert self.mqtt_client.dropped_messages == 1
+        assert not self.mqtt_client.is_unchanged(
+            self.mqtt_client.get_topic(low_priority_topic, False), "value"
+        )
+        assert self.mqtt_client.is_unchanged(
+            self.mqtt_client.get_topic("topic1", False), "value"
+        )
+
+    async def test_messages_are_dropped_while_disconnected(self) -> None:
+        with (
+            patch.object(self.mqtt_client.client, "connect"),
+            patch.object(self.mqtt_client.client, "publish") as mock_publish,
+        ):
+            await self.mqtt_client.connect()
+            self.mqtt_client.publish_str("topic", "value")
+            await drain(self.mqtt_client)
+
+        mock_publish.assert_not_called()
+        assert self.mqtt_client.dropped_messages == 1
+
+    async def test_burst_keeps_to_the_rate_limit(self) -> None:
+        self.config.mqtt_publish_queue_size = 10
+        self.config.mqtt_rate_limit_discovery = 20
+        self.mqtt_client = MqttPublisher(self.config)
+
+        async with running_writer(self.mqtt_client) as mock_publish:
+            for i in range(60):
+                self.mqtt_client.publish_str(
+                    f"homeassistant/sensor/entity{i}/config", "{}", no_prefix=True
+                )
+            # Nothing is written by the caller, even though the queue overflowed
+            mock_publish.assert_not_called()
+            await asyncio.sleep(0.5)
+
+        # One second worth of burst, then 20 messages per second
+        assert 20 <= mock_publish.call_count <= 20 + 10 + 1
+
+    async def test_offline_buffer_is_replayed_at_the_rate_limit(self) -> None:
+        buffered_topics = [f"saic/topic{i}" for i in range(60)]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.config.mqtt_offline_buffer_path = str(Path(temp_dir) / "buffer.db")
+            self.config.mqtt_rate_limit_state = 20
+            offline_buffer = OfflinePublishBuffer(
+                self.config.mqtt_offline_buffer_path, max_size=100
+            )
+            for topic in buffered_topics:
+                offline_buffer.store(topic, "value")
+            offline_buffer.close()
+            self.mqtt_client = MqttPublisher(self.config)
+
+            async with running_writer(self.mqtt_client) as mock_publish:
+                with patch.object(self.mqtt_client.client, "subscribe"):
+                    self.mqtt_client.client.on_connect(
+                        self.mqtt_client.client, 0, 0, {}
+                    )
+                await asyncio.sleep(0.5)
+
+        # One second worth of burst, then 20 messages per second, oldest first
+        assert 20 <= mock_publish.call_count <= 20 + 10 + 1
+        published_topics = [c.args[0] for c in mock_publish.call_args_list]
+        assert published_topics == buffered_topics[: len(published_topics)]
+
+
+class TestMqttPublisherV5(unittest.IsolatedAsyncioTestCase):
+    @override
+    def setUp(self) -> None:
+        config = Configuration()
+        config.mqtt_topic = "saic"
+        config.saic_user = USER
+        config.mqtt_transport_protocol = TransportProtocol.TCP
+        config.mqtt_v5_enabled = True
+        config.mqtt_message_expiry = 120
+        self.mqtt_client = MqttPublisher(config)
+        self.vehicle_topic = f"{mqtt_topics.VEHICLES}/{VIN}"
+        with (
+            patch.object(self.mqtt_client.client, "subscribe"),
+            patch.object(self.mqtt_client.client, "publish"),
+        ):
+            self.mqtt_client.client.on_connect(
+                self.mqtt_client.client, 0, 0, {"topic_alias_maximum": [1]}
+            )
+
+    async def publish_and_drain(self, messages: list[tuple[str, Any]]) -> list[Any]:
+        async with running_writer(self.mqtt_client) as mock_publish:
+            for topic, value in messages:
+                self.mqtt_client.publish_str(f"{self.vehicle_topic}/{topic}", value)
+            await drain(self.mqtt_client)
+        return mock_publish.call_args_list[-len(messages) :]
+
+    async def test_vehicle_topics_use_topic_aliases(self) -> None:
+        calls = await self.publish_and_drain(
+            [
+                (mqtt_topics.DRIVETRAIN_MILEAGE, "42"),
+                (mqtt_topics.DRIVETRAIN_RANGE, "42"),
+                (mqtt_topics.DRIVETRAIN_MILEAGE, "43"),
+            ]
+        )
+        topics = [(c.args[0], c.kwargs.get("topic_alias")) for c in calls]
+        assert topics == [
+            (f"saic/{self.vehicle_topic}/{mqtt_topics.DRIVETRAIN_MILEAGE}", 1),
+            # Only one alias is allowed by the broker
+            (f"saic/{self.vehicle_topic}/{mqtt_topics.DRIVETRAIN_RANGE}", None),
+            ("", 1),
+        ]
+
+    async def test_transient_topics_expire(self) -> None:
+        calls = await self.publish_and_drain(
+            [
+                (mqtt_topics.DRIVETRAIN_POWER, "1.5"),
+                (mqtt_topics.DRIVETRAIN_MILEAGE, "42"),
+            ]
+        )
+        expiries = [c.kwargs.get("message_expiry_interval") for c in calls]
+        assert expiries == [120, None]
+
+    async def test_connection_downgraded_to_mqtt_3_is_not_treated_as_v5(self) -> None:
+        with (
+            patch.object(self.mqtt_client.client, "subscribe"),
+            patch.object(
+                MqttClient,
+                "protocol_version",
+                new_callable=PropertyMock,
+                return_value=gmqtt.constants.MQTTv311,
+            ),
+        ):
+            self.mqtt_client.client.on_connect(
+                self.mqtt_client.client, 0, 0, {"topic_alias_maximum": [1]}
+            )
+
+        calls = await self.publish_and_drain([(mqtt_topics.DRIVETRAIN_POWER, "1.5")])
+
+        assert calls[0].args[0] == (
+            f"saic/{self.vehicle_topic}/{mqtt_topics.DRIVETRAIN_POWER}"
+        )
+        assert calls[0].kwargs == {"retain": True}
+
+
+class TestMqttClient(unittest.IsolatedAsyncioTestCase):
+    async def test_protocol_fallback_only_affects_one_client(self) -> None:
+        with (
+            patch.object(gmqtt.Client, "connect"),
+            patch.object(
+                gmqtt.Client,
+                "_create_connection",
+                side_effect=lambda *_args, **_kwargs: SimpleNamespace(
+                    _protocol=SimpleNamespace()
+                ),
+            ),
+            patch.object(gmqtt.Client, "_handle_connack_packet"),
+        ):
+            refusing_client = MqttClient("refusing")
+            other_client = MqttClient("other")
+            for client in (refusing_client, other_client):
+                await client.connect("localhost", version=gmqtt.constants.MQTTv50)
+                client._connection = await client._create_connection()
+
+            refusing_client._handle_connack_packet(
+                0x20, bytes([0, gmqtt.constants.CONNACK_REFUSED_PROTOCOL_VERSION])
+            )
+
+            assert refusing_client.protocol_version == gmqtt.constants.MQTTv50
+            refusing_client._connection = await refusing_client._create_connection()
+            other_client._connection = await other_client._create_connection()
+
+        assert refusing_client.protocol_version == gmqtt.constants.MQTTv311
+        assert other_client.protocol_version == gmqtt.constants.MQTTv50
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from pathlib import Path
+import tempfile
+import unittest
+
+from publisher.offline_buffer import OfflinePublishBuffer
+
+
+class TestOfflinePublishBuffer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.temp_dir.name) / "buffer.db")
+        self.buffer = OfflinePublishBuffer(self.path, max_size=3)
+
+    def tearDown(self) -> None:
+        self.buffer.close()
+        self.temp_dir.cleanup()
+
+    def test_keeps_last_value_per_topic_in_update_order(self) -> None:
+        self.buffer.store("a", "1")
+        self.buffer.store("b", "1")
+        self.buffer.store("a", "2")
+        assert self.buffer.drain() == [("b", "1"), ("a", "2")]
+        assert len(self.buffer) == 0
+
+    def test_discards_oldest_updates_when_full(self) -> None:
+        for topic in ["a", "b", "c", "d"]:
+            self.buffer.store(topic, topic)
+        assert self.buffer.drain() == [("b", "b"), ("c", "c"), ("d", "d")]
+
+    def test_survives_restart(self) -> None:
+        self.buffer.store("a", "1")
+        self.buffer.close()
+        self.buffer = OfflinePublishBuffer(self.path, max_size=3)
+        self.buffer.store("b", "1")
+        assert self.buffer.drain() == [("a", "1"), ("b", "1")]
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from publisher.rate_limiter import TokenBucket
+
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+    async def test_burst_is_not_delayed(self) -> None:
+        bucket = TokenBucket(rate=5)
+        with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            for _ in range(5):
+                await bucket.acquire()
+            mock_sleep.assert_not_called()
+        assert bucket.fill_level == pytest.approx(0.0, abs=0.01)
+
+    async def test_waits_when_bucket_is_empty(self) -> None:
+        bucket = TokenBucket(rate=2)
+        with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            for _ in range(4):
+                await bucket.acquire()
+            delays = [c.args[0] for c in mock_sleep.call_args_list]
+        assert delays == [pytest.approx(0.5, abs=0.01), pytest.approx(1.0, abs=0.01)]
+
+    def test_starts_full(self) -> None:
+        assert TokenBucket(rate=10).fill_level == 1.0
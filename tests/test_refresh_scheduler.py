@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from typing import TYPE_CHECKING, override
+import unittest
+
+from handlers.refresh_scheduler import FleetRefreshScheduler, RefreshableVehicle
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+
+class SimulatedVehicle(RefreshableVehicle):
+    def __init__(
+        self, vin: str, *, period: float | None, refresh_duration: float = 0.0
+    ) -> None:
+        self.__vin = vin
+        self.period = period
+        self.refresh_duration = refresh_duration
+        self.polls: list[float] = []
+
+    @property
+    @override
+    def vin(self) -> str:
+        return self.__vin
+
+    @override
+    async def poll(self) -> None:
+        self.polls.append(time.monotonic())
+        await asyncio.sleep(self.refresh_duration)
+
+    @override
+    def seconds_until_next_refresh(self) -> float | None:
+        if self.period is None:
+            return None
+        if not self.polls:
+            return 0.0
+        return self.polls[-1] + self.period - time.monotonic()
+
+
+class ConcurrencyTrackingVehicle(SimulatedVehicle):
+    running = 0
+    max_running = 0
+
+    @override
+    async def poll(self) -> None:
+        ConcurrencyTrackingVehicle.running += 1
+        ConcurrencyTrackingVehicle.max_running = max(
+            ConcurrencyTrackingVehicle.max_running, ConcurrencyTrackingVehicle.running
+        )
+        try:
+            await super().poll()
+        finally:
+            ConcurrencyTrackingVehicle.running -= 1
+
+
+@contextlib.asynccontextmanager
+async def running(scheduler: FleetRefreshScheduler) -> AsyncIterator[None]:
+    task = asyncio.create_task(scheduler.run())
+    try:
+        yield
+    finally:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+class TestFleetRefreshScheduler(unittest.IsolatedAsyncioTestCase):
+    async def test_refreshes_each_vehicle_with_its_period(self) -> None:
+        scheduler = FleetRefreshScheduler(workers=2)
+        fast = SimulatedVehicle("fast", period=0.05)
+        slow = SimulatedVehicle("slow", period=10.0)
+        scheduler.add_vehicle(fast)
+        scheduler.add_vehicle(slow)
+
+        async with running(scheduler):
+            await asyncio.sleep(0.22)
+
+        assert len(fast.polls) >= 4
+        assert len(slow.polls) == 1
+
+    async def test_vehicle_without_refresh_waits_for_trigger(self) -> None:
+        scheduler = FleetRefreshScheduler(workers=1)
+        vehicle = SimulatedVehicle("off", period=None)
+        scheduler.add_vehicle(vehicle)
+
+        async with running(scheduler):
+            await asyncio.sleep(0.05)
+            assert vehicle.polls == []
+            assert scheduler.scheduled_vehicles == 0
+
+            vehicle.period = 10.0
+            scheduler.schedule(vehicle.vin)
+            await asyncio.sleep(0.05)
+
+        assert len(vehicle.polls) == 1
+
+    async def test_worker_pool_bounds_concurrent_refreshes(self) -> None:
+        ConcurrencyTrackingVehicle.max_running = 0
+        scheduler = FleetRefreshScheduler(workers=3)
+        vehicles = [
+            ConcurrencyTrackingVehicle(f"vin{i}", period=10.0, refresh_duration=0.02)
+            for i in range(10)
+        ]
+        for vehicle in vehicles:
+            scheduler.add_vehicle(vehicle)
+
+        async with running(scheduler):
+            await asyncio.sleep(0.2)
+
+        assert ConcurrencyTrackingVehicle.max_running == 3
+        assert all(len(vehicle.polls) == 1 for vehicle in vehicles)
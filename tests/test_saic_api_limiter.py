@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import unittest
+
+import pytest
+from saic_ismart_client_ng.exceptions import SaicApiException
+
+from saic_api_limiter import (
+    SaicApiLimiter,
+    SaicCallPriority,
+    current_saic_call_priority,
+    is_throttling_error,
+    saic_call_priority,
+)
+
+
+def create_limiter(
+    *,
+    max_concurrent: int = 10,
+    requests_per_window: int = 100,
+    window: float = 60.0,
+    backoff: float = 60.0,
+) -> SaicApiLimiter:
+    return SaicApiLimiter(
+        max_concurrent=max_concurrent,
+        requests_per_window=requests_per_window,
+        window=window,
+        backoff=backoff,
+    )
+
+
+class TestSaicApiLimiter(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrency_is_capped(self) -> None:
+        limiter = create_limiter(max_concurrent=2)
+        running = 0
+        max_running = 0
+
+        async def call() -> None:
+            nonlocal running, max_running
+            async with limiter.slot(SaicCallPriority.IDLE):
+                running += 1
+                max_running = max(max_running, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call() for _ in range(6)))
+
+        assert max_running == 2
+        assert limiter.active == 0
+
+    async def test_higher_priority_is_served_first(self) -> None:
+        limiter = create_limiter(max_concurrent=1)
+        order: list[SaicCallPriority] = []
+        release = asyncio.Event()
+
+        async def blocker() -> None:
+            async with limiter.slot(SaicCallPriority.IDLE):
+                await release.wait()
+
+        async def call(priority: SaicCallPriority) -> None:
+            async with limiter.slot(priority):
+                order.append(priority)
+
+        blocking = asyncio.create_task(blocker())
+        await asyncio.sleep(0)
+        calls = [
+            asyncio.create_task(call(priority))
+            for priority in (
+                SaicCallPriority.IDLE,
+                SaicCallPriority.ACTIVE_VEHICLE,
+                SaicCallPriority.COMMAND,
+            )
+        ]
+        await asyncio.sleep(0)
+        assert limiter.waiting == 3
+        release.set()
+        await asyncio.gather(blocking, *calls)
+
+        assert order == [
+            SaicCallPriority.COMMAND,
+            SaicCallPriority.ACTIVE_VEHICLE,
+            SaicCallPriority.IDLE,
+        ]
+
+    async def test_requests_per_window_are_limited(self) -> None:
+        limiter = create_limiter(requests_per_window=2, window=0.1)
+        start = time.monotonic()
+        for _ in range(3):
+            async with limiter.slot(SaicCallPriority.IDLE):
+                pass
+
+        assert time.monotonic() - start >= 0.09
+
+    async def test_throttling_pauses_all_calls(self) -> None:
+        limiter = create_limiter(backoff=0.1)
+        with pytest.raises(SaicApiException):
+            async with limiter.slot(SaicCallPriority.COMMAND):
+                raise SaicApiException("Too many requests", return_code=429)
+
+        start = time.monotonic()
+        async with limiter.slot(SaicCallPriority.COMMAND):
+            pass
+        assert time.monotonic() - start >= 0.09
+
+    async def test_other_errors_do_not_pause_calls(self) -> None:
+        limiter = create_limiter(backoff=10.0)
+        with pytest.raises(SaicApiException):
+            async with limiter.slot(SaicCallPriority.IDLE):
+                raise SaicApiException("vehicle is sleeping", return_code=8)
+
+        async with asyncio.timeout(1.0), limiter.slot(SaicCallPriority.IDLE):
+            pass
+
+    async def test_cancelled_waiter_frees_its_place(self) -> None:
+        limiter = create_limiter(max_concurrent=1)
+        release = asyncio.Event()
+
+        async def blocker() -> None:
+            async with limiter.slot(SaicCallPriority.IDLE):
+                await release.wait()
+
+        async def call() -> None:
+            async with limiter.slot(SaicCallPriority.IDLE):
+                pass
+
+        blocking = asyncio.create_task(blocker())
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        release.set()
+        await blocking
+
+        async with asyncio.timeout(1.0):
+            await call()
+        assert limiter.active == 0
+
+
+class TestSaicCallPriority(unittest.IsolatedAsyncioTestCase):
+    async def test_priority_is_inherited_by_tasks(self) -> None:
+        assert current_saic_call_priority() == SaicCallPriority.IDLE
+        with saic_call_priority(SaicCallPriority.COMMAND):
+            priority = await asyncio.create_task(
+                asyncio.to_thread(current_saic_call_priority)
+            )
+        assert priority == SaicCallPriority.COMMAND
+        assert current_saic_call_priority() == SaicCallPriority.IDLE
+
+    def test_throttling_errors_are_detected(self) -> None:
+        assert is_throttling_error(SaicApiException("slow down", return_code=429))
+        assert is_throttling_error(SaicApiException("Request too frequent"))
+        assert not is_throttling_error(SaicApiException("bad request", return_code=4))
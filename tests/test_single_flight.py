@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+
+import pytest
+
+from handlers.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_callers_share_one_call(self) -> None:
+        single_flight = SingleFlight()
+        calls = 0
+
+        async def call() -> int:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(
+            *(single_flight.run("status", call) for _ in range(3))
+        )
+
+        assert results == [1, 1, 1]
+        assert calls == 1
+        assert single_flight.coalesced_calls == 2
+
+    async def test_sequential_callers_are_not_coalesced(self) -> None:
+        single_flight = SingleFlight()
+
+        async def call() -> str:
+            return "result"
+
+        assert await single_flight.run("status", call) == "result"
+        assert await single_flight.run("status", call) == "result"
+        assert single_flight.coalesced_calls == 0
+
+    async def test_different_keys_are_not_coalesced(self) -> None:
+        single_flight = SingleFlight()
+
+        async def call() -> None:
+            await asyncio.sleep(0.01)
+
+        await asyncio.gather(
+            single_flight.run("status", call), single_flight.run("charging", call)
+        )
+        assert single_flight.coalesced_calls == 0
+
+    async def test_errors_are_shared(self) -> None:
+        single_flight = SingleFlight()
+
+        async def call() -> None:
+            await asyncio.sleep(0.01)
+            raise ValueError("failed")
+
+        results = await asyncio.gather(
+            single_flight.run("status", call),
+            single_flight.run("status", call),
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, ValueError) for result in results)
+
+    async def test_cancelled_caller_does_not_cancel_others(self) -> None:
+        single_flight = SingleFlight()
+
+        async def call() -> str:
+            await asyncio.sleep(0.02)
+            return "result"
+
+        first = asyncio.create_task(single_flight.run("status", call))
+        second = asyncio.create_task(single_flight.run("status", call))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "result"
+        with pytest.raises(asyncio.CancelledError):
+            await first
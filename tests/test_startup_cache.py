@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from pathlib import Path
+import tempfile
+import unittest
+
+from common_mocks import VIN
+from saic_ismart_client_ng.api.vehicle.alarm import AlarmType
+from saic_ismart_client_ng.api.vehicle.schema import (
+    VehicleModelConfiguration,
+    VinInfo,
+)
+
+from startup_cache import StartupCache
+
+OTHER_VIN = "vin20000000000000"
+
+
+def create_vin_info(vin: str, model_year: str = "2022") -> VinInfo:
+    return VinInfo(
+        vin=vin,
+        modelName="MG4",
+        modelYear=model_year,
+        vehicleModelConfiguration=[
+            VehicleModelConfiguration(itemCode="J17", itemName="BATTERY", itemValue="1")
+        ],
+    )
+
+
+class TestStartupCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.temp_dir.name) / "startup.json")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_vehicle_list_round_trip(self) -> None:
+        StartupCache(self.path).set_vehicle_list([create_vin_info(VIN)])
+
+        assert StartupCache(self.path).get_vehicle_list() == [create_vin_info(VIN)]
+
+    def test_missing_file_has_no_vehicle_list(self) -> None:
+        cache = StartupCache(self.path)
+
+        assert cache.get_vehicle_list() is None
+        assert not cache.is_registered_for_alarms(VIN, list(AlarmType))
+
+    def test_unreadable_file_is_ignored(self) -> None:
+        Path(self.path).write_text("{not json", encoding="utf-8")
+
+        assert StartupCache(self.path).get_vehicle_list() is None
+
+    def test_alarm_registration_is_remembered(self) -> None:
+        cache = StartupCache(self.path)
+        cache.set_vehicle_list([create_vin_info(VIN)])
+        cache.set_registered_for_alarms(VIN, list(AlarmType))
+
+        restarted = StartupCache(self.path)
+        restarted.set_vehicle_list([create_vin_info(VIN)])
+
+        assert restarted.is_registered_for_alarms(VIN, list(AlarmType))
+        assert not restarted.is_registered_for_alarms(
+            VIN, [AlarmType.ALARM_TYPE_VEHICLE_FAULT]
+        )
+
+    def test_changed_vehicle_has_to_register_again(self) -> None:
+        cache = StartupCache(self.path)
+        cache.set_vehicle_list([create_vin_info(VIN), create_vin_info(OTHER_VIN)])
+        cache.set_registered_for_alarms(VIN, list(AlarmType))
+        cache.set_registered_for_alarms(OTHER_VIN, list(AlarmType))
+
+        restarted = StartupCache(self.path)
+        restarted.set_vehicle_list(
+            [create_vin_info(VIN, model_year="2023"), create_vin_info(OTHER_VIN)]
+        )
+
+        assert not restarted.is_registered_for_alarms(VIN, list(AlarmType))
+        assert restarted.is_registered_for_alarms(OTHER_VIN, list(AlarmType))
+
+    def test_removed_vehicle_is_forgotten(self) -> None:
+        cache = StartupCache(self.path)
+        cache.set_vehicle_list([create_vin_info(VIN)])
+        cache.set_registered_for_alarms(VIN, list(AlarmType))
+
+        cache.set_vehicle_list([create_vin_info(OTHER_VIN)])
+        cache.set_vehicle_list([create_vin_info(VIN)])
+
+        assert not cache.is_registered_for_alarms(VIN, list(AlarmType))
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import json
+import unittest
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+from common_mocks import (
+    DRIVETRAIN_MILEAGE,
+    LOCATION_SPEED,
+    VIN,
+    get_mock_charge_management_data_resp,
+    get_mock_vehicle_status_resp,
+)
+from mocks import MessageCapturingConsolePublisher
+from saic_ismart_client_ng.api.vehicle.schema import VinInfo
+
+from configuration import Configuration
+import mqtt_topics
+from status_publisher import STATE_DOCUMENT_VALUE_KEY, VehicleStateDocument
+from vehicle import VehicleState
+from vehicle_info import VehicleInfo
+
+CHARGING_START_TIME = 1715000000
+CHARGING_END_TIME = 1715003600
+
+
+class TestVehicleStateDocument(unittest.TestCase):
+    def test_values_are_nested_by_topic(self) -> None:
+        document = VehicleStateDocument()
+        document.update(mqtt_topics.DRIVETRAIN_SOC, 80)
+        document.update(mqtt_topics.DRIVETRAIN_RANGE, 300.5)
+        document.update(mqtt_topics.DOORS_LOCKED, True)
+        document.update(mqtt_topics.DRIVETRAIN_SOC, 81)
+        assert document.to_dict() == {
+            "drivetrain": {"soc": 81, "range": 300.5},
+            "doors": {"locked": True},
+        }
+
+    def test_topics_with_sub_topics_keep_their_value(self) -> None:
+        document = VehicleStateDocument()
+        document.update("a", 1)
+        document.update("a/b", 2)
+        document.update("c/d", 3)
+        document.update("c", 4)
+        assert document.to_dict() == {
+            "a": {STATE_DOCUMENT_VALUE_KEY: 1, "b": 2},
+            "c": {"d": 3, STATE_DOCUMENT_VALUE_KEY: 4},
+        }
+
+
+class TestVehicleStatePublishesDocument(unittest.TestCase):
+    def setUp(self) -> None:
+        config = Configuration()
+        config.anonymized_publishing = False
+        self.publisher = MessageCapturingConsolePublisher(config)
+        vin_info = VinInfo()
+        vin_info.vin = VIN
+        self.vehicle_state = VehicleState(
+            self.publisher,
+            BlockingScheduler(),
+            f"/vehicles/{VIN}",
+            VehicleInfo(vin_info, None),
+            publish_state_document=True,
+        )
+
+    def test_state_document_contains_published_values(self) -> None:
+        self.vehicle_state.handle_vehicle_status(get_mock_vehicle_status_resp())
+        self.vehicle_state.publish_state_document()
+
+        document = json.loads(self.publisher.map[f"/vehicles/{VIN}/state"])
+        assert document["drivetrain"]["mileage"] == DRIVETRAIN_MILEAGE
+        assert document["location"]["speed"] == LOCATION_SPEED
+
+    def test_no_charging_value_is_lost(self) -> None:
+        self.vehicle_state.handle_vehicle_status(get_mock_vehicle_status_resp())
+        charge_status = get_mock_charge_management_data_resp()
+        assert charge_status.rvsChargeStatus is not None
+        charge_status.rvsChargeStatus.startTime = CHARGING_START_TIME
+        charge_status.rvsChargeStatus.endTime = CHARGING_END_TIME
+        self.vehicle_state.handle_charge_status(charge_status)
+        self.vehicle_state.publish_state_document()
+
+        document = json.loads(self.publisher.map[f"/vehicles/{VIN}/state"])
+        charging = document["drivetrain"]["charging"]
+        prefix = f"/vehicles/{VIN}/"
+        assert (
+            charging[STATE_DOCUMENT_VALUE_KEY]
+            == self.publisher.map[prefix + mqtt_topics.DRIVETRAIN_CHARGING]
+        )
+        assert (
+            charging["lastStart"]
+            == self.publisher.map[prefix + mqtt_topics.DRIVETRAIN_CHARGING_LAST_START]
+        )
+        assert (
+            charging["lastEnd"]
+            == self.publisher.map[prefix + mqtt_topics.DRIVETRAIN_CHARGING_LAST_END]
+        )
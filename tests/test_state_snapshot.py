@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import datetime
+from pathlib import Path
+import tempfile
+import unittest
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+from common_mocks import VIN
+from mocks import MessageCapturingConsolePublisher
+from saic_ismart_client_ng.api.vehicle.schema import VinInfo
+from saic_ismart_client_ng.api.vehicle_charging import (
+    ChargeCurrentLimitCode,
+    TargetBatteryCode,
+)
+
+from configuration import Configuration
+from state_snapshot import StateSnapshotStore, VehicleSnapshot
+from vehicle import RefreshMode, VehicleState
+from vehicle_info import VehicleInfo
+
+
+def create_vehicle_state() -> VehicleState:
+    config = Configuration()
+    publisher = MessageCapturingConsolePublisher(config)
+    vin_info = VinInfo()
+    vin_info.vin = VIN
+    return VehicleState(
+        publisher,
+        BlockingScheduler(),
+        f"/vehicles/{VIN}",
+        VehicleInfo(vin_info, None),
+    )
+
+
+class TestStateSnapshot(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.temp_dir.name) / "state.json")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_vehicle_state_round_trip(self) -> None:
+        original = create_vehicle_state()
+        original.configure_missing()
+        original.set_refresh_period_active(45)
+        original.set_refresh_mode(RefreshMode.FORCE, "test")
+        original.mark_successful_refresh()
+        original.update_target_soc(TargetBatteryCode.P_80)
+        original.update_charge_current_limit(ChargeCurrentLimitCode.C_16A)
+        original.set_ac_temperature(21)
+        original.update_scheduled_battery_heating(datetime.time(6, 30), True)
+
+        StateSnapshotStore(self.path).save(VIN, original.snapshot())
+        snapshot = StateSnapshotStore(self.path).get(VIN)
+        assert snapshot is not None
+
+        restored = create_vehicle_state()
+        assert not restored.is_complete()
+        restored.restore(snapshot)
+
+        assert restored.is_complete()
+        assert restored.refresh_period_active == 45
+        # FORCE is a one-off, the mode it returns to is persisted instead
+        assert restored.refresh_mode == RefreshMode.PERIODIC
+        assert restored.last_successful_refresh == original.last_successful_refresh
+        assert restored.target_soc == TargetBatteryCode.P_80
+        assert restored.charge_current_limit == ChargeCurrentLimitCode.C_16A
+        assert restored.get_remote_ac_temperature() == 21
+        assert restored.snapshot() == snapshot
+
+    def test_unchanged_snapshot_is_not_written_again(self) -> None:
+        store = StateSnapshotStore(self.path)
+        snapshot = create_vehicle_state().snapshot()
+        store.save(VIN, snapshot)
+        Path(self.path).unlink()
+        store.save(VIN, snapshot)
+        assert not Path(self.path).exists()
+
+    def test_unreadable_snapshot_is_ignored(self) -> None:
+        Path(self.path).write_text("{not json", encoding="utf-8")
+        assert StateSnapshotStore(self.path).get(VIN) is None
+
+    def test_unknown_fields_are_ignored(self) -> None:
+        snapshot = VehicleSnapshot.from_dict(
+            {
+                "refresh_mode": "periodic",
+                "refresh_period_active": 30,
+                "refresh_period_inactive": 86400,
+                "refresh_period_after_shutdown": 120,
+                "refresh_period_inactive_grace": 600,
+                "refresh_period_charging": 0,
+                "removed_field": True,
+            }
+        )
+        assert snapshot.refresh_period_active == 30
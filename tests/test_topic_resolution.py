@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from typing import override
+import unittest
+
+from configuration import Configuration, TransportProtocol
+import mqtt_topics
+from publisher import core
+from publisher.mqtt_publisher import MqttPublisher
+
+USER = "me@home.da"
+VIN = "vin10000000000000"
+
+
+def create_publisher() -> MqttPublisher:
+    config = Configuration()
+    config.mqtt_topic = "saic"
+    config.saic_user = USER
+    config.mqtt_transport_protocol = TransportProtocol.TCP
+    return MqttPublisher(config)
+
+
+class TestTopicResolution(unittest.TestCase):
+    @override
+    def setUp(self) -> None:
+        self.publisher = create_publisher()
+
+    def test_cached_topic_is_resolved_once(self) -> None:
+        key = f"{USER}/{mqtt_topics.VEHICLES}/{VIN}/{mqtt_topics.DRIVETRAIN_SOC}"
+        cache_size = self.publisher.topic_cache_size
+        first = self.publisher.get_topic(key, False)
+        second = self.publisher.get_topic(key, False)
+        assert first == "saic/me@home.da/vehicles/vin10000000000000/drivetrain/soc"
+        assert first is second
+        assert self.publisher.topic_cache_size == cache_size + 1
+
+    def test_prefix_is_part_of_the_cache_key(self) -> None:
+        cache_size = self.publisher.topic_cache_size
+        assert self.publisher.get_topic("a+b", False) == "saic/a_b"
+        assert self.publisher.get_topic("a+b", True) == "a_b"
+        assert self.publisher.topic_cache_size == cache_size + 2
+
+    def test_cache_is_bounded(self) -> None:
+        for i in range(core.TOPIC_CACHE_SIZE + 10):
+            self.publisher.get_topic(f"topic/{i}", False)
+        assert self.publisher.topic_cache_size == core.TOPIC_CACHE_SIZE
+        assert self.publisher.get_topic("topic/0", False) == "saic/topic/0"
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import datetime
+import json
+from pathlib import Path
+import tempfile
 from unittest import TestCase
 
 from saic_ismart_client_ng.api.schema import GpsPosition, GpsStatus
 from saic_ismart_client_ng.api.vehicle import VehicleStatusResp
 
-from utils import get_update_timestamp
+from utils import atomic_write_json, get_update_timestamp
 
 
 class Test(TestCase):
@@ -126,3 +129,13 @@ class Test(TestCase):
         )
 
         assert result <= datetime.datetime.now(tz=datetime.UTC)
+
+    def test_atomic_write_json_replaces_the_file(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "state.json"
+            path.write_text("{truncated", encoding="utf-8")
+
+            atomic_write_json(path, {"a": 1})
+
+            assert json.loads(path.read_text(encoding="utf-8")) == {"a": 1}
+            assert [p.name for p in Path(temp_dir).iterdir()] == ["state.json"]
@@ -1,5 +1,12 @@
 from __future__ import annotations
 
+import asyncio
+from dataclasses import asdict
+import datetime
+import json
+from pathlib import Path
+import tempfile
+import time
 from typing import Any
 import unittest
 from unittest.mock import patch
@@ -61,13 +68,15 @@ from saic_ismart_client_ng.api.vehicle.schema import (
     VehicleModelConfiguration,
     VinInfo,
 )
+from saic_ismart_client_ng.exceptions import SaicApiException
 from saic_ismart_client_ng.model import SaicApiConfiguration
 
 from configuration import Configuration
 from handlers.relogin import ReloginHandler
 from mqtt_gateway import VehicleHandler
 import mqtt_topics
-from vehicle import VehicleState
+from state_snapshot import StateSnapshotStore
+from vehicle import RefreshMode, VehicleState
 from vehicle_info import VehicleInfo
 
 
@@ -396,6 +405,229 @@ class TestVehicleHandler(unittest.IsolatedAsyncioTestCase):
             f"Some topics have been published from both car state and BMS state: {common_data!s}"
         )
 
+    async def test_refresh_fetches_concurrently(self) -> None:
+        async def get_vehicle_status(_: str) -> Any:
+            await asyncio.sleep(0.2)
+            return get_mock_vehicle_status_resp()
+
+        async def get_charging_management_data(_: str) -> Any:
+            await asyncio.sleep(0.2)
+            return get_mock_charge_management_data_resp()
+
+        async def get_battery_heating_schedule(_: str) -> Any:
+            await asyncio.sleep(0.2)
+
+        with (
+            patch.object(
+                self.saicapi, "get_vehicle_status", side_effect=get_vehicle_status
+            ),
+            patch.object(
+                self.saicapi,
+                "get_vehicle_charging_management_data",
+                side_effect=get_charging_management_data,
+            ),
+            patch.object(
+                self.saicapi,
+                "get_vehicle_battery_heating_schedule",
+                side_effect=get_battery_heating_schedule,
+            ),
+        ):
+            start = time.monotonic()
+            await self.vehicle_handler.refresh()
+            elapsed = time.monotonic() - start
+
+        # Three sequential calls would take at least 0.6 seconds
+        assert elapsed < 0.5
+        self.assert_mqtt_topic(
+            TestVehicleHandler.get_topic(mqtt_topics.DRIVETRAIN_MILEAGE),
+            DRIVETRAIN_MILEAGE,
+        )
+        self.assert_mqtt_topic(
+            TestVehicleHandler.get_topic(mqtt_topics.DRIVETRAIN_CURRENT),
+            DRIVETRAIN_CURRENT,
+        )
+
+    async def test_refresh_tolerates_charge_status_failure(self) -> None:
+        with (
+            patch.object(
+                self.saicapi,
+                "get_vehicle_status",
+                return_value=get_mock_vehicle_status_resp(),
+            ),
+            patch.object(
+                self.saicapi,
+                "get_vehicle_charging_management_data",
+                side_effect=SaicApiException("charging data unavailable"),
+            ),
+            patch.object(
+                self.saicapi,
+                "get_vehicle_battery_heating_schedule",
+                return_value=None,
+            ),
+        ):
+            await self.vehicle_handler.refresh()
+
+        self.assert_mqtt_topic(
+            TestVehicleHandler.get_topic(mqtt_topics.DRIVETRAIN_MILEAGE),
+            DRIVETRAIN_MILEAGE,
+        )
+        assert (
+            TestVehicleHandler.get_topic(mqtt_topics.DRIVETRAIN_CURRENT)
+            not in self.publisher.map
+        )
+
+    async def test_refresh_fails_when_vehicle_status_fails(self) -> None:
+        with (
+            patch.object(
+                self.saicapi,
+                "get_vehicle_status",
+                side_effect=SaicApiException("vehicle status unavailable"),
+            ),
+            patch.object(
+                self.saicapi,
+                "get_vehicle_charging_management_data",
+                return_value=get_mock_charge_management_data_resp(),
+            ),
+            patch.object(
+                self.saicapi,
+                "get_vehicle_battery_heating_schedule",
+                return_value=None,
+            ),
+            pytest.raises(SaicApiException),
+        ):
+            await self.vehicle_handler.refresh()
+
+        assert (
+            TestVehicleHandler.get_topic(mqtt_topics.DRIVETRAIN_CURRENT)
+            not in self.publisher.map
+        )
+
+    async def test_overlapping_refreshes_share_vehicle_status_call(self) -> None:
+        async def get_vehicle_status(_: str) -> Any:
+            await asyncio.sleep(0.05)
+            return get_mock_vehicle_status_resp()
+
+        with patch.object(
+            self.saicapi, "get_vehicle_status", side_effect=get_vehicle_status
+        ) as mock_get_vehicle_status:
+            await asyncio.gather(
+                self.vehicle_handler.update_vehicle_status(),
+                self.vehicle_handler.update_vehicle_status(),
+            )
+
+        assert mock_get_vehicle_status.call_count == 1
+        assert self.vehicle_handler.coalesced_calls == 1
+
+    async def test_battery_heating_schedule_is_cached_until_set(self) -> None:
+        with (
+            patch.object(
+                self.saicapi, "get_vehicle_battery_heating_schedule", return_value=None
+            ) as mock_get_schedule,
+            patch.object(self.saicapi, "enable_schedule_battery_heating"),
+        ):
+            await self.vehicle_handler.update_scheduled_battery_heating_status()
+            await self.vehicle_handler.update_scheduled_battery_heating_status()
+            assert mock_get_schedule.call_count == 1
+
+            await self.vehicle_handler.handle_mqtt_command(
+                command=mqtt_topics.DRIVETRAIN_BATTERY_HEATING_SCHEDULE_SET,
+                payload='{"mode": "on", "startTime": "07:30"}',
+            )
+            await self.vehicle_handler.update_scheduled_battery_heating_status()
+            assert mock_get_schedule.call_count == 2
+
+    async def test_lock_command_is_verified(self) -> None:
+        unlocked_status = get_mock_vehicle_status_resp()
+        assert unlocked_status.basicVehicleStatus is not None
+        unlocked_status.basicVehicleStatus.lockStatus = 0
+        result_topic = f"{self.vehicle_handler.vehicle_prefix}/doors/locked/result"
+
+        with (
+            patch("handlers.vehicle.VERIFICATION_INITIAL_INTERVAL", 0.01),
+            patch.object(self.saicapi, "lock_vehicle"),
+            patch.object(
+                self.saicapi,
+                "get_vehicle_status",
+                side_effect=[unlocked_status, get_mock_vehicle_status_resp()],
+            ) as mock_get_vehicle_status,
+        ):
+            await self.vehicle_handler.handle_mqtt_command(
+                command=mqtt_topics.DOORS_LOCKED_SET, payload="true"
+            )
+            assert self.publisher.map[result_topic] == "Success"
+            await asyncio.sleep(0.1)
+
+        assert mock_get_vehicle_status.call_count == 2
+        assert self.publisher.map[result_topic].startswith("Confirmed after")
+        assert self.vehicle_handler.vehicle_state.refresh_mode != RefreshMode.FORCE
+
+    async def test_unconfirmed_command_falls_back_to_forced_refresh(self) -> None:
+        unlocked_status = get_mock_vehicle_status_resp()
+        assert unlocked_status.basicVehicleStatus is not None
+        unlocked_status.basicVehicleStatus.lockStatus = 0
+
+        with (
+            patch("handlers.vehicle.VERIFICATION_INITIAL_INTERVAL", 0.01),
+            patch("handlers.vehicle.VERIFICATION_DEADLINE", 0.05),
+            patch.object(self.saicapi, "lock_vehicle"),
+            patch.object(
+                self.saicapi, "get_vehicle_status", return_value=unlocked_status
+            ),
+        ):
+            await self.vehicle_handler.handle_mqtt_command(
+                command=mqtt_topics.DOORS_LOCKED_SET, payload="true"
+            )
+            await asyncio.sleep(0.1)
+
+        assert self.publisher.map[
+            f"{self.vehicle_handler.vehicle_prefix}/doors/locked/result"
+        ].startswith("Not confirmed")
+        assert self.vehicle_handler.vehicle_state.refresh_mode == RefreshMode.FORCE
+
+    async def test_failing_verification_falls_back_to_forced_refresh(self) -> None:
+        result_topic = f"{self.vehicle_handler.vehicle_prefix}/doors/locked/result"
+
+        with (
+            patch("handlers.vehicle.VERIFICATION_INITIAL_INTERVAL", 0.01),
+            patch("handlers.vehicle.VERIFICATION_DEADLINE", 0.05),
+            patch.object(self.saicapi, "lock_vehicle"),
+            patch.object(
+                self.saicapi, "get_vehicle_status", side_effect=TimeoutError
+            ) as mock_get_vehicle_status,
+        ):
+            await self.vehicle_handler.handle_mqtt_command(
+                command=mqtt_topics.DOORS_LOCKED_SET, payload="true"
+            )
+            await asyncio.sleep(0.1)
+
+        # Every attempt failed, yet the verification kept polling until the deadline
+        assert mock_get_vehicle_status.call_count > 1
+        assert self.publisher.map[result_topic].startswith("Not confirmed")
+        assert self.vehicle_handler.vehicle_state.refresh_mode == RefreshMode.FORCE
+
+    def test_invalid_snapshot_falls_back_to_a_cold_start(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "state.json"
+            snapshot = self.vehicle_handler.vehicle_state.snapshot()
+            path.write_text(
+                json.dumps({VIN: {**asdict(snapshot), "refresh_mode": "unknown"}}),
+                encoding="utf-8",
+            )
+            vehicle_handler = VehicleHandler(
+                self.vehicle_handler.configuration,
+                self.vehicle_handler.relogin_handler,
+                self.saicapi,
+                self.publisher,
+                self.vehicle_handler.vin_info,
+                self.vehicle_handler.vehicle_state,
+                snapshot_store=StateSnapshotStore(str(path)),
+            )
+
+            vehicle_handler.start()
+
+        # Without a usable snapshot the vehicle is refreshed right away
+        assert vehicle_handler.vehicle_state.last_car_activity != datetime.datetime.min
+
     def assert_mqtt_topic(self, topic: str, value: Any) -> None:
         mqtt_map = self.publisher.map
         if topic in mqtt_map:
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import datetime
 from typing import Any
 import unittest
 
@@ -19,7 +20,7 @@ from saic_ismart_client_ng.api.vehicle.schema import VinInfo
 
 from configuration import Configuration
 import mqtt_topics
-from vehicle import VehicleState
+from vehicle import RefreshMode, VehicleState
 from vehicle_info import VehicleInfo
 
 
@@ -101,6 +102,60 @@ class TestVehicleState(unittest.IsolatedAsyncioTestCase):
         }
         assert expected_topics == set(self.publisher.map.keys())
 
+    async def test_next_refresh_due_follows_refresh_periods(self) -> None:
+        self.vehicle_state.configure_missing()
+        assert self.vehicle_state.refresh_mode == RefreshMode.PERIODIC
+        self.vehicle_state.hv_battery_active = True
+        last_refresh = datetime.datetime.now()
+        self.vehicle_state.last_successful_refresh = last_refresh
+        assert (
+            self.vehicle_state.next_refresh_due()
+            == last_refresh + datetime.timedelta(seconds=30)
+        )
+        assert not self.vehicle_state.should_refresh()
+
+        self.vehicle_state.hv_battery_active = False
+        self.vehicle_state.last_car_shutdown = last_refresh
+        assert (
+            self.vehicle_state.next_refresh_due()
+            == last_refresh + datetime.timedelta(seconds=120)
+        )
+
+        # Once the grace period is over only the inactive period applies
+        self.vehicle_state.last_car_shutdown = last_refresh - datetime.timedelta(
+            hours=1
+        )
+        assert (
+            self.vehicle_state.next_refresh_due()
+            == last_refresh + datetime.timedelta(days=1)
+        )
+
+    async def test_next_refresh_due_for_refresh_modes(self) -> None:
+        self.vehicle_state.configure_missing()
+        self.vehicle_state.last_successful_refresh = datetime.datetime.now()
+        self.vehicle_state.last_car_activity = datetime.datetime.min
+
+        self.vehicle_state.set_refresh_mode(RefreshMode.OFF, "test")
+        assert self.vehicle_state.next_refresh_due() is None
+        assert not self.vehicle_state.should_refresh()
+
+        self.vehicle_state.set_refresh_mode(RefreshMode.FORCE, "test")
+        assert self.vehicle_state.should_refresh()
+        assert self.vehicle_state.refresh_mode == RefreshMode.OFF
+
+    async def test_refresh_trigger_listener_is_called_on_changes(self) -> None:
+        triggers: list[None] = []
+        self.vehicle_state.refresh_trigger_listener = lambda: triggers.append(None)
+
+        self.vehicle_state.set_refresh_mode(RefreshMode.PERIODIC, "test")
+        assert len(triggers) == 1
+
+        self.vehicle_state.notify_car_activity()
+        assert len(triggers) == 2
+
+        self.vehicle_state.set_refresh_period_active(60)
+        assert len(triggers) == 3
+
     def assert_mqtt_topic(self, topic: str, value: Any) -> None:
         mqtt_map = self.publisher.map
         if topic in mqtt_map: